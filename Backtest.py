@@ -0,0 +1,240 @@
+import math
+from datetime import date as Date
+
+import numpy as np
+
+from Profiler import profiled
+
+
+class TradeLedger:
+    """
+    Resultatet av en simulerad handel: index för genomförda köp och sälj,
+    antal aktier samt vinst per affär. Ett köp utan matchande sälj är en öppen position.
+    """
+    def __init__(self, prices, buy_idx, sell_idx, shares):
+        self._set_trades(buy_idx, sell_idx, prices[buy_idx], prices[sell_idx], shares)
+
+    @classmethod
+    def from_trades(cls, buy_idx, sell_idx, buy_prices, sell_prices, shares):
+        """Skapar en ledger direkt från affärerna, utan hela prisserien (strömmande backtest)."""
+        ledger = cls.__new__(cls)
+        ledger._set_trades(np.asarray(buy_idx, dtype=np.intp), np.asarray(sell_idx, dtype=np.intp),
+                           np.asarray(buy_prices, dtype=float), np.asarray(sell_prices, dtype=float),
+                           np.asarray(shares, dtype=float))
+        return ledger
+
+    def _set_trades(self, buy_idx, sell_idx, buy_prices, sell_prices, shares):
+        self.buy_idx = buy_idx
+        self.sell_idx = sell_idx
+        self.shares = shares
+        self.buy_prices = buy_prices
+        self.sell_prices = sell_prices
+
+        closed = len(sell_idx)
+        self.profit = self.shares[:closed] * (self.sell_prices - self.buy_prices[:closed])
+        self.percentage_profit = (self.profit / (self.shares[:closed] * self.buy_prices[:closed])) * 100
+
+    @property
+    def num_trades(self):
+        return len(self.sell_idx)
+
+    @property
+    def total_profit(self):
+        return float(self.profit.sum())
+
+    @property
+    def total_percentage_profit(self):
+        return float(self.percentage_profit.sum())
+
+
+@profiled("strategi: crossover_signals")
+def crossover_signals(prices, indicator):
+    """
+    Hittar korsningar mellan pris och indikator.
+    Köp när priset går från under till över indikatorn, sälj när det går från över till under.
+    NaN i indikatorn (uppvärmningsperioden) ger aldrig någon signal.
+    :return: Två bool-arrayer (köp, sälj) med samma längd som prices.
+    """
+    diff = prices - indicator
+    above = diff > 0
+    below = diff < 0
+
+    buy = np.zeros(len(prices), dtype=bool)
+    sell = np.zeros(len(prices), dtype=bool)
+    buy[1:] = below[:-1] & above[1:]
+    sell[1:] = above[:-1] & below[1:]
+    return buy, sell
+
+
+class StreamingCrossover:
+    """Korsningar mellan pris och indikator dag för dag, med samma regler som crossover_signals."""
+    def __init__(self):
+        self.prev_diff = math.nan
+
+    def update(self, value, indicator):
+        """:return: (köp, sälj) för dagen."""
+        diff = value - indicator
+        buy = self.prev_diff < 0 and diff > 0
+        sell = self.prev_diff > 0 and diff < 0
+        self.prev_diff = diff
+        return buy, sell
+
+
+def pair_signals(buy_mask, sell_mask):
+    """
+    Omvandlar köp- och säljkandidater till faktiskt genomförda affärer:
+    köp bara utan innehav, sälj bara med innehav, högst en åtgärd per dag.
+    :return: Index för genomförda köp och sälj.
+    """
+    buys = np.flatnonzero(buy_mask)
+    sells = np.flatnonzero(sell_mask)
+    if buys.size == 0:
+        return buys, sells[:0]
+
+    if not np.any(buy_mask & sell_mask):
+        # Varje dag har högst en signal: en affär börjar där signaltypen byter
+        idx = np.concatenate([buys, sells])
+        is_buy = np.concatenate([np.ones(buys.size, dtype=bool), np.zeros(sells.size, dtype=bool)])
+        order = np.argsort(idx)
+        idx, is_buy = idx[order], is_buy[order]
+
+        first = np.argmax(is_buy)  # Sälj-signaler före första köpet ignoreras
+        idx, is_buy = idx[first:], is_buy[first:]
+
+        keep = np.ones(idx.size, dtype=bool)
+        keep[1:] = is_buy[1:] != is_buy[:-1]
+        idx, is_buy = idx[keep], is_buy[keep]
+        return idx[is_buy], idx[~is_buy]
+
+    # Både köp och sälj samma dag: följ innehavet affär för affär (inte dag för dag)
+    buy_idx, sell_idx = [], []
+    pos = 0
+    while True:
+        k = np.searchsorted(buys, pos)
+        if k == buys.size:
+            break
+        buy_idx.append(buys[k])
+        k = np.searchsorted(sells, buys[k] + 1)
+        if k == sells.size:
+            break
+        sell_idx.append(sells[k])
+        pos = sells[k] + 1
+    return np.array(buy_idx, dtype=np.intp), np.array(sell_idx, dtype=np.intp)
+
+
+@profiled("strategi: simulate_trades")
+def simulate_trades(prices, buy_mask, sell_mask, start_value=10000):
+    """
+    Simulerar handel där hela start_value investeras vid varje köp och allt säljs vid sälj.
+    Köp som inte räcker till en enda aktie genomförs inte.
+    :param prices: NumPy-array med priser.
+    :param buy_mask: Bool-array med köpkandidater.
+    :param sell_mask: Bool-array med säljkandidater.
+    :param start_value: Belopp som investeras vid varje köp.
+    :return: TradeLedger.
+    """
+    prices = np.asarray(prices, dtype=float)
+    all_shares = np.floor_divide(start_value, prices)
+    buy_idx, sell_idx = pair_signals(buy_mask & (all_shares > 0), sell_mask)
+    return TradeLedger(prices, buy_idx, sell_idx, all_shares[buy_idx])
+
+
+class TradeRecorder:
+    """
+    Position och genomförda affärer för ett strömmande backtest. Reglerna är desamma
+    som i simulate_trades: köp bara utan innehav och om start_value räcker till minst
+    en aktie, sälj bara med innehav, högst en åtgärd per dag. Minnet växer bara med
+    antalet affärer, inte med antalet dagar.
+    """
+    def __init__(self, start_value=10000):
+        self.start_value = start_value
+        self.bars = 0
+        self.holding = False
+        self.buy_idx, self.sell_idx = [], []
+        self.buy_prices, self.sell_prices = [], []
+        self.shares = []
+        self.dates = {}  # Dagindex -> datum, bara för dagar med affärer
+
+    def record(self, date, price, buy, sell):
+        """
+        Registrerar en dag och genomför köp eller sälj om signalen tillåter det.
+        :return: "buy", "sell" eller None.
+        """
+        i = self.bars
+        self.bars += 1
+        if not self.holding:
+            if not buy:
+                return None
+            shares = self.start_value // price
+            if shares <= 0:
+                return None
+            self.buy_idx.append(i)
+            self.buy_prices.append(price)
+            self.shares.append(shares)
+            action = "buy"
+        elif sell:
+            self.sell_idx.append(i)
+            self.sell_prices.append(price)
+            action = "sell"
+        else:
+            return None
+
+        self.holding = not self.holding
+        self.dates[i] = Date.fromisoformat(date) if isinstance(date, str) else date
+        return action
+
+    def ledger(self):
+        return TradeLedger.from_trades(self.buy_idx, self.sell_idx, self.buy_prices, self.sell_prices, self.shares)
+
+
+def ledger_summary(ledger, start_value=10000):
+    """Sammanfattar en TradeLedger som en dict med antal affärer, resultat och avkastning."""
+    return {
+        "num_trades": ledger.num_trades,
+        "total_profit": ledger.total_profit,
+        "total_percentage_profit": ledger.total_percentage_profit,
+        "return_pct": (ledger.total_profit / start_value) * 100 if start_value else 0.0,
+        "open_position": len(ledger.buy_idx) > ledger.num_trades,
+    }
+
+
+def equity_curve(prices, ledger, start_value=10000):
+    """
+    Värdet per dag för en TradeLedger: startkapitalet plus realiserad vinst och
+    orealiserad vinst i en öppen position. Säljdagen ingår i den realiserade vinsten.
+    :param prices: Priserna som ledgern simulerades på.
+    :return: NumPy-array med ett värde per dag.
+    """
+    prices = np.asarray(prices, dtype=float)
+    n = len(prices)
+    closed = ledger.num_trades
+    ends = np.concatenate((ledger.sell_idx, np.full(len(ledger.buy_idx) - closed, n, dtype=np.intp)))
+
+    # Innehav och anskaffningsvärde per dag, som differenser som summeras
+    held = np.zeros(n + 1)
+    cost = np.zeros(n + 1)
+    np.add.at(held, ledger.buy_idx, ledger.shares)
+    np.add.at(held, ends, -ledger.shares)
+    np.add.at(cost, ledger.buy_idx, ledger.shares * ledger.buy_prices)
+    np.add.at(cost, ends, -ledger.shares * ledger.buy_prices)
+    realized = np.zeros(n + 1)
+    np.add.at(realized, ledger.sell_idx, ledger.profit)
+
+    held, cost, realized = np.cumsum(held)[:n], np.cumsum(cost)[:n], np.cumsum(realized)[:n]
+    return start_value + realized + held * prices - cost
+
+
+@profiled("strategi: print_trades")
+def print_trades(dates, ledger):
+    """Skriver ut köp- och säljsignaler samt en sammanfattning i konsolen."""
+    for n, i in enumerate(ledger.buy_idx):
+        print(
+            f"📈 Köp-signal: {dates[i].strftime('%Y-%m-%d')} - Köp {ledger.shares[n]} aktier till {ledger.buy_prices[n]:.2f} SEK")
+        if n < ledger.num_trades:
+            j = ledger.sell_idx[n]
+            print(
+                f"📉 Sälj-signal: {dates[j].strftime('%Y-%m-%d')} - Sålt {ledger.shares[n]} aktier till {ledger.sell_prices[n]:.2f} SEK - Vinst: {ledger.profit[n]:.2f} SEK")
+
+    print(f"\n📊 Totalt antal affärer: {ledger.num_trades}")
+    print(f"💵 Totalt resultat: {ledger.total_profit:.2f} SEK")
+    print(f"📈 Total procentuell avkastning: {ledger.total_percentage_profit:.2f}%")
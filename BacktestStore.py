@@ -0,0 +1,112 @@
+"""
+Sparade backtestresultat i databasen per aktie, strategi och parametrar
+(inklusive startkapital). Varje resultat sparas med aktiens version och
+historikens första dag och återanvänds bara för exakt samma data; när en
+akties kurser ändras tas dess resultat bort.
+"""
+import io
+import json
+import time
+
+import numpy as np
+
+from Backtest import TradeLedger, equity_curve
+
+# Kolumner som history_frame skapar; övriga kolumner i strategins DataFrame sparas för grafen
+BASE_COLUMNS = ("Date", "Price", "Volume")
+LEDGER_ARRAYS = ("buy_idx", "sell_idx", "buy_prices", "sell_prices", "shares")
+
+
+class BacktestResult:
+    """
+    Ett backtest för en aktie: affärerna, sammanfattningen och värdeutvecklingen.
+    DataFrame och värdeutveckling byggs från historiken först när de används.
+    """
+    def __init__(self, history, ledger, summary, start_value, columns=None, attrs=None, cached=False, df=None):
+        self.history = history
+        self.ledger = ledger
+        self.summary = summary
+        self.start_value = start_value
+        self.columns = columns  # Strategins indikatorkolumner, None om de inte sparades
+        self.attrs = attrs or {}
+        self.cached = cached    # True om resultatet hämtades från databasen
+        self._df = df
+        self._equity = None
+
+    @property
+    def equity(self):
+        """Värdet per dag i historiken, enligt Backtest.equity_curve."""
+        if self._equity is None:
+            self._equity = equity_curve(self.history.prices, self.ledger, self.start_value)
+        return self._equity
+
+    @property
+    def dates(self):
+        """Datum per dag som text (YYYY-MM-DD)."""
+        return np.asarray(self.history.days).astype("datetime64[D]").astype(str)
+
+    @property
+    def df(self):
+        """DataFrame som från strategins backtest(), för grafen. None om kolumnerna inte sparades."""
+        if self._df is None and self.columns is not None:
+            from Strategy import history_frame
+
+            df = history_frame(self.history)
+            for name, values in self.columns.items():
+                df[name] = values
+            df.attrs.update(self.attrs)
+            self._df = df
+        return self._df
+
+
+class BacktestStore:
+    """Backtestresultat i tabellen backtest_results."""
+    def __init__(self, pool):
+        self.pool = pool  # ConnectionPool; skrivningar går via pool.write()
+        self.conn = pool.writer
+
+    def load(self, symbol_id, strategy, key, first_day, version, need_columns=False):
+        """
+        Hämtar ett sparat resultat för exakt samma data.
+        :param key: Parametrarna som text från IndicatorStore.params_key.
+        :param need_columns: Kräv att strategins kolumner sparades (för grafen i huvudfönstret).
+        :return: (TradeLedger, sammanfattning, kolumner eller None, attrs), eller None om det saknas.
+        """
+        row = self.conn.execute("""
+            SELECT summary, attrs, arrays, has_columns FROM backtest_results
+            WHERE symbol_id = ? AND strategy = ? AND params = ? AND first_day = ? AND version = ?
+        """, (symbol_id, strategy, key, first_day, version)).fetchone()
+        if row is None or (need_columns and not row[3]):
+            return None
+        summary, attrs, blob, has_columns = row
+        with np.load(io.BytesIO(blob), allow_pickle=False) as arrays:
+            ledger = TradeLedger.from_trades(*(arrays[name] for name in LEDGER_ARRAYS))
+            columns = {name[4:]: arrays[name] for name in arrays.files if name.startswith("col_")} \
+                if has_columns else None
+        return ledger, json.loads(summary), columns, json.loads(attrs)
+
+    def save(self, symbol_id, strategy, key, first_day, version, ledger, summary, columns=None, attrs=None):
+        """
+        Sparar ett resultat och ersätter ett äldre för samma aktie, strategi och parametrar.
+        :param columns: Dict kolumnnamn -> array med strategins indikatorer, valfritt.
+        """
+        arrays = {name: np.asarray(getattr(ledger, name)) for name in LEDGER_ARRAYS}
+        arrays.update({f"col_{name}": np.asarray(values, dtype=float) for name, values in (columns or {}).items()})
+        blob = io.BytesIO()
+        np.savez(blob, **arrays)
+        with self.pool.write():
+            self.conn.execute("""
+                INSERT OR REPLACE INTO backtest_results
+                    (symbol_id, strategy, params, first_day, version, created_at, summary, attrs, arrays, has_columns)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (symbol_id, strategy, key, first_day, version, time.time(), json.dumps(summary, default=float),
+                  json.dumps(attrs or {}, default=float), blob.getvalue(), int(columns is not None)))
+
+    def invalidate(self, symbol_id):
+        """Tar bort alla resultat för en aktie. Körs i den pågående transaktionen."""
+        self.conn.execute("DELETE FROM backtest_results WHERE symbol_id = ?", (symbol_id,))
+
+    def clear(self):
+        with self.pool.write():
+            self.conn.execute("DELETE FROM backtest_results")
+
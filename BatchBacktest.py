@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Kör en handelsstrategi över alla aktier i databasen utan grafik, parallellt på flera kärnor.
+
+Exempel:
+    python3 BatchBacktest.py SMA --output resultat.csv --trades affarer.csv
+    python3 BatchBacktest.py ROC --param period=10 --param roc_threshold=2 --workers 32
+"""
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")  # Inga fönster i batchläge
+
+from Database import DatabaseManager
+from StrategyRegistry import strategy_registry
+
+# Namn -> strategiklass för alla registrerade strategier
+STRATEGIES = strategy_registry.load_all()
+
+SUMMARY_COLUMNS = ["name", "bars", "num_trades", "total_profit", "total_percentage_profit", "return_pct",
+                   "open_position", "final_equity", "max_drawdown_pct", "cached", "error"]
+TRADE_COLUMNS = ["name", "buy_date", "buy_price", "sell_date", "sell_price", "shares", "profit"]
+
+# Tillstånd per arbetsprocess, sätts upp en gång av _init_worker
+_worker = {}
+
+
+def _init_worker(db_name, strategy_name, start_value, months, params):
+    _worker["db"] = DatabaseManager(db_name)
+    _worker["strategy_name"] = strategy_name
+    _worker["strategy"] = STRATEGIES[strategy_name]()
+    _worker["start_value"] = start_value
+    _worker["months"] = months
+    _worker["params"] = params
+
+
+def _run_ticker(name):
+    """
+    Kör strategin på en aktie i en arbetsprocess och returnerar (sammanfattning, affärer).
+    Ett sparat resultat för samma data och parametrar återanvänds.
+    """
+    db, strategy, start_value, params = _worker["db"], _worker["strategy"], _worker["start_value"], _worker["params"]
+    summary = {"name": name, "bars": len(db.get_stock_history(name, _worker["months"]))}
+    try:
+        result = db.run_backtest(name, _worker["strategy_name"],
+                                 lambda history: strategy.backtest(history, start_value, **params),
+                                 params, start_value, _worker["months"])
+    except Exception as e:
+        summary["error"] = str(e)
+        return summary, []
+
+    if result is None:
+        summary["error"] = "För lite data"
+        return summary, []
+
+    ledger = result.ledger
+    summary.update(result.summary, cached=result.cached)
+
+    dates = result.dates
+    trades = [
+        {"name": name, "buy_date": dates[b], "buy_price": ledger.buy_prices[n], "sell_date": dates[s],
+         "sell_price": ledger.sell_prices[n], "shares": ledger.shares[n], "profit": ledger.profit[n]}
+        for n, (b, s) in enumerate(zip(ledger.buy_idx, ledger.sell_idx))
+    ]
+    return summary, trades
+
+
+def run_batch(strategy_name, db_name="stocks.db", start_value=10000, months=None, params=None, workers=None,
+              names=None):
+    """
+    Kör en strategi över alla (eller utvalda) aktier på en processpool.
+    :param strategy_name: Nyckel i STRATEGIES, t.ex. "SMA".
+    :param db_name: Sökväg till databasen.
+    :param start_value: Startkapital för testköp.
+    :param months: Antal månader historik, None för hela historiken.
+    :param params: Dict med strategiparametrar, t.ex. {"window_size": 50}.
+    :param workers: Antal processer, standard är antalet kärnor.
+    :param names: Lista med aktienamn, standard är alla aktier i databasen.
+    :return: Generator med (sammanfattning, affärer) per aktie i namnordning.
+    """
+    if names is None:
+        db = DatabaseManager(db_name)
+        names = db.get_stock_names()
+        db.close()
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(names) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_name, strategy_name, start_value, months, params or {})) as pool:
+        yield from pool.map(_run_ticker, names, chunksize=chunksize)
+
+
+def _parse_param(text):
+    key, _, value = text.partition("=")
+    for cast in (int, float):
+        try:
+            return key, cast(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kör en strategi på alla aktier i databasen utan grafik.")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("--db", default="stocks.db", help="Sökväg till databasen")
+    parser.add_argument("--output", default="backtest_results.csv", help="CSV-fil för sammanfattningen per aktie")
+    parser.add_argument("--trades", help="CSV-fil för alla affärer (valfri)")
+    parser.add_argument("--months", type=int, help="Antal månader historik (standard: hela historiken)")
+    parser.add_argument("--start-capital", type=float, help="Startkapital (standard: inställningen start_capital)")
+    parser.add_argument("--param", action="append", default=[], metavar="NAMN=VÄRDE",
+                        help="Strategiparameter, t.ex. window_size=50")
+    parser.add_argument("--workers", type=int, help="Antal processer (standard: antal kärnor)")
+    args = parser.parse_args()
+
+    # Samma standardvärden som i GUI:t, så att sparade resultat kan återanvändas mellan dem
+    db = DatabaseManager(args.db)
+    start_value = args.start_capital or db.get_setting("start_capital") or 10000
+    params = strategy_registry.get(args.strategy).default_params(db.get_setting)
+    db.close()
+    params.update(_parse_param(p) for p in args.param)
+
+    trades_file = open(args.trades, "w", newline="", encoding="utf-8") if args.trades else None
+    with open(args.output, "w", newline="", encoding="utf-8") as summary_file:
+        summary_writer = csv.DictWriter(summary_file, fieldnames=SUMMARY_COLUMNS)
+        summary_writer.writeheader()
+        trade_writer = csv.DictWriter(trades_file, fieldnames=TRADE_COLUMNS) if trades_file else None
+        if trade_writer:
+            trade_writer.writeheader()
+
+        count = 0
+        for summary, trades in run_batch(args.strategy, args.db, start_value, args.months, params, args.workers):
+            summary_writer.writerow(summary)
+            if trade_writer:
+                trade_writer.writerows(trades)
+            count += 1
+
+    if trades_file:
+        trades_file.close()
+    print(f"✅ {args.strategy} kördes på {count} aktier, resultat sparat i {args.output}")
+
+
+if __name__ == "__main__":
+    main()
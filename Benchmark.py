@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Prestandamätning med syntetisk, reproducerbar marknadsdata. Kurserna genereras som
+geometrisk Brownsk rörelse (GBM) med ett fast frö, skrivs som CSV-filer och mäts
+genom hela kedjan: import, historik, strategier, Sharpe ratio och aktielistan.
+Resultatet skrivs som JSON så att körningar kan jämföras över tid.
+
+Exempel:
+    python3 Benchmark.py --profile 100k --output bench.json
+    python3 Benchmark.py --tickers 500 --rows 2000 --compare bench.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date as Date, datetime, timedelta
+
+import matplotlib
+matplotlib.use("Agg")  # Inga fönster under mätningen
+
+import numpy as np
+
+from BatchBacktest import STRATEGIES
+from Database import DatabaseManager
+
+# Profilnamn -> (antal aktier, rader per aktie)
+PROFILES = {
+    "1k": (1, 1000),
+    "100k": (100, 1000),
+    "10M": (5000, 2000),
+}
+
+TRADING_DAYS = 252
+
+# Tid från att Python startar till att huvudfönstret visas
+STARTUP_BUDGET_S = 0.5
+
+# Körs i en ny process så att inga moduler redan är importerade
+_STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+from StockAnalyzer import StockAnalyzer
+window = StockAnalyzer()
+window.show()
+app.processEvents()
+print(time.perf_counter() - start)
+"""
+
+
+def trading_days(rows, last=None):
+    """De senaste rows vardagarna fram till och med last (standard idag), äldst först."""
+    day = last or Date.today()
+    days = []
+    while len(days) < rows:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+
+def generate_ticker(seed, rows, start_price=100.0, drift=0.05, volatility=0.25):
+    """
+    Syntetisk kursserie för en aktie. Samma frö ger alltid samma serie.
+    :param drift: Förväntad avkastning per år.
+    :param volatility: Standardavvikelse per år.
+    :return: (priser, volymer) som NumPy-arrayer.
+    """
+    rng = np.random.default_rng(seed)
+    dt = 1 / TRADING_DAYS
+    shocks = rng.standard_normal(rows)
+    log_returns = (drift - volatility ** 2 / 2) * dt + volatility * np.sqrt(dt) * shocks
+    prices = np.round(start_price * np.exp(np.cumsum(log_returns)), 2)
+    volumes = np.round(rng.lognormal(mean=10, sigma=1, size=rows))
+    return prices, volumes
+
+
+def write_csv(file_path, dates, prices, volumes):
+    """Skriver en serie i importformatet (datum;pris;volym med rubrikrad)."""
+    with open(file_path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile, delimiter=";")
+        writer.writerow(["Date", "Price", "Volume"])
+        writer.writerows(zip((d.isoformat() for d in dates), prices.tolist(), volumes.astype(np.int64).tolist()))
+
+
+def generate_dataset(directory, tickers, rows, seed=42):
+    """
+    Skriver en CSV-fil per aktie i directory.
+    :return: Lista av (aktienamn, sökväg).
+    """
+    dates = trading_days(rows)
+    files = []
+    for n in range(tickers):
+        name = f"SYN{n:05d}"
+        prices, volumes = generate_ticker(seed + n, rows, start_price=20 + (n % 50) * 10)
+        path = os.path.join(directory, f"{name}.csv")
+        write_csv(path, dates, prices, volumes)
+        files.append((name, path))
+    return files
+
+
+def measure(func, repeat=1):
+    """Kör func repeat gånger. :return: (lista med tider i sekunder, senaste resultatet)."""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+class BenchmarkRun:
+    """Samlar mätningar och skriver dem som JSON."""
+    def __init__(self, meta):
+        self.meta = meta
+        self.results = []
+
+    def add(self, name, times, **info):
+        self.results.append({"name": name, "seconds": times, "min": min(times), "median": statistics.median(times),
+                             **info})
+        print(f"⏱ {name}: {min(times) * 1000:.1f} ms" + "".join(f", {k}={v}" for k, v in info.items()))
+
+    def run(self, name, func, repeat=1, **info):
+        times, result = measure(func, repeat)
+        self.add(name, times, **info)
+        return result
+
+    def to_json(self):
+        return {"meta": self.meta, "results": self.results}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stock_list(db):
+    """Samma arbete som när huvudfönstret fyller aktielistan."""
+    from PyQt5.QtCore import QCoreApplication
+    from StockPicker import SymbolListModel
+
+    app = QCoreApplication.instance() or QCoreApplication([])  # noqa: F841 - modellen behöver en app
+    model = SymbolListModel()
+    model.set_catalog(db.get_symbol_catalog())
+    return model.rowCount()
+
+
+def measure_startup(workdir):
+    """
+    Startar huvudfönstret i en ny process, utan skärm, med en tom databas i workdir.
+    :return: Sekunder från processens start till att fönstret har visats.
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, os.path.dirname(os.path.abspath(__file__))],
+                            cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(workdir, tickers, rows, seed=42, repeat=5, sample=10):
+    """
+    Genererar data, importerar den och mäter varje steg.
+    :param sample: Antal aktier som historik och strategier mäts på.
+    :return: BenchmarkRun.
+    """
+    bench = BenchmarkRun({
+        "tickers": tickers, "rows_per_ticker": rows, "total_rows": tickers * rows, "seed": seed,
+        "repeat": repeat, "timestamp": datetime.now().isoformat(timespec="seconds"), "commit": _git_commit(),
+        "python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+    })
+
+    files = bench.run("generate_csv", lambda: generate_dataset(workdir, tickers, rows, seed), rows=tickers * rows)
+    db = DatabaseManager(os.path.join(workdir, "bench.db"))
+    try:
+        bench.run("import_csv", lambda: [db.import_csv(name, path) for name, path in files], rows=tickers * rows)
+
+        names = [name for name, _ in files[:sample]]
+        bench.run("get_stock_history (full)", lambda: [db.get_stock_history(name, None) for name in names],
+                  repeat, tickers=len(names))
+        bench.run("get_stock_history (6 mån)", lambda: [db.get_stock_history(name, 6) for name in names],
+                  repeat, tickers=len(names))
+
+        histories = [db.get_stock_history(name, None) for name in names]
+        for strategy_name, strategy_class in sorted(STRATEGIES.items()):
+            strategy = strategy_class()
+            bench.run(f"backtest {strategy_name}", lambda: [strategy.backtest(history) for history in histories],
+                      repeat, tickers=len(names))
+
+        bench.run("sharpe (alla aktier)", lambda: db.get_all_risk_metrics(12, 0.02), repeat, tickers=tickers)
+        bench.run("sharpe (en aktie, sparad)", lambda: db.get_risk_metrics(names[0], 12, 0.02), repeat)
+
+        try:
+            bench.run("aktielista", lambda: _stock_list(db), repeat, tickers=tickers)
+        except ImportError as e:
+            print(f"⚠️ Aktielistan mättes inte: {e}")
+
+        try:
+            times = [measure_startup(workdir) for _ in range(repeat)]
+            bench.add("start av huvudfönstret", times, budget=STARTUP_BUDGET_S)
+            if min(times) > STARTUP_BUDGET_S:
+                print(f"⚠️ Starten tog {min(times):.2f} s, budgeten är {STARTUP_BUDGET_S} s")
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            print(f"⚠️ Starten mättes inte: {e}")
+    finally:
+        db.close()
+    return bench
+
+
+def compare(current, previous):
+    """Skriver ut kvoten mot en tidigare körning för mätningar med samma namn."""
+    size = ("tickers", "rows_per_ticker")
+    if any(current["meta"].get(key) != previous["meta"].get(key) for key in size):
+        print("⚠️ Körningarna har olika datamängd, kvoterna är inte jämförbara")
+    before = {result["name"]: result["min"] for result in previous["results"]}
+    for result in current["results"]:
+        if result["name"] in before and result["min"] > 0:
+            ratio = before[result["name"]] / result["min"]
+            print(f"{'🚀' if ratio >= 1 else '🐢'} {result['name']}: {ratio:.2f}x "
+                  f"({before[result['name']] * 1000:.1f} → {result['min'] * 1000:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mäter import, historik, strategier och riskmått på syntetisk data.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="1k", help="Förvald datamängd")
+    parser.add_argument("--tickers", type=int, help="Antal aktier (ersätter profilen)")
+    parser.add_argument("--rows", type=int, help="Rader per aktie (ersätter profilen)")
+    parser.add_argument("--seed", type=int, default=42, help="Frö för slumptalen")
+    parser.add_argument("--repeat", type=int, default=5, help="Antal upprepningar per mätning")
+    parser.add_argument("--sample", type=int, default=10, help="Antal aktier för historik och strategier")
+    parser.add_argument("--workdir", help="Katalog för CSV-filer och databas (standard: temporär)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON-fil för resultatet")
+    parser.add_argument("--compare", help="Tidigare JSON-resultat att jämföra med")
+    args = parser.parse_args()
+
+    tickers, rows = PROFILES[args.profile]
+    tickers = args.tickers or tickers
+    rows = args.rows or rows
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        result = run_benchmarks(workdir, tickers, rows, args.seed, args.repeat, args.sample).to_json()
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Resultat sparat i {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.collections import LineCollection
+
+
+def date_numbers(dates):
+    """Omvandlar datum (datetime64, pandas-kolumn eller lista) till matplotlibs datumtal."""
+    return mdates.date2num(np.asarray(dates, dtype="datetime64[ns]"))
+
+
+def minmax_downsample(values, buckets):
+    """
+    Väljer punkter så att en serie kan ritas med ungefär 2 * buckets punkter utan
+    att toppar och dalar försvinner: index för minsta och största värdet i varje
+    hink, plus första och sista punkten. NaN-värden väljs bara om hela hinken är NaN.
+    :param values: Serien som ska glesas ut.
+    :param buckets: Antal hinkar, normalt diagrammets bredd i pixlar.
+    :return: Sorterade index i values.
+    """
+    n = len(values)
+    if n <= 2 * buckets:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = size * -(-n // size)
+    values = np.asarray(values, dtype=float)
+    nan = np.isnan(values)
+    low = np.pad(np.where(nan, np.inf, values), (0, padded - n), constant_values=np.inf)
+    high = np.pad(np.where(nan, -np.inf, values), (0, padded - n), constant_values=-np.inf)
+
+    starts = np.arange(0, padded, size)
+    mins = low.reshape(-1, size).argmin(axis=1) + starts
+    maxs = high.reshape(-1, size).argmax(axis=1) + starts
+    return np.unique(np.concatenate([mins, maxs, [0, n - 1]]))
+
+
+class Chart:
+    """
+    Ett diagram med prisaxel och en sekundär axel (t.ex. volym) på en matplotlib-figur.
+    Serierna ritas om i samma artister mellan anropen: begin() inleder en ny bild,
+    line()/bars()/markers()/hline() uppdaterar eller skapar artister med en nyckel
+    och finish() tar bort de som inte användes. Långa serier glesas ut till
+    diagrammets bredd i pixlar och räknas om för det synliga intervallet vid zoom.
+    """
+    def __init__(self, figure):
+        self.figure = figure
+        self.ax = figure.add_subplot(111)
+        self.secondary_ax = self.ax.twinx()
+        self.ax.xaxis_date()
+        self.ax.tick_params(axis="x", labelrotation=45)
+        self.series = {}   # Nyckel -> [x, y, artist]
+        self.artists = {}  # Nyckel -> artist för markeringar och horisontella linjer
+        self.used = set()
+
+        self.ax.callbacks.connect("xlim_changed", lambda ax: self.refresh())
+        figure.canvas.mpl_connect("resize_event", lambda event: self.refresh())
+
+    def begin(self, title=""):
+        """Inleder en ny bild. Artister som inte används före finish() tas bort."""
+        self.used.clear()
+        self.ax.set_title(title)
+        self.set_labels()
+
+    def set_labels(self, xlabel="Datum", ylabel="Pris (SEK)", secondary_ylabel=""):
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.secondary_ax.set_ylabel(secondary_ylabel)
+
+    def line(self, key, dates, values, label=None, secondary=False, **style):
+        """Ritar en linje som glesas ut efter diagrammets bredd."""
+        ax = self.secondary_ax if secondary else self.ax
+        artist = self._reuse(key, ax, type_name="Line2D", style=style)
+        if artist is None:
+            artist, = ax.plot([], [], **style)
+            artist.chart_style = style
+        artist.set_label(label or "_nolegend_")
+        self.series[key] = [date_numbers(dates), np.asarray(values, dtype=float), artist]
+
+    def bars(self, key, dates, values, label=None, secondary=True, color="green", alpha=0.3):
+        """Ritar staplar från noll, t.ex. volym, som en samling vertikala linjer."""
+        ax = self.secondary_ax if secondary else self.ax
+        artist = self._reuse(key, ax, type_name="LineCollection")
+        if artist is None:
+            artist = ax.add_collection(LineCollection([], colors=color, alpha=alpha), autolim=False)
+        else:
+            artist.set(color=color, alpha=alpha)
+        artist.set_label(label or "_nolegend_")
+        self.series[key] = [date_numbers(dates), np.asarray(values, dtype=float), artist]
+
+    def markers(self, key, dates, values, label=None, secondary=False, **style):
+        """Ritar enskilda punkter, t.ex. köp- och säljsignaler. De glesas inte ut."""
+        ax = self.secondary_ax if secondary else self.ax
+        offsets = np.column_stack([date_numbers(dates), np.asarray(values, dtype=float)]).reshape(-1, 2)
+        artist = self._reuse(key, ax, type_name="PathCollection", style=style)
+        if artist is None:
+            artist = ax.scatter([], [], **style)
+            artist.chart_style = style
+        artist.set_offsets(offsets)
+        artist.set_label(label or "_nolegend_")
+        self.artists[key] = artist
+
+    def hline(self, key, y, label=None, **style):
+        """Ritar en horisontell linje över hela diagrammet på prisaxeln."""
+        artist = self._reuse(key, self.ax, type_name="Line2D", style=style)
+        if artist is None:
+            artist = self.ax.axhline(y, **style)
+            artist.chart_style = style
+        else:
+            artist.set_ydata([y, y])
+        artist.set_label(label or "_nolegend_")
+        self.artists[key] = artist
+
+    def finish(self):
+        """Tar bort oanvända artister, anpassar axlarna efter datan och ritar om."""
+        for store in (self.series, self.artists):
+            for key in [key for key in store if key not in self.used]:
+                artist = store.pop(key)
+                (artist[2] if isinstance(artist, list) else artist).remove()
+
+        has_secondary = any(self._axis_of(key) is self.secondary_ax for key in self.used)
+        self.secondary_ax.set_visible(has_secondary)
+        self._set_ylim(self.ax)
+        if has_secondary:
+            self._set_ylim(self.secondary_ax)
+
+        xs = [x for x, _, _ in self.series.values() if len(x)]
+        if xs:
+            self.ax.set_xlim(min(x[0] for x in xs), max(x[-1] for x in xs))  # Anropar refresh()
+        else:
+            self.refresh()
+
+        # En gemensam förklaring för båda axlarna, på den översta
+        for ax in (self.ax, self.secondary_ax):
+            if ax.get_legend():
+                ax.get_legend().remove()
+        handles = [artist for artist in self._all_artists() if not artist.get_label().startswith("_")]
+        if handles:
+            (self.secondary_ax if has_secondary else self.ax).legend(handles=handles, loc="upper left")
+        self.ax.grid(True, linestyle="--", alpha=0.6)
+        self.figure.canvas.draw_idle()
+
+    def refresh(self):
+        """Glesar ut alla serier för det synliga x-intervallet och diagrammets bredd i pixlar."""
+        if not self.series:
+            return
+        low, high = self.ax.get_xlim()
+        width = max(int(self.ax.get_window_extent().width), 100)
+        for x, y, artist in self.series.values():
+            # En punkt utanför på varje sida så att linjen fortsätter till kanten
+            first = max(int(np.searchsorted(x, low)) - 1, 0)
+            last = min(int(np.searchsorted(x, high, side="right")) + 1, len(x))
+            index = minmax_downsample(y[first:last], width) + first
+            if isinstance(artist, LineCollection):
+                bottoms = np.column_stack([x[index], np.zeros(len(index))])
+                tops = np.column_stack([x[index], y[index]])
+                artist.set_segments(np.stack([bottoms, tops], axis=1))
+            else:
+                artist.set_data(x[index], y[index])
+
+    def _reuse(self, key, ax, type_name, style=None):
+        """
+        Returnerar den befintliga artisten för key om den kan återanvändas, annars tas den bort.
+        En artist återanvänds bara med exakt samma stil, så att ingen stil från en tidigare
+        bild (t.ex. linestyle) ligger kvar när nästa bild inte anger den.
+        """
+        self.used.add(key)
+        existing = self.series.get(key) or self.artists.get(key)
+        if existing is None:
+            return None
+        artist = existing[2] if isinstance(existing, list) else existing
+        if artist.axes is ax and type(artist).__name__ == type_name and getattr(artist, "chart_style", style) == style:
+            return artist
+        artist.remove()
+        self.series.pop(key, None)
+        self.artists.pop(key, None)
+        return None
+
+    def _axis_of(self, key):
+        entry = self.series.get(key) or self.artists.get(key)
+        return (entry[2] if isinstance(entry, list) else entry).axes
+
+    def _all_artists(self):
+        return [entry[2] for entry in self.series.values()] + list(self.artists.values())
+
+    def _set_ylim(self, ax):
+        """Y-axelns gränser från hela seriernas min och max, med 5 % marginal."""
+        lows, highs = [], []
+        for x, y, artist in self.series.values():
+            if artist.axes is ax and np.isfinite(y).any():
+                lows.append(0 if isinstance(artist, LineCollection) else np.nanmin(y))
+                highs.append(np.nanmax(y))
+        for artist in self.artists.values():
+            if artist.axes is ax:
+                y = artist.get_offsets()[:, 1] if hasattr(artist, "get_offsets") else artist.get_ydata()
+                if len(y):
+                    lows.append(np.min(y))
+                    highs.append(np.max(y))
+        if lows:
+            low, high = min(lows), max(highs)
+            margin = (high - low) * 0.05 or abs(high) * 0.05 or 1
+            ax.set_ylim(low - margin, high + margin)
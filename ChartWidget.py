@@ -0,0 +1,25 @@
+import matplotlib
+matplotlib.use("Qt5Agg")  # Om du använder en Qt-baserad miljö
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT
+from matplotlib.figure import Figure
+from PyQt5.QtWidgets import QVBoxLayout, QWidget
+
+from Chart import Chart
+
+
+class ChartWidget(QWidget):
+    """
+    Inbäddat diagram i huvudfönstret. Samma figur och canvas används för alla
+    grafer; verktygsraden ger zoom och panorering, och vid zoom ritas det synliga
+    intervallet om med full detaljnivå.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.figure = Figure(figsize=(10, 6), tight_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        self.chart = Chart(self.figure)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.toolbar)
+        layout.addWidget(self.canvas)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Kolumnvis import och export av kurshistorik som Parquet eller Arrow IPC (Feather v2),
+som en fil eller partitionerad per aktie eller år (name=.../ eller year=.../).
+Datan läses och skrivs i RecordBatch:ar, så varken filen eller tabellen behöver
+få plats i minnet. Kräver pyarrow, som bara importeras när funktionerna används.
+
+Exempel:
+    python3 ColumnarIO.py import leverantor/kurser.parquet
+    python3 ColumnarIO.py import leverantor/ --format parquet
+    python3 ColumnarIO.py export export/ --format arrow --partition-by year
+"""
+import argparse
+import os
+from urllib.parse import quote
+
+import numpy as np
+
+from Database import DatabaseManager, OperationCancelled
+
+# Kolumner i exporterade filer; vid import godtas även alias för varje kolumn
+COLUMNS = ("name", "date", "price", "volume")
+ALIASES = {
+    "name": ("name", "ticker", "symbol"),
+    "date": ("date", "the_date", "day"),
+    "price": ("price", "close"),
+    "volume": ("volume",),
+}
+
+# Filändelse -> format
+EXTENSIONS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+PARTITIONS = ("ticker", "year")
+
+
+def _arrow():
+    """Importerar pyarrow först när det behövs, med ett tydligt fel om det saknas."""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet- och Arrow-filer kräver pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def detect_format(path):
+    """Format ("parquet" eller "arrow") från filändelsen, eller från första filen i en katalog."""
+    if os.path.isdir(path):
+        for _, _, files in os.walk(path):
+            for file_name in sorted(files):
+                file_format = EXTENSIONS.get(os.path.splitext(file_name)[1].lower())
+                if file_format:
+                    return file_format
+        raise ValueError(f"Hittade inga Parquet- eller Arrow-filer i {path}")
+    file_format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Okänt filformat för {path}, ange parquet eller arrow")
+    return file_format
+
+
+def _resolve_columns(schema_names, single_name):
+    """Väljer kolumn i filen för varje kolumn i COLUMNS. :return: Dict kolumn -> namn i filen."""
+    lower = {name.lower(): name for name in schema_names}
+    columns = {}
+    for column, aliases in ALIASES.items():
+        found = next((lower[alias] for alias in aliases if alias in lower), None)
+        if found is not None:
+            columns[column] = found
+    required = ["date", "price"] + ([] if single_name else ["name"])
+    missing = [column for column in required if column not in columns]
+    if missing:
+        raise ValueError(f"Kolumner saknas: {', '.join(missing)} (finns: {', '.join(schema_names)})")
+    return columns
+
+
+def _day_numbers(pa, column):
+    """Datumkolumn (date, timestamp, text 'YYYY-MM-DD' eller dagnummer) som dagnummer sedan 1970-01-01."""
+    pc = pa.compute
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        column = pc.strptime(column, format="%Y-%m-%d", unit="s")
+    if pa.types.is_timestamp(column.type) or pa.types.is_date64(column.type):
+        column = column.cast(pa.date32())
+    if pa.types.is_date32(column.type):
+        column = column.cast(pa.int32())
+    return column.cast(pa.int64())
+
+
+def _normalize(pa, batch, columns, single_name):
+    """
+    Gör om en RecordBatch till arrayer med kolumnerna i COLUMNS. Rader med saknade
+    värden eller pris och volym som inte är ändliga tal (NaN, ±inf) tas bort, som
+    parse_price_row gör för CSV-rader.
+    :return: (namn som Arrow-array eller None, dagar, priser, volymer, antal bortagna).
+    """
+    pc = pa.compute
+    days = _day_numbers(pa, batch.column(columns["date"]))
+    prices = batch.column(columns["price"]).cast(pa.float64())
+    if "volume" in columns:
+        volumes = pc.round(batch.column(columns["volume"]).cast(pa.float64()))
+    else:
+        volumes = pa.array(np.zeros(batch.num_rows, dtype=np.float64))
+    names = None if single_name else batch.column(columns["name"]).cast(pa.string())
+
+    # is_finite ger null för saknade värden; de räknas också som ogiltiga
+    valid = pc.and_(pc.and_(pc.is_valid(days), pc.is_finite(prices)), pc.is_finite(volumes))
+    if names is not None:
+        valid = pc.and_(valid, pc.is_valid(names))
+    valid = pc.fill_null(valid, False)
+    rejected = batch.num_rows - pc.sum(valid.cast(pa.int64())).as_py() if batch.num_rows else 0
+    if rejected:
+        days, prices, volumes = pc.filter(days, valid), pc.filter(prices, valid), pc.filter(volumes, valid)
+        names = None if names is None else pc.filter(names, valid)
+    # Volymen görs om till heltal först när NaN och inf är bortfiltrerade
+    return names, days.to_numpy(), prices.to_numpy(), volumes.cast(pa.int64()).to_numpy(), rejected
+
+
+def import_columnar(db, path, file_format=None, name=None, batch_size=100000, progress=None, cancelled=None):
+    """
+    Importerar kurser från en Parquet- eller Arrow-fil eller en partitionerad katalog.
+    Kolumnerna omvandlas vektoriserat och skrivs med DatabaseManager.import_arrays i en
+    enda transaktion. Aktienamnen slås upp en gång per unikt namn och batch.
+    :param file_format: "parquet" eller "arrow", standard är att gissa från filändelsen.
+    :param name: Importera alla rader till den här aktien; annars används kolumnen name.
+    :param progress: Anropas med (antal lästa rader, totalt antal rader) efter varje batch.
+    :param cancelled: Funktion som returnerar True om importen ska avbrytas.
+    :return: Dict med antal tillagda, uppdaterade och avvisade rader samt antal aktier.
+    """
+    pa = _arrow()
+    file_format = file_format or detect_format(path)
+    dataset = pa.dataset.dataset(path, format="parquet" if file_format == "parquet" else "ipc",
+                                 partitioning="hive")
+    columns = _resolve_columns(dataset.schema.names, name)
+    total = dataset.count_rows()
+    rejected = 0
+    read = 0
+
+    def batches():
+        nonlocal rejected, read
+        for batch in dataset.to_batches(columns=list(dict.fromkeys(columns.values())), batch_size=batch_size):
+            read += batch.num_rows
+            names, days, prices, volumes, bad = _normalize(pa, batch, columns, name)
+            rejected += bad
+            if name:
+                symbol_ids = np.full(len(days), db.lookup_symbol_ids([name])[name], dtype=np.int64)
+            else:
+                unique = pa.compute.unique(names)
+                ids = db.lookup_symbol_ids(unique.to_pylist())
+                lookup = np.array([ids[n] for n in unique.to_pylist()], dtype=np.int64)
+                symbol_ids = lookup[pa.compute.index_in(names, value_set=unique).to_numpy()]
+            yield symbol_ids, days, prices, volumes
+
+    summary = db.import_arrays(batches(), progress=progress and (lambda _: progress(read, total)),
+                               cancelled=cancelled)
+    summary["rejected"] = rejected
+    return summary
+
+
+class _PartitionWriters:
+    """Öppna skrivare per partition; en fil per partition och format."""
+    def __init__(self, pa, path, file_format, schema):
+        self.pa = pa
+        self.path = path
+        self.file_format = file_format
+        self.schema = schema
+        self.writers = {}
+
+    def write(self, key, batch):
+        writer = self.writers.get(key)
+        if writer is None:
+            writer = self.writers[key] = self._open(key)
+        if self.file_format == "parquet":
+            writer.write_table(self.pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+
+    def _open(self, key):
+        extension = ".parquet" if self.file_format == "parquet" else ".arrow"
+        if key is None:
+            file_path = self.path
+            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        else:
+            directory = os.path.join(self.path, key)
+            os.makedirs(directory, exist_ok=True)
+            file_path = os.path.join(directory, "part-0" + extension)
+        if self.file_format == "parquet":
+            return self.pa.parquet.ParquetWriter(file_path, self.schema)
+        return self.pa.ipc.new_file(file_path, self.schema)
+
+    def close(self, key=None):
+        """Stänger en partitions skrivare, eller alla om key är None."""
+        keys = list(self.writers) if key is None else [key]
+        for k in keys:
+            writer = self.writers.pop(k, None)
+            if writer is not None:
+                writer.close()
+
+
+def export_columnar(db, path, file_format="parquet", partition_by=None, names=None, batch_size=100000,
+                    progress=None, cancelled=None):
+    """
+    Exporterar kurshistoriken aktie för aktie från de minnesmappade ögonblicksbilderna,
+    batch_size rader per RecordBatch, så att hela tabellen aldrig läses in på en gång.
+    :param path: Fil, eller katalog om partition_by anges.
+    :param file_format: "parquet" eller "arrow".
+    :param partition_by: None, "ticker" (katalogen name=<aktie>) eller "year" (year=<år>).
+                         Vid "ticker" finns namnet bara i katalognamnet, som i Hive.
+    :param names: Aktier att exportera, standard är alla.
+    :param progress: Anropas med (antal klara aktier, antal aktier).
+    :return: Antal exporterade rader.
+    """
+    pa = _arrow()
+    names = db.get_stock_names() if names is None else list(names)
+    fields = [("name", pa.string()), ("date", pa.date32()), ("price", pa.float64()), ("volume", pa.int64())]
+    if partition_by == "ticker":
+        fields = fields[1:]
+    schema = pa.schema(fields)
+    writers = _PartitionWriters(pa, path, file_format, schema)
+
+    exported = 0
+    try:
+        for n, name in enumerate(names):
+            if cancelled and cancelled():
+                raise OperationCancelled(f"Exporten till {path} avbröts")
+            history = db.get_stock_history(name, None)
+            days = np.asarray(history.days)
+            if partition_by == "year":
+                years = days.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64) + 1970
+                bounds = np.concatenate(([0], np.flatnonzero(np.diff(years)) + 1, [len(days)]))
+                parts = [(f"year={years[start]}", start, end) for start, end in zip(bounds[:-1], bounds[1:])]
+            else:
+                parts = [(None if partition_by is None else f"name={quote(name, safe='')}", 0, len(days))]
+
+            for key, start, end in parts:
+                for first in range(start, end, batch_size):
+                    last = min(first + batch_size, end)
+                    arrays = [pa.array(days[first:last].astype(np.int32)).cast(pa.date32()),
+                              pa.array(np.asarray(history.prices[first:last], dtype=np.float64)),
+                              pa.array(np.asarray(history.volumes[first:last], dtype=np.int64))]
+                    if partition_by != "ticker":
+                        arrays.insert(0, pa.repeat(pa.scalar(name, pa.string()), last - first))
+                    writers.write(key, pa.record_batch(arrays, schema=schema))
+                    exported += last - first
+            if partition_by == "ticker":
+                writers.close(parts[0][0])  # Aldrig mer än en öppen fil per aktie
+            if progress:
+                progress(n + 1, len(names))
+    finally:
+        writers.close()
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import och export av kurshistorik som Parquet eller Arrow.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help="Fil eller katalog")
+    parser.add_argument("--db", default="stocks.db", help="Sökväg till databasen")
+    parser.add_argument("--format", choices=("parquet", "arrow"), help="Filformat (standard: från filändelsen)")
+    parser.add_argument("--name", help="Importera alla rader till den här aktien")
+    parser.add_argument("--partition-by", choices=PARTITIONS, help="Partitionera exporten per aktie eller år")
+    parser.add_argument("--stocks", help="Kommaseparerade aktier att exportera (standard: alla)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        if args.command == "import":
+            summary = import_columnar(db, args.path, args.format, args.name)
+            print(f"✅ Importerade {summary['inserted']} nya och {summary['updated']} uppdaterade rader för "
+                  f"{summary['stocks']} aktier, {summary['rejected']} rader saknade värden")
+        else:
+            file_format = args.format or ("parquet" if args.partition_by else detect_format(args.path))
+            rows = export_columnar(db, args.path, file_format, args.partition_by,
+                                   args.stocks.split(",") if args.stocks else None)
+            print(f"✅ Exporterade {rows} rader till {args.path}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
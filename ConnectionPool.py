@@ -0,0 +1,141 @@
+"""
+Anslutningar till SQLite-databasen i WAL-läge. Varje DatabaseManager har en
+skrivanslutning och en skrivskyddad läsanslutning per tråd. I WAL-läge blockerar
+skrivningar inte läsningar, så GUI:t, bakgrundsuppgifter och parallella backtest
+i andra processer kan läsa medan en import skriver. Skrivningar serialiseras av
+SQLite: en skrivtransaktion tar låset direkt med BEGIN IMMEDIATE och väntar
+upp till busy_timeout på en annan skrivare i stället för att ge "database is locked".
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+BUSY_TIMEOUT_MS = 30000  # Hur länge en anslutning väntar på ett lås innan den ger upp
+
+
+def _in_memory(db_name):
+    return db_name == ":memory:" or db_name == "" or "mode=memory" in db_name
+
+
+def connect_writer(db_name, busy_timeout=BUSY_TIMEOUT_MS):
+    """
+    Öppnar en skrivanslutning och slår på WAL-läge. WAL sparas i databasfilen,
+    så det behöver bara slås på en gång; synchronous=NORMAL är säkert i WAL-läge.
+    """
+    conn = sqlite3.connect(db_name, timeout=busy_timeout / 1000)
+    if not _in_memory(db_name):
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def connect_reader(db_name, busy_timeout=BUSY_TIMEOUT_MS):
+    """
+    Öppnar en skrivskyddad anslutning i autocommit-läge; lästransaktioner startas
+    uttryckligen med ConnectionPool.read(). Får stängas från en annan tråd.
+    """
+    uri = f"file:{quote(os.path.abspath(db_name))}?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=busy_timeout / 1000, isolation_level=None,
+                           check_same_thread=False)
+
+
+class ConnectionPool:
+    """
+    En skrivanslutning och en läsanslutning per tråd och process för samma databas.
+    Databaser i minnet har bara skrivanslutningen, som då också används för läsning.
+    """
+    def __init__(self, db_name, busy_timeout=BUSY_TIMEOUT_MS):
+        self.db_name = db_name
+        self.busy_timeout = busy_timeout
+        self.writer = connect_writer(db_name, busy_timeout)
+        self.in_memory = _in_memory(db_name)
+        self.local = threading.local()
+        self.readers = []  # Alla öppna läsanslutningar, så att close() kan stänga dem
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.trace_callback = None  # Sätts på alla anslutningar, även läsare som öppnas senare
+        self.write_depth = 0  # Antal nästlade write()-block; bara det yttersta committar
+
+    def reader(self):
+        """Den här trådens skrivskyddade anslutning; öppnas första gången den används."""
+        if self.in_memory:
+            return self.writer
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            # Anslutningar som ärvts vid fork får inte användas i den nya processen
+            conn = connect_reader(self.db_name, self.busy_timeout)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+            with self.lock:
+                self.readers.append(conn)
+                conn.set_trace_callback(self.trace_callback)
+        return conn
+
+    def set_trace_callback(self, callback):
+        """
+        Sätter sqlite3:s trace callback på skrivanslutningen och alla läsanslutningar,
+        även de som öppnas senare, t.ex. för profileringens frågeräkning. None stänger av.
+        """
+        with self.lock:
+            self.trace_callback = callback
+            readers = list(self.readers)
+        for conn in [self.writer] + readers:
+            try:
+                conn.set_trace_callback(callback)
+            except sqlite3.ProgrammingError:
+                pass  # Stängd, eller skrivanslutningen i en annan tråd
+
+    @contextmanager
+    def read(self):
+        """
+        Lästransaktion på trådens läsanslutning: alla frågor i blocket ser samma
+        version av databasen, även om någon annan skriver under tiden. Block i
+        block återanvänder den yttre transaktionen.
+        :return: Läsanslutningen.
+        """
+        conn = self.reader()
+        if conn is self.writer or conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def write(self):
+        """
+        Skrivtransaktion på skrivanslutningen, som with conn: men låset tas direkt
+        med BEGIN IMMEDIATE. Har en transaktion redan startats (t.ex. av en INSERT)
+        fortsätter blocket i den. Committas när blocket lämnas, rullas tillbaka vid fel.
+        Block i block ingår i den yttre transaktionen: de committar inte själva, och
+        ett fel som lämnar dem rullar tillbaka hela transaktionen i det yttre blocket.
+        :return: Skrivanslutningen.
+        """
+        if self.write_depth:
+            self.write_depth += 1
+            try:
+                yield self.writer
+            finally:
+                self.write_depth -= 1
+            return
+        if not self.writer.in_transaction:
+            self.writer.execute("BEGIN IMMEDIATE")
+        self.write_depth = 1
+        try:
+            with self.writer:
+                yield self.writer
+        finally:
+            self.write_depth = 0
+
+    def close(self):
+        with self.lock:
+            readers, self.readers = self.readers, []
+        if self.pid == os.getpid():
+            for conn in readers:
+                conn.close()
+        self.writer.close()
@@ -1,110 +1,845 @@
 #!/usr/bin/env python3
-import sqlite3
+import csv
+import math
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import date as Date
+from itertools import islice
+
+import numpy as np
+
+from Backtest import equity_curve, ledger_summary
+from BacktestStore import BASE_COLUMNS, BacktestResult, BacktestStore
+from ConnectionPool import ConnectionPool
+from IndicatorCache import indicator_cache
+from IndicatorStore import IndicatorStore, params_key
+from Profiler import profiled, profiler
+from RiskMetrics import METRICS, RiskMetricsStore, compute_risk_metrics
+from Settings import SettingsCache
+from Snapshot import SNAPSHOT_DTYPE, PriceHistory, SnapshotStore
+
+# Versionen av databasschemat som den här koden förväntar sig (PRAGMA user_version)
+SCHEMA_VERSION = 7
+
+# Datum lagras som heltal: antal dagar sedan 1970-01-01
+EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+JULIAN_EPOCH = 2440587.5  # julianday('1970-01-01')
+
+
+# Räknar om en akties rad i symbolkatalogen från prices och räknar upp dess version
+REFRESH_CATALOG_SQL = """
+    UPDATE symbols SET (first_day, last_day, row_count) = (
+        SELECT MIN(day), MAX(day), COUNT(*) FROM prices WHERE symbol_id = symbols.id
+    ), version = version + 1
+    WHERE id = ?
+"""
+
+# Lägger till en kurs eller uppdaterar pris och volym om dagen redan finns
+UPSERT_PRICE_SQL = """
+    INSERT INTO prices (symbol_id, day, price, volume) VALUES (?, ?, ?, ?)
+    ON CONFLICT(symbol_id, day) DO UPDATE SET price = excluded.price, volume = excluded.volume
+"""
+
+
+class OperationCancelled(Exception):
+    """En långvarig operation avbröts av användaren; ändringarna har rullats tillbaka."""
+
+
+def date_to_day(text):
+    """Omvandlar 'YYYY-MM-DD' till dagnummer sedan 1970-01-01."""
+    return Date.fromisoformat(text.strip()).toordinal() - EPOCH_ORDINAL
+
+
+def day_to_date(day):
+    """Omvandlar ett dagnummer sedan 1970-01-01 till 'YYYY-MM-DD'."""
+    return Date.fromordinal(int(day) + EPOCH_ORDINAL).isoformat()
+
+
+def parse_price_row(row):
+    """
+    Tolkar en CSV-rad (datum;pris;volym) med decimalpunkt eller decimalkomma.
+    :return: (dagnummer, pris, volym). Kastar ValueError om raden inte går att tolka
+             eller om pris eller volym inte är ändliga tal (t.ex. "nan" eller "inf").
+    """
+    date, price_str, volume_str = row
+    price, volume = float(price_str.replace(',', '.')), float(volume_str.replace(',', '.'))
+    if not (math.isfinite(price) and math.isfinite(volume)):
+        raise ValueError(f"Pris och volym måste vara ändliga tal: {price_str};{volume_str}")
+    return date_to_day(date), price, volume
+
+
+def read_price_rows(reader, summary):
+    """
+    Tolkar raderna från en csv.reader med parse_price_row. Rader som inte går att
+    tolka räknas i summary["rejected"], utom en rubrikrad först i filen.
+    :return: Generator med (dagnummer, pris, volym).
+    """
+    for row in reader:
+        if len(row) != 3:
+            summary["rejected"] += 1
+            continue
+        try:
+            yield parse_price_row(row)
+        except ValueError:
+            # En rubrikrad först i filen hamnar också här och räknas inte som avvisad
+            if reader.line_num > 1 or not _is_header(row):
+                summary["rejected"] += 1
+
+
+def _is_header(row):
+    """En rad är en rubrikrad om första fältet inte är ett datum."""
+    try:
+        date_to_day(row[0])
+    except ValueError:
+        return True
+    return False
+
 
 class DatabaseManager:
-    def __init__(self, db_name="stocks.db"):
+    def __init__(self, db_name="stocks.db", snapshot_dir=None):
+        """
+        :param db_name: Sökväg till databasen.
+        :param snapshot_dir: Katalog för minnesmappade ögonblicksbilder av historiken,
+                             standard är <databasnamn>_snapshots bredvid databasen. Bilderna
+                             ligger i en underkatalog per databas-id, så en ny databas med
+                             samma namn aldrig får en gammal databas bilder.
+        """
         self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name)
-        self.cursor = self.conn.cursor()
+        # Skrivningar går via self.conn; läsningar via en läsanslutning per tråd i WAL-läge
+        self.pool = ConnectionPool(db_name)
+        self.conn = self.pool.writer
+        profiler.register(self)  # Frågorna räknas per åtgärd när profileringen är på
+        self.symbol_ids = {}  # Cache namn -> symbol_id
         self.create_tables()
+        self.database_id = self._database_id()
+        self.settings = SettingsCache(self.pool)
+        self.indicators = IndicatorStore(self.pool)
+        self.risk_metrics = RiskMetricsStore(self.pool)
+        self.backtests = BacktestStore(self.pool)
 
-    def create_tables(self):
-        # Skapa tabellen för aktier om den inte finns
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stocks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL, 
-                the_date TEXT NOT NULL,                       
-                price REAL NOT NULL,
-                volume INTEGER NOT NULL DEFAULT 0,  -- Ny kolumn för volym
-                UNIQUE(name, the_date)
-            )
-        """)
+        if snapshot_dir is None and db_name != ":memory:":
+            snapshot_dir = os.path.splitext(db_name)[0] + "_snapshots"
+        self.snapshots = SnapshotStore(os.path.join(snapshot_dir, self.database_id)) if snapshot_dir else None
 
+    def create_tables(self):
         # Skapa tabellen för inställningar (settings) om den inte finns
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                setting_type TEXT NOT NULL,  -- Typ av inställning (t.ex. Sharpe Ratio)
-                setting_value TEXT NOT NULL, -- Värdet för inställningen (kan vara sträng, t.ex. "0.02")
-                UNIQUE(setting_type)
-            )
-        """)
+        with self.pool.write():
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS settings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    setting_type TEXT NOT NULL,  -- Typ av inställning (t.ex. Sharpe Ratio)
+                    setting_value TEXT NOT NULL, -- Värdet för inställningen (kan vara sträng, t.ex. "0.02")
+                    UNIQUE(setting_type)
+                )
+            """)
+        self.migrate()
 
-        self.conn.commit()
+    def _database_id(self):
+        """Slumpat id för databasen, skapas första gången och sparas i settings."""
+        query = "SELECT setting_value FROM settings WHERE setting_type = 'database_id'"
+        row = self.conn.execute(query).fetchone()
+        if row is None:
+            with self.pool.write():
+                self.conn.execute("INSERT OR IGNORE INTO settings (setting_type, setting_value) "
+                                  "VALUES ('database_id', ?)", (str(uuid.uuid4()),))
+            row = self.conn.execute(query).fetchone()
+        return row[0]
 
-    def add_stock(self, name, date, price, volume):
-        print (name)
-        print (date)
-        print (price)
-        self.cursor.execute("INSERT INTO stocks (name, the_date, price, volume) VALUES (?, ?, ?, ?)", (name, date, price, volume))
-        self.conn.commit()
+    def migrate(self):
+        """Uppgraderar databasschemat steg för steg till SCHEMA_VERSION."""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            with self.pool.write():
+                MIGRATIONS[target](self.conn)
+                self.conn.execute(f"PRAGMA user_version = {target}")
+        self.conn.execute("VACUUM")  # Frigör utrymmet från gamla tabeller
 
+    @contextmanager
+    def _write(self):
+        """
+        Skrivtransaktion som pool.write(). Rullas den tillbaka glöms också symbol_id:n
+        som skapades i den, så att de inte används efter att ha försvunnit ur databasen.
         """
+        known = dict(self.symbol_ids)
         try:
-            self.cursor.execute("INSERT INTO stocks (name, the_date, price, volume) VALUES (?, ?, ?)", (name, date, price, volume))
-            self.conn.commit()
-        except sqlite3.IntegrityError:
-            # Om aktien redan finns, uppdatera istället för att ge fel
-            self.update_stock_price(name, date, price)
+            with self.pool.write() as conn:
+                yield conn
+        except BaseException:
+            self.symbol_ids = known
+            raise
+
+    def read(self):
+        """
+        Lästransaktion: with db.read(): ... gör att alla läsningar i blocket, i den här
+        tråden, ser samma version av databasen även om någon annan skriver under tiden.
         """
+        return self.pool.read()
+
+    def _symbol_id(self, name, create=False):
+        """Hämtar symbol_id för en aktie, skapar symbolen om create=True. Returnerar None om den saknas."""
+        symbol_id = self.symbol_ids.get(name)
+        if symbol_id is None:
+            conn = self.conn if create else self.pool.reader()
+            if create:
+                with self.pool.write():
+                    conn.execute("INSERT OR IGNORE INTO symbols (name) VALUES (?)", (name,))
+            row = conn.execute("SELECT id FROM symbols WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            symbol_id = self.symbol_ids[name] = row[0]
+        return symbol_id
+
+    @profiled("db: add_stock")
+    def add_stock(self, name, date, price, volume):
+        with self._write():
+            # Symbolen skapas i samma transaktion som kursen, så att den rullas tillbaka om INSERT misslyckas
+            symbol_id = self._symbol_id(name, create=True)
+            self.conn.execute("INSERT INTO prices (symbol_id, day, price, volume) VALUES (?, ?, ?, ?)",
+                              (symbol_id, date_to_day(date), price, volume))
+        self._after_write(symbol_id, date_to_day(date))
+
+    @profiled("db: stock_exists")
     def stock_exists(self, name):
-        self.cursor.execute("SELECT COUNT(*) FROM stocks WHERE name = ?", (name,))
-        return self.cursor.fetchone()[0] > 0
+        symbol_id = self._symbol_id(name)
+        if symbol_id is None:
+            return False
+        row = self.pool.reader().execute("SELECT EXISTS (SELECT 1 FROM prices WHERE symbol_id = ?)",
+                                         (symbol_id,)).fetchone()
+        return row[0] == 1
 
+    @profiled("db: update_stock_price")
     def update_stock_price(self, name, date, new_price, volume):
-        self.cursor.execute(
-            "UPDATE stocks SET price = ?, volume = ? WHERE name = ? AND the_date = ?",
-            (new_price, volume, name, date)
-        )
-        updated_rows = self.cursor.rowcount  # Antal rader som faktiskt uppdaterades
-        self.conn.commit()
+        symbol_id = self._symbol_id(name)
+        with self.pool.write():
+            updated_rows = self.conn.execute(
+                "UPDATE prices SET price = ?, volume = ? WHERE symbol_id = ? AND day = ?",
+                (new_price, volume, symbol_id, date_to_day(date))
+            ).rowcount  # Antal rader som faktiskt uppdaterades
 
         if updated_rows > 0:
+            self._after_write(symbol_id, date_to_day(date))
             print(f"✅ Uppdaterade {name} {date} med nytt pris {new_price} och volym {volume}")
         else:
             print(f"⚠ Ingen rad uppdaterades för {name} {date}. Kontrollera att aktien existerar i databasen!")
 
+    @profiled("db: stock_exists_for_date")
     def stock_exists_for_date(self, name, date):
-        self.cursor.execute("SELECT COUNT(*) FROM stocks WHERE name = ? AND the_date = ?", (name, date))
-        return self.cursor.fetchone()[0] > 0
+        row = self.pool.reader().execute("SELECT COUNT(*) FROM prices WHERE symbol_id = ? AND day = ?",
+                                         (self._symbol_id(name), date_to_day(date))).fetchone()
+        return row[0] > 0
+
+    @profiled("db: import_csv")
+    def import_csv(self, name, file_path, batch_size=10000, progress=None, cancelled=None):
+        """
+        Importerar pris och volym för en aktie från en CSV-fil i en enda transaktion.
+        Filen läses rad för rad (semikolon som separator, decimalkomma tillåtet) och
+        skrivs i batchar med INSERT ... ON CONFLICT, så befintliga datum uppdateras.
+        :param name: Namnet på aktien.
+        :param file_path: Sökväg till CSV-filen (datum;pris;volym, valfri rubrikrad).
+        :param batch_size: Antal rader per executemany-anrop.
+        :param progress: Anropas med (antal lästa tecken, filens storlek) efter varje batch.
+        :param cancelled: Funktion som returnerar True om importen ska avbrytas. Hela
+                          importen rullas då tillbaka och OperationCancelled kastas.
+        :return: Dict med antal tillagda, uppdaterade och avvisade rader.
+        """
+        summary = {"inserted": 0, "updated": 0, "rejected": 0}
+        symbol_id = None
+        rows_before = 0
+        total_size = os.path.getsize(file_path)
+        read_size = 0
+
+        def counted_lines(csvfile):
+            nonlocal read_size
+            for line in csvfile:
+                read_size += len(line)
+                yield line
+
+        accepted = 0
+        first_day = None
+
+        with open(file_path, newline='', encoding='utf-8') as csvfile, self._write():
+            rows = read_price_rows(csv.reader(counted_lines(csvfile), delimiter=';'), summary)
+            while True:
+                if cancelled and cancelled():
+                    raise OperationCancelled(f"Importen av {file_path} avbröts")
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                if symbol_id is None:
+                    # Symbolen skapas i samma transaktion som kurserna, så att en avbruten
+                    # eller misslyckad import (eller en fil utan giltiga rader) inte lämnar den kvar
+                    symbol_id = self._symbol_id(name, create=True)
+                    rows_before = self.conn.execute("SELECT COUNT(*) FROM prices WHERE symbol_id = ?",
+                                                    (symbol_id,)).fetchone()[0]
+                self.conn.executemany(UPSERT_PRICE_SQL, ((symbol_id, *row) for row in batch))
+                accepted += len(batch)
+                batch_first = min(row[0] for row in batch)
+                first_day = batch_first if first_day is None else min(first_day, batch_first)
+                if progress:
+                    progress(min(read_size, total_size), total_size)
+
+        if accepted:
+            summary["inserted"] = self.conn.execute("SELECT COUNT(*) FROM prices WHERE symbol_id = ?",
+                                                    (symbol_id,)).fetchone()[0] - rows_before
+            summary["updated"] = accepted - summary["inserted"]
+            self._after_write(symbol_id, first_day)
+        return summary
 
+    @profiled("db: import_arrays")
+    def import_arrays(self, batches, progress=None, cancelled=None):
+        """
+        Importerar kurser för många aktier från kolumnvisa batchar i en enda transaktion.
+        Varje batch är fyra NumPy-arrayer (symbol_id, dagnummer, pris, volym) som
+        skrivs direkt med INSERT ... ON CONFLICT; inga rader tolkas i Python.
+        Efteråt uppdateras katalog, ögonblicksbild och indikatorer en gång per aktie.
+        :param batches: Iterator med (symbol_ids, days, prices, volumes), id:n från lookup_symbol_ids().
+        :param progress: Anropas med antalet skrivna rader efter varje batch.
+        :param cancelled: Funktion som returnerar True om importen ska avbrytas. Hela
+                          importen rullas då tillbaka och OperationCancelled kastas.
+        :return: Dict med antal tillagda och uppdaterade rader samt antal aktier.
+        """
+        first_days = {}   # symbol_id -> tidigaste skrivna dag
+        rows_before = {}  # symbol_id -> antal rader i katalogen före importen
+        written = 0
+
+        def row_count(symbol_id):
+            row = self.conn.execute("SELECT row_count FROM symbols WHERE id = ?", (symbol_id,)).fetchone()
+            return row[0] if row else 0
+
+        with self._write():
+            for symbol_ids, days, prices, volumes in batches:
+                if cancelled and cancelled():
+                    raise OperationCancelled("Importen avbröts")
+                symbol_ids = np.asarray(symbol_ids, dtype=np.int64)
+                days = np.asarray(days, dtype=np.int64)
+
+                # Tidigaste dag per aktie i batchen, utan att gå rad för rad
+                order = np.lexsort((days, symbol_ids))
+                first = np.ones(len(order), dtype=bool)
+                first[1:] = symbol_ids[order][1:] != symbol_ids[order][:-1]
+                for symbol_id, day in zip(symbol_ids[order][first].tolist(), days[order][first].tolist()):
+                    if symbol_id not in rows_before:
+                        rows_before[symbol_id] = row_count(symbol_id)
+                    first_days[symbol_id] = min(day, first_days.get(symbol_id, day))
+
+                self.conn.executemany(UPSERT_PRICE_SQL, zip(symbol_ids.tolist(), days.tolist(),
+                                                            np.asarray(prices, dtype=float).tolist(),
+                                                            np.rint(np.asarray(volumes, dtype=float))
+                                                            .astype(np.int64).tolist()))
+                written += len(days)
+                if progress:
+                    progress(written)
+
+        for symbol_id, first_day in first_days.items():
+            self._after_write(symbol_id, first_day)
+        inserted = sum(row_count(symbol_id) - count for symbol_id, count in rows_before.items())
+        return {"inserted": inserted, "updated": written - inserted, "stocks": len(first_days)}
+
+    def lookup_symbol_ids(self, names, create=True):
+        """
+        Hämtar symbol_id för många aktienamn på en gång.
+        :param create: Skapa symboler som saknas.
+        :return: Dict namn -> symbol_id (namn som saknas utelämnas om create=False).
+        """
+        names = list(dict.fromkeys(names))
+        missing = [name for name in names if name not in self.symbol_ids]
+        if create and missing:
+            # Ingen egen transaktion, så att symbolerna rullas tillbaka med en avbruten import
+            self.conn.executemany("INSERT OR IGNORE INTO symbols (name) VALUES (?)", ((n,) for n in missing))
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            self.symbol_ids.update(self.conn.execute(
+                f"SELECT name, id FROM symbols WHERE name IN ({', '.join('?' * len(chunk))})", chunk).fetchall())
+        return {name: self.symbol_ids[name] for name in names if name in self.symbol_ids}
+
+    @profiled("db: get_all_stocks")
     def get_all_stocks(self):
-        self.cursor.execute("SELECT * FROM stocks ORDER BY name, the_date")
-        stocks = self.cursor.fetchall()
-        return stocks
+        return self.pool.reader().execute("SELECT * FROM stocks ORDER BY name, the_date").fetchall()
 
-    def get_stock_prices(self, stock_name):
-        self.cursor.execute("""
-                    SELECT price FROM stocks 
-                    WHERE name = ? ORDER BY the_date ASC
-                """, (stock_name,))  # Lägg till kommatecken för att skapa en tuple
+    @profiled("db: get_stock_names")
+    def get_stock_names(self):
+        """Hämtar namnen på alla aktier i databasen i bokstavsordning."""
+        rows = self.pool.reader().execute("SELECT name FROM symbols WHERE row_count > 0 ORDER BY name").fetchall()
+        return [row[0] for row in rows]
+
+    @profiled("db: get_symbol_catalog")
+    def get_symbol_catalog(self):
+        """
+        Hämtar symbolkatalogen för alla aktier med kurser, i bokstavsordning, utan att läsa prices.
+        :return: Lista av tuples (namn, första dagnummer, sista dagnummer, antal rader).
+        """
+        return self.pool.reader().execute("""
+            SELECT name, first_day, last_day, row_count FROM symbols WHERE row_count > 0 ORDER BY name
+        """).fetchall()
 
-        return self.cursor.fetchall()
+    @profiled("db: get_stock_prices")
+    def get_stock_prices(self, stock_name):
+        return self.pool.reader().execute("""
+                    SELECT price FROM prices
+                    WHERE symbol_id = ? ORDER BY day ASC
+                """, (self._symbol_id(stock_name),)).fetchall()  # Lägg till kommatecken för att skapa en tuple
 
+    @profiled("db: get_stock_history")
     def get_stock_history(self, stock_name, months=6):
-        """Hämtar aktiens historik inklusive datum, pris och volym för de senaste månaderna."""
-        self.cursor.execute("""
-            SELECT the_date, price, volume FROM stocks 
-            WHERE name = ? AND the_date >= DATE('now', ? || ' months') 
-            ORDER BY the_date ASC
-        """, (stock_name, f'-{months}'))
+        """
+        Hämtar aktiens historik inklusive datum, pris och volym för de senaste månaderna.
+        Med months=None hämtas hela historiken. Historiken läses från en minnesmappad
+        ögonblicksbild och byggs från databasen första gången.
+        :return: PriceHistory, som också kan användas som en lista av tuples (datum, pris, volym).
+        """
+        history = self._load_history(self._symbol_id(stock_name))
+        if months is None:
+            return history
+        return history.since(self.cutoff_day(months))
+
+    def iter_stock_history(self, stock_name, months=None, chunk_size=10000):
+        """
+        Läser aktiens historik i datumordning, chunk_size rader åt gången med fetchmany,
+        så att hela historiken aldrig finns i minnet. Används för strömmande backtest.
+        :param months: Antal månader bakåt, None för hela historiken.
+        :return: Generator med tuples (datum, pris, volym).
+        """
+        first_day = -2 ** 63 if months is None else self.cutoff_day(months)
+        cursor = self.pool.reader().cursor()  # Egen markör så att andra frågor kan köras under tiden
+        cursor.execute("""
+            SELECT day, price, volume FROM prices WHERE symbol_id = ? AND day >= ? ORDER BY day
+        """, (self._symbol_id(stock_name), first_day))
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for day, price, volume in rows:
+                    yield day_to_date(day), price, volume
+        finally:
+            cursor.close()
+
+    @profiled("db: cutoff_day")
+    def cutoff_day(self, months):
+        """Dagnummer för dagens datum minus months månader."""
+        return self.pool.reader().execute(f"""
+            SELECT CAST(julianday(DATE('now', ? || ' months')) - {JULIAN_EPOCH} AS INTEGER)
+        """, (f'-{months}',)).fetchone()[0]
+
+    @profiled("db: get_price_matrix")
+    def get_price_matrix(self, names=None, months=None, volumes=False):
+        """
+        Hämtar priserna för flera aktier som en matris med en rad per aktie och en kolumn
+        per dag som någon av aktierna har en kurs. Saknade dagar är NaN.
+        :param names: Aktienamn, standard är alla aktier.
+        :param months: Antal månader bakåt, None för hela historiken.
+        :param volumes: Hämta även en volymmatris med samma form.
+        :return: (lista med namn, array med dagnummer, prismatris), med volymmatrisen sist om volumes=True.
+        """
+        with self.read():
+            names = self.get_stock_names() if names is None else list(names)
+            first_day = None if months is None else self.cutoff_day(months)
+            histories = [self._load_history(self._symbol_id(name)) for name in names]
+        if first_day is not None:
+            histories = [history.since(first_day) for history in histories]
+
+        days = np.unique(np.concatenate([history.days for history in histories])) if histories \
+            else np.empty(0, np.int64)
+        prices = np.full((len(names), len(days)), np.nan)
+        volume_matrix = np.full(prices.shape, np.nan) if volumes else None
+        for row, history in enumerate(histories):
+            columns = np.searchsorted(days, history.days)
+            prices[row, columns] = history.prices
+            if volumes:
+                volume_matrix[row, columns] = history.volumes
+        if volumes:
+            return names, days, prices, volume_matrix
+        return names, days, prices
+
+    @profiled("db: get_risk_metrics")
+    def get_risk_metrics(self, stock_name, months=6, risk_free_rate=0.02):
+        """
+        Hämtar riskmåtten för en aktie. Saknas de eller är de inaktuella räknas de om
+        för alla aktier på en gång och sparas.
+        :return: Dict med måtten i RiskMetrics.METRICS, None om aktien saknas.
+        """
+        symbol_id = self._symbol_id(stock_name)
+        if symbol_id is None:
+            return None
+        key = (months, risk_free_rate, self.cutoff_day(months), self._universe_version())
+        metrics = self.risk_metrics.load(symbol_id, *key)
+        if metrics is None:
+            self.get_all_risk_metrics(months, risk_free_rate)
+            metrics = self.risk_metrics.load(symbol_id, *key)
+        return metrics
+
+    @profiled("db: get_all_risk_metrics")
+    def get_all_risk_metrics(self, months=6, risk_free_rate=0.02):
+        """
+        Räknar riskmåtten för alla aktier i en vektoriserad körning och sparar dem.
+        :return: (lista med namn, dict måttnamn -> array med ett värde per aktie)
+        """
+        key = (months, risk_free_rate, self.cutoff_day(months), self._universe_version())
+        names, days, prices = self.get_price_matrix(months=months)
+        metrics = compute_risk_metrics(prices, risk_free_rate)
+        self.risk_metrics.save([self._symbol_id(name) for name in names], metrics, *key)
+        return names, metrics
+
+    def _universe_version(self):
+        """Summan av alla aktiers versioner; ändras när någon akties kurser ändras."""
+        return self.pool.reader().execute("SELECT COALESCE(SUM(version), 0) FROM symbols").fetchone()[0]
+
+    @profiled("db: get_indicator")
+    def get_indicator(self, stock_name, indicator, params=None, months=6):
+        """
+        Hämtar en materialiserad indikatorserie, räknad på hela historiken och
+        sparad i databasen, för samma period som get_stock_history.
+        :param indicator: Nyckel i IndicatorStore.INDICATORS, t.ex. "SMA".
+        :param params: Dict med indikatorns parametrar, t.ex. {"window": 20}.
+        :return: Skrivskyddad NumPy-array med ett värde per rad i get_stock_history(stock_name, months).
+        """
+        symbol_id = self._symbol_id(stock_name)
+        if symbol_id is None:
+            return np.empty(0)
+        history = self.get_stock_history(stock_name, months)
+        if not history:
+            return np.empty(0)
+
+        # Hela serien cachas per dataversion; perioden är de sista len(history) värdena
+        version = self.pool.reader().execute("SELECT version FROM symbols WHERE id = ?", (symbol_id,)).fetchone()[0]
+        series = indicator_cache.get((self.db_name, symbol_id), (indicator, params_key(params), version),
+                                     lambda: self.indicators.get_series(symbol_id, indicator, params))
+        if len(series) < len(history):
+            raise RuntimeError(f"Indikatorserien {indicator} för {stock_name} har {len(series)} värden "
+                               f"men historiken {len(history)} rader")
+        return series[len(series) - len(history):]
+
+    @profiled("db: run_backtest")
+    def run_backtest(self, stock_name, strategy_name, compute, params=None, start_value=10000, months=None,
+                     keep_columns=False, indicator_source=None):
+        """
+        Kör ett backtest, eller hämtar resultatet från databasen om samma strategi redan
+        körts med samma parametrar och startkapital på exakt samma historik.
+        :param strategy_name: Strategins namn i registret, t.ex. "SMA".
+        :param compute: Funktion som tar historiken och returnerar (DataFrame, TradeLedger)
+                        eller None, t.ex. strategins backtest().
+        :param keep_columns: Spara strategins indikatorkolumner så att grafen kan ritas från
+                             ett sparat resultat; ett sparat resultat utan dem körs om.
+        :param indicator_source: Varifrån compute hämtar indikatorerna, t.ex. "stored" för de
+                                 materialiserade serierna som räknats på hela historiken. Ingår
+                                 i nyckeln, eftersom uppvärmningen annars skiljer när months anges.
+        :return: BacktestResult, eller None om aktien saknas eller datan inte räcker.
+        """
+        symbol_id = self._symbol_id(stock_name)
+        if symbol_id is None:
+            return None
+        with self.read() as conn:
+            version = conn.execute("SELECT version FROM symbols WHERE id = ?", (symbol_id,)).fetchone()[0]
+            history = self.get_stock_history(stock_name, months)
+        if not history:
+            return None
+
+        key_params = {**(params or {}), "start_value": start_value}
+        if indicator_source is not None:
+            key_params["indicator_source"] = indicator_source
+        key = params_key(key_params)
+        first_day = int(history.days[0])
+        stored = self.backtests.load(symbol_id, strategy_name, key, first_day, version, keep_columns)
+        if stored is not None:
+            ledger, summary, columns, attrs = stored
+            return BacktestResult(history, ledger, summary, start_value, columns, attrs, cached=True)
+
+        result = compute(history)
+        if result is None:
+            return None
+        df, ledger = result
+        summary = ledger_summary(ledger, start_value)
+        equity = equity_curve(history.prices, ledger, start_value)
+        summary["final_equity"] = float(equity[-1])
+        summary["max_drawdown_pct"] = float((equity / np.maximum.accumulate(equity) - 1).min() * 100)
+        columns = {name: df[name].to_numpy(dtype=float) for name in df.columns if name not in BASE_COLUMNS} \
+            if keep_columns else None
+        self.backtests.save(symbol_id, strategy_name, key, first_day, version, ledger, summary, columns,
+                            dict(df.attrs))
+        backtest = BacktestResult(history, ledger, summary, start_value, columns, dict(df.attrs), df=df)
+        backtest._equity = equity
+        return backtest
 
-        return self.cursor.fetchall()  # Returnerar en lista av tuples (datum, pris, volym)
+    @profiled("db: _load_history")
+    def _load_history(self, symbol_id):
+        row = None if symbol_id is None else self.pool.reader().execute(
+            "SELECT version, row_count FROM symbols WHERE id = ?", (symbol_id,)).fetchone()
+        if row is None:
+            return PriceHistory(np.empty(0, np.int64), np.empty(0), np.empty(0, np.int64))
+        # Ögonblicksbilden används bara om den har samma version och antal rader som katalogen
+        history = self.snapshots.load(symbol_id, *row) if self.snapshots else None
+        if history is None:
+            history = self._refresh_snapshot(symbol_id)
+        return history
+
+    @profiled("db: _after_write")
+    def _after_write(self, symbol_id, first_day):
+        """
+        Uppdaterar allt som härleds från en akties kurser efter en skrivning:
+        symbolkatalogen, ögonblicksbilden och de materialiserade indikatorerna,
+        och tar bort aktiens serier ur indikatorcachen.
+        :param first_day: Tidigaste dagnummer som lagts till eller ändrats.
+        """
+        with self.pool.write():
+            self.conn.execute(REFRESH_CATALOG_SQL, (symbol_id,))
+            self.backtests.invalidate(symbol_id)
+        self._refresh_snapshot(symbol_id)
+        self.indicators.refresh(symbol_id, first_day)
+        indicator_cache.invalidate((self.db_name, symbol_id))
+
+    @profiled("db: _refresh_snapshot")
+    def _refresh_snapshot(self, symbol_id):
+        """Bygger om ögonblicksbilden för en aktie från databasen, efter en skrivning eller om den var inaktuell."""
+        with self.read() as conn:
+            version = conn.execute("SELECT version FROM symbols WHERE id = ?", (symbol_id,)).fetchone()[0]
+            rows = conn.execute("SELECT day, price, volume FROM prices WHERE symbol_id = ? ORDER BY day ASC",
+                                (symbol_id,)).fetchall()
+        data = np.array(rows, dtype=SNAPSHOT_DTYPE)
+        if self.snapshots:
+            self.snapshots.save(symbol_id, version, data)
+            history = self.snapshots.load(symbol_id, version, len(data))
+            if history is not None:
+                return history
+        return PriceHistory(data["day"], data["price"], data["volume"])
 
     def set_setting(self, setting_type, setting_value):
-        self.cursor.execute("""
-            INSERT OR REPLACE INTO settings (setting_type, setting_value)
-            VALUES (?, ?)
-        """, (setting_type, str(setting_value)))  # Förvandla värdet till sträng
-        self.conn.commit()
-
-    def get_setting(self, setting_type):
-        self.cursor.execute("""
-            SELECT setting_value FROM settings WHERE setting_type = ?
-        """, (setting_type,))
-        result = self.cursor.fetchone()
-        return int(result[0]) if result else None  # Om inställning finns, returnera som int
+        """Ändrar en inställning i minnet. Den sparas vid flush_settings() eller close()."""
+        self.settings.set(setting_type, setting_value)
+
+    def get_setting(self, setting_type, default=None):
+        """Hämtar en inställning som int, float eller sträng från minnet, default om den saknas."""
+        return self.settings.get(setting_type, default)
+
+    @profiled("db: flush_settings")
+    def flush_settings(self):
+        """Skriver ändrade inställningar till databasen."""
+        self.settings.flush()
 
     def close(self):
-        self.conn.close()
+        self.flush_settings()
+        self.pool.close()
+
+
+def _migrate_to_v1(conn):
+    """
+    Version 1: aktienamn i en symboltabell och priser med heltalsdatum i en
+    WITHOUT ROWID-tabell klustrad på (symbol_id, day). Den gamla tabellen stocks
+    ersätts av en vy med samma kolumner, så äldre SQL mot stocks fungerar fortfarande.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS symbols (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prices (
+            symbol_id INTEGER NOT NULL REFERENCES symbols(id),
+            day INTEGER NOT NULL,  -- Dagar sedan 1970-01-01
+            price REAL NOT NULL,
+            volume INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (symbol_id, day)
+        ) WITHOUT ROWID
+    """)
+
+    # Flytta data från den gamla tabellen om den finns
+    old_table = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stocks'").fetchone()
+    if old_table:
+        conn.execute("INSERT OR IGNORE INTO symbols (name) SELECT DISTINCT name FROM stocks ORDER BY name")
+        conn.execute(f"""
+            INSERT OR REPLACE INTO prices (symbol_id, day, price, volume)
+            SELECT s.id, CAST(julianday(t.the_date) - {JULIAN_EPOCH} AS INTEGER), t.price, t.volume
+            FROM stocks t JOIN symbols s ON s.name = t.name
+            WHERE julianday(t.the_date) IS NOT NULL
+        """)
+        conn.execute("DROP TABLE stocks")
+
+    # Kompatibilitetsvy med den gamla tabellens kolumner (id finns inte längre)
+    conn.execute(f"""
+        CREATE VIEW IF NOT EXISTS stocks AS
+        SELECT NULL AS id, s.name AS name, DATE(p.day + {JULIAN_EPOCH}) AS the_date, p.price AS price, p.volume AS volume
+        FROM prices p JOIN symbols s ON s.id = p.symbol_id
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stocks_insert INSTEAD OF INSERT ON stocks
+        BEGIN
+            INSERT OR IGNORE INTO symbols (name) VALUES (NEW.name);
+            INSERT INTO prices (symbol_id, day, price, volume)
+            VALUES ((SELECT id FROM symbols WHERE name = NEW.name),
+                    CAST(julianday(NEW.the_date) - {JULIAN_EPOCH} AS INTEGER), NEW.price, COALESCE(NEW.volume, 0));
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stocks_update INSTEAD OF UPDATE ON stocks
+        BEGIN
+            UPDATE prices SET price = NEW.price, volume = NEW.volume
+            WHERE symbol_id = (SELECT id FROM symbols WHERE name = OLD.name)
+              AND day = CAST(julianday(OLD.the_date) - {JULIAN_EPOCH} AS INTEGER);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stocks_delete INSTEAD OF DELETE ON stocks
+        BEGIN
+            DELETE FROM prices
+            WHERE symbol_id = (SELECT id FROM symbols WHERE name = OLD.name)
+              AND day = CAST(julianday(OLD.the_date) - {JULIAN_EPOCH} AS INTEGER);
+        END
+    """)
+
+
+def _migrate_to_v2(conn):
+    """
+    Version 2: materialiserade indikatorserier och sparade indikatortillstånd,
+    så att nya kurser bara kräver att de nya dagarna räknas.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indicator_series (
+            symbol_id INTEGER NOT NULL REFERENCES symbols(id),
+            indicator TEXT NOT NULL,  -- T.ex. SMA, EMA, OBV_EMA
+            params TEXT NOT NULL,     -- Parametrarna som JSON med sorterade nycklar
+            day INTEGER NOT NULL,
+            value REAL,               -- NULL under indikatorns uppvärmning
+            PRIMARY KEY (symbol_id, indicator, params, day)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indicator_state (
+            symbol_id INTEGER NOT NULL REFERENCES symbols(id),
+            indicator TEXT NOT NULL,
+            params TEXT NOT NULL,
+            day INTEGER NOT NULL,     -- Sista dagen som ingår i tillståndet
+            bars INTEGER NOT NULL,    -- Antal dagar som matats in fram till och med day
+            state TEXT NOT NULL,      -- Den strömmande indikatorns get_state() som JSON
+            PRIMARY KEY (symbol_id, indicator, params, day)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migrate_to_v3(conn):
+    """
+    Version 3: symbolkatalog i symbols med första och sista dag, antal rader och en
+    version som räknas upp vid varje skrivning, så att aktielistan kan läsas utan
+    att gå igenom prices. Kompatibilitetsvyns triggers håller katalogen uppdaterad.
+    """
+    conn.execute("ALTER TABLE symbols ADD COLUMN first_day INTEGER")
+    conn.execute("ALTER TABLE symbols ADD COLUMN last_day INTEGER")
+    conn.execute("ALTER TABLE symbols ADD COLUMN row_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE symbols ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        UPDATE symbols SET (first_day, last_day, row_count) = (
+            SELECT MIN(day), MAX(day), COUNT(*) FROM prices WHERE symbol_id = symbols.id
+        )
+    """)
+
+    conn.execute("DROP TRIGGER IF EXISTS stocks_insert")
+    conn.execute("DROP TRIGGER IF EXISTS stocks_update")
+    conn.execute("DROP TRIGGER IF EXISTS stocks_delete")
+    conn.execute(f"""
+        CREATE TRIGGER stocks_insert INSTEAD OF INSERT ON stocks
+        BEGIN
+            INSERT OR IGNORE INTO symbols (name) VALUES (NEW.name);
+            INSERT INTO prices (symbol_id, day, price, volume)
+            VALUES ((SELECT id FROM symbols WHERE name = NEW.name),
+                    CAST(julianday(NEW.the_date) - {JULIAN_EPOCH} AS INTEGER), NEW.price, COALESCE(NEW.volume, 0));
+            UPDATE symbols SET
+                first_day = MIN(COALESCE(first_day, CAST(julianday(NEW.the_date) - {JULIAN_EPOCH} AS INTEGER)),
+                                CAST(julianday(NEW.the_date) - {JULIAN_EPOCH} AS INTEGER)),
+                last_day = MAX(COALESCE(last_day, CAST(julianday(NEW.the_date) - {JULIAN_EPOCH} AS INTEGER)),
+                               CAST(julianday(NEW.the_date) - {JULIAN_EPOCH} AS INTEGER)),
+                row_count = row_count + 1,
+                version = version + 1
+            WHERE name = NEW.name;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER stocks_update INSTEAD OF UPDATE ON stocks
+        BEGIN
+            UPDATE prices SET price = NEW.price, volume = NEW.volume
+            WHERE symbol_id = (SELECT id FROM symbols WHERE name = OLD.name)
+              AND day = CAST(julianday(OLD.the_date) - {JULIAN_EPOCH} AS INTEGER);
+            UPDATE symbols SET version = version + 1 WHERE name = OLD.name;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER stocks_delete INSTEAD OF DELETE ON stocks
+        BEGIN
+            DELETE FROM prices
+            WHERE symbol_id = (SELECT id FROM symbols WHERE name = OLD.name)
+              AND day = CAST(julianday(OLD.the_date) - {JULIAN_EPOCH} AS INTEGER);
+            UPDATE symbols SET (first_day, last_day, row_count) = (
+                SELECT MIN(day), MAX(day), COUNT(*) FROM prices WHERE symbol_id = symbols.id
+            ), version = version + 1
+            WHERE name = OLD.name;
+        END
+    """)
+
+
+def _migrate_to_v4(conn):
+    """Version 4: beräknade riskmått per aktie, period och riskfri avkastning."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS risk_metrics (
+            symbol_id INTEGER NOT NULL REFERENCES symbols(id),
+            months INTEGER NOT NULL,
+            risk_free_rate REAL NOT NULL,
+            first_day INTEGER NOT NULL,         -- Periodens första dag när måtten räknades
+            universe_version INTEGER NOT NULL,  -- Summan av alla aktiers versioner när måtten räknades
+            {", ".join(f"{name} REAL" for name in METRICS)},
+            PRIMARY KEY (symbol_id, months, risk_free_rate)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migrate_to_v5(conn):
+    """
+    Version 5: StreamingSMA räknar nu med kumulativa summor som sma(), så sparade
+    SMA- och RSI-tillstånd har ett annat format. Serierna tas bort och materialiseras
+    på nytt nästa gång de efterfrågas.
+    """
+    conn.execute("DELETE FROM indicator_series WHERE indicator IN ('SMA', 'RSI')")
+    conn.execute("DELETE FROM indicator_state WHERE indicator IN ('SMA', 'RSI')")
+
+
+def _migrate_to_v6(conn):
+    """
+    Version 6: sparade backtestresultat per aktie, strategi och parametrar.
+    Affärerna och strategins kolumner sparas som ett NumPy-arkiv (npz) i arrays.
+    """
+    conn.execute("""
+        CREATE TABLE backtest_results (
+            symbol_id INTEGER NOT NULL REFERENCES symbols(id),
+            strategy TEXT NOT NULL,
+            params TEXT NOT NULL,           -- Parametrar och startkapital som JSON med sorterade nycklar
+            first_day INTEGER NOT NULL,     -- Historikens första dag
+            version INTEGER NOT NULL,       -- Aktiens version i symbols när resultatet räknades
+            created_at REAL NOT NULL,
+            summary TEXT NOT NULL,          -- Sammanfattningen som JSON
+            attrs TEXT NOT NULL,            -- DataFrame.attrs från strategin som JSON
+            arrays BLOB NOT NULL,           -- Affärerna och eventuellt strategins kolumner
+            has_columns INTEGER NOT NULL,
+            PRIMARY KEY (symbol_id, strategy, params)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migrate_to_v7(conn):
+    """
+    Version 7: indikatortillstånden sparar aktiens version i symbols när de räknades,
+    så att serier som blivit inaktuella av skrivningar förbi DatabaseManager (t.ex. via
+    vyn stocks) upptäcks och räknas om. Befintliga serier räknas om nästa gång.
+    """
+    conn.execute("ALTER TABLE indicator_state ADD COLUMN version INTEGER NOT NULL DEFAULT -1")
+
+
+# Schemaversion -> funktion som uppgraderar från föregående version
+MIGRATIONS = {
+    1: _migrate_to_v1,
+    2: _migrate_to_v2,
+    3: _migrate_to_v3,
+    4: _migrate_to_v4,
+    5: _migrate_to_v5,
+    6: _migrate_to_v6,
+    7: _migrate_to_v7,
+}
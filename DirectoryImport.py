@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Import av en hel katalog med en CSV-fil per aktie (t.ex. ERIC.csv), som leverantörens
+nattliga filer. Filerna tolkas parallellt i en processpool och de tolkade kolumnerna
+skickas genom en begränsad kö till en enda skrivartråd som äger databasanslutningen,
+så SQLite aldrig har mer än en skrivare. Aktier som saknas skapas; aktienamnet är
+filnamnet utan ändelse. Samma format som import_csv: datum;pris;volym, decimalkomma
+tillåtet och valfri rubrikrad.
+
+Exempel:
+    python3 DirectoryImport.py leverantor/2024-05-17/
+    python3 DirectoryImport.py leverantor/2024-05-17/ --workers 8 --report fel.csv
+"""
+import argparse
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from Database import DatabaseManager, OperationCancelled, read_price_rows
+
+
+def csv_files(directory):
+    """Alla CSV-filer direkt i directory, sorterade på namn."""
+    return sorted(os.path.join(directory, file_name) for file_name in os.listdir(directory)
+                  if file_name.lower().endswith(".csv") and os.path.isfile(os.path.join(directory, file_name)))
+
+
+def parse_file(file_path):
+    """
+    Tolkar en CSV-fil. Körs i en arbetsprocess, så resultatet är bara enkla värden och NumPy-arrayer.
+    :return: (rapport som dict, (dagar, priser, volymer) eller None om filen inte gick att läsa).
+    """
+    report = {"file": file_path, "name": os.path.splitext(os.path.basename(file_path))[0],
+              "rows": 0, "rejected": 0, "inserted": 0, "updated": 0, "error": None}
+    try:
+        with open(file_path, newline='', encoding='utf-8') as csvfile:
+            rows = list(read_price_rows(csv.reader(csvfile, delimiter=';'), report))
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        report["error"] = str(e)
+        return report, None
+    data = np.array(rows, dtype=float).reshape(-1, 3)
+    report["rows"] = len(rows)
+    return report, (data[:, 0].astype(np.int64), data[:, 1], data[:, 2])
+
+
+def _write_group(db, group):
+    """Skriver tolkade filer i en transaktion och fyller i antal tillagda och uppdaterade rader i rapporterna."""
+    def row_count(name):
+        row = db.conn.execute("SELECT row_count FROM symbols WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def batches():
+        for report, (days, prices, volumes) in group:
+            symbol_id = db.lookup_symbol_ids([report["name"]])[report["name"]]
+            yield np.full(len(days), symbol_id, dtype=np.int64), days, prices, volumes
+
+    before = [row_count(report["name"]) for report, _ in group]
+    db.import_arrays(batches())
+    for (report, _), count in zip(group, before):
+        report["inserted"] = row_count(report["name"]) - count
+        report["updated"] = report["rows"] - report["inserted"]
+
+
+def _writer(db_name, results, on_written, rows_per_commit, failure):
+    """
+    Skrivartråden: läser (rapport, kolumner) ur kön tills None kommer och skriver
+    filerna i grupper om ungefär rows_per_commit rader per transaktion. Om en grupp
+    inte går att skriva görs ett nytt försök fil för fil, så att felet hamnar på rätt fil.
+    Ett oväntat fel som stoppar tråden sparas i listan failure.
+    """
+    try:
+        _write_all(db_name, results, on_written, rows_per_commit)
+    except BaseException as e:
+        failure.append(e)
+        raise
+
+
+def _write_all(db_name, results, on_written, rows_per_commit):
+    db = None
+    try:
+        db = DatabaseManager(db_name)
+    except (sqlite3.Error, OSError) as e:
+        error = f"Kunde inte öppna databasen: {e}"
+    done = False
+    while not done:
+        group = []
+        rows = 0
+        # Väntar på nästa fil och tar sedan med de filer som redan ligger i kön
+        while rows < rows_per_commit:
+            try:
+                item = results.get() if not group else results.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                done = True
+                break
+            report, columns = item
+            if columns is None or not report["rows"]:
+                on_written([report])
+                continue
+            group.append(item)
+            rows += report["rows"]
+        if not group:
+            continue
+        if db is None:
+            for report, _ in group:
+                report["error"] = error
+        else:
+            try:
+                _write_group(db, group)
+            except Exception:
+                # Gruppen rullades tillbaka; felet kan gälla vilken fil som helst, så fel räknas per fil
+                for item in group:
+                    try:
+                        _write_group(db, [item])
+                    except Exception as e:
+                        item[0]["error"] = str(e)
+        on_written([report for report, _ in group])
+    if db is not None:
+        db.close()
+
+
+def import_directory(db_name, directory, workers=None, rows_per_commit=200000, max_pending=None,
+                     progress=None, cancelled=None, mp_context=None):
+    """
+    Importerar alla CSV-filer i en katalog. Filerna tolkas i workers processer och
+    skrivs av en enda tråd med en egen DatabaseManager; kön mellan dem rymmer högst
+    max_pending tolkade filer, så minnet är begränsat även när skrivaren är flaskhalsen.
+    Varje grupp av filer skrivs i en egen transaktion. Vid avbrott behålls filerna
+    som redan skrivits och rapporterna visar vilka.
+    :param db_name: Sökväg till databasen.
+    :param workers: Antal processer som tolkar filer, standard är antal kärnor.
+    :param rows_per_commit: Ungefärligt antal rader per transaktion.
+    :param max_pending: Högsta antal tolkade filer som väntar på skrivaren, standard 2 * workers.
+    :param progress: Anropas med (antal skrivna filer, antal filer), från skrivartråden.
+    :param cancelled: Funktion som returnerar True om importen ska avbrytas.
+    :param mp_context: multiprocessing-kontext för processpoolen, t.ex. spawn från GUI:t.
+    :return: Dict med antal filer, misslyckade filer, tillagda, uppdaterade och avvisade
+             rader, tid i sekunder och en rapport per fil.
+    """
+    start = time.perf_counter()
+    files = csv_files(directory)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    results = queue.Queue(maxsize=max_pending)
+    reports = []
+    failure = []  # Felet som stoppade skrivartråden, om den dog
+
+    def on_written(written):
+        reports.extend(written)
+        if progress:
+            progress(len(reports), len(files))
+
+    writer = threading.Thread(target=_writer, args=(db_name, results, on_written, rows_per_commit, failure),
+                              name="DirectoryImport-writer", daemon=True)
+
+    def put(item):
+        """Lägger en fil i kön, men väntar inte för evigt på en skrivartråd som har dött."""
+        while True:
+            try:
+                results.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if not writer.is_alive():
+                    raise RuntimeError("Skrivartråden för importen avslutades oväntat") from \
+                        (failure[0] if failure else None)
+
+    writer.start()
+    was_cancelled = False
+    try:
+        with ProcessPoolExecutor(workers, mp_context=mp_context) as pool:
+            remaining = iter(files)
+            running = set()
+            while True:
+                # Högst max_pending filer tolkas samtidigt, utöver dem som står i kön
+                for file_path in remaining:
+                    running.add(pool.submit(parse_file, file_path))
+                    if len(running) >= max_pending:
+                        break
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    put(future.result())  # Väntar när skrivaren ligger efter
+                if cancelled and cancelled():
+                    was_cancelled = True
+                    for future in running:
+                        future.cancel()
+                    break
+    finally:
+        if writer.is_alive():
+            put(None)
+        writer.join()
+    if failure:
+        raise RuntimeError(f"Importen av {directory} avbröts av ett fel i skrivartråden: {failure[0]}") \
+            from failure[0]
+    if was_cancelled:
+        raise OperationCancelled(f"Importen av {directory} avbröts efter {len(reports)} av {len(files)} filer")
+
+    reports.sort(key=lambda report: report["file"])
+    return {
+        "files": len(files),
+        "failed": sum(1 for report in reports if report["error"]),
+        "inserted": sum(report["inserted"] for report in reports),
+        "updated": sum(report["updated"] for report in reports),
+        "rejected": sum(report["rejected"] for report in reports),
+        "seconds": time.perf_counter() - start,
+        "reports": reports,
+    }
+
+
+def write_report(file_path, reports):
+    """Skriver rapporten per fil som CSV."""
+    with open(file_path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["file", "name", "rows", "inserted", "updated", "rejected", "error"])
+        for report in reports:
+            writer.writerow([report["file"], report["name"], report["rows"], report["inserted"],
+                             report["updated"], report["rejected"], report["error"] or ""])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importerar en katalog med en CSV-fil per aktie.")
+    parser.add_argument("directory", help="Katalog med CSV-filer (datum;pris;volym)")
+    parser.add_argument("--db", default="stocks.db", help="Sökväg till databasen")
+    parser.add_argument("--workers", type=int, help="Antal processer som tolkar filer (standard: antal kärnor)")
+    parser.add_argument("--rows-per-commit", type=int, default=200000, help="Ungefärligt antal rader per transaktion")
+    parser.add_argument("--report", help="CSV-fil med resultatet per fil (valfri)")
+    args = parser.parse_args()
+
+    summary = import_directory(args.db, args.directory, args.workers, args.rows_per_commit)
+    if args.report:
+        write_report(args.report, summary["reports"])
+    for report in summary["reports"]:
+        if report["error"]:
+            print(f"❌ {report['file']}: {report['error']}")
+    rows = summary["inserted"] + summary["updated"]
+    print(f"✅ {summary['files'] - summary['failed']} av {summary['files']} filer importerade: "
+          f"{summary['inserted']} nya och {summary['updated']} uppdaterade rader, "
+          f"{summary['rejected']} rader avvisades ({summary['seconds']:.1f} s, "
+          f"{rows / max(summary['seconds'], 1e-9):.0f} rader/s)")
+
+
+if __name__ == "__main__":
+    main()
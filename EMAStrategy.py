@@ -1,7 +1,6 @@
-import numpy as np
-import pandas as pd
-from matplotlib import pyplot as plt
-from Strategy import TradingStrategy
+from Backtest import StreamingCrossover, crossover_signals, print_trades, simulate_trades
+from Indicators import StreamingEMA, ema
+from Strategy import TradingStrategy, history_frame
 
 class EMAStrategy(TradingStrategy):
     def calculate_ema(self, prices, period=20):
@@ -10,20 +9,32 @@ class EMAStrategy(TradingStrategy):
             print("För få datapunkter för att beräkna EMA.")
             return []
 
-        ema_values = []
-        alpha = 2 / (period + 1)
+        return ema(prices, period)
 
-        # Startvärde: SMA för första "period" antal dagar
-        sma = np.mean(prices[:period])
-        ema_values.append(sma)
+    def backtest(self, history, start_value=10000, period=20, indicator=None):
+        """
+        :param indicator: Färdigberäknad EMA-serie med ett värde per dag i history, annars räknas den här.
+        """
+        if not history or len(history) < period:
+            return None
+
+        df = history_frame(history)
+        df["EMA"] = self.calculate_ema(df["Price"], period) if indicator is None else indicator
+
+        # Hitta köp- och säljsignaler och para ihop dem till affärer
+        prices = df["Price"].to_numpy(dtype=float)
+        buy_mask, sell_mask = crossover_signals(prices, df["EMA"].to_numpy(dtype=float))
+        return df, simulate_trades(prices, buy_mask, sell_mask, start_value)
+
+    def start_stream(self, period=20):
+        self.min_bars = period
+        self.ema = StreamingEMA(period)
+        self.crossover = StreamingCrossover()
 
-        # Beräkna EMA för resterande dagar
-        for price in prices[period:]:
-            new_ema = alpha * price + (1 - alpha) * ema_values[-1]
-            ema_values.append(new_ema)
+    def bar_signals(self, price, volume):
+        return self.crossover.update(price, self.ema.update(price))
 
-        return [None] * (period - 1) + ema_values  # Fyll upp första värden med None
-    def execute(self, stock_name, history, start_value=10000, period=20):
+    def execute(self, stock_name, history, start_value=10000, period=20, indicator=None):
         """
         Plottar prisutvecklingen och EMA för en aktie med köp- och säljsignaler.
         Skriver även ut signalerna i konsolen i samma format som SMA.
@@ -31,88 +42,24 @@ class EMAStrategy(TradingStrategy):
         :param history: Lista av tuples (datum, pris, volym).
         :param period: EMA-period.
         :param start_value: Startvärde för investering.
+        :param indicator: Färdigberäknad EMA-serie, annars räknas den från history.
         """
-
-        if not history or len(history) < period:
+        result = self.backtest(history, start_value, period, indicator)
+        if result is None:
             print("Otillräckligt med data för EMA-beräkning.")
             return
 
-        # Hantera tre kolumner: (datum, pris, volym), men vi använder bara datum och pris
-        df = pd.DataFrame(history, columns=["Date", "Price", "Volume"])
-        df["Date"] = pd.to_datetime(df["Date"])
-        df = df.sort_values("Date")
-
-        df["EMA"] = self.calculate_ema(df["Price"], period)
-
-        buy_signals = []
-        sell_signals = []
-
-        shares_held = 0  # Antal aktier vi äger
-        total_profit = 0
-        total_percentage_profit = 0
-        num_trades = 0
-        holding = False
-        entry_price = 0
-
-        prev_price, prev_ema = None, None
-        for i in range(len(df)):
-            if pd.isna(df.loc[i, "EMA"]):
-                continue  # Hoppa över perioder där EMA ej beräknats
-
-            price, ema = df.loc[i, "Price"], df.loc[i, "EMA"]
-
-            if prev_price is not None and prev_ema is not None:
-                # 🔹 Köp-signal: Investera hela start_value
-                if prev_price < prev_ema and price > ema and not holding:
-                    shares_held = start_value // price  # Beräkna antal aktier
-                    if shares_held > 0:
-                        buy_signals.append((df.loc[i, "Date"], price, shares_held))
-                        holding = True
-                        entry_price = price
-                        print(
-                            f"📈 Köp-signal: {df.loc[i, 'Date'].strftime('%Y-%m-%d')} - Köp {shares_held} aktier till {price:.2f} SEK")
-
-                # 🔹 Sälj-signal: Sälj endast om priset är högre än inköpspriset
-                #elif prev_price > prev_ema and price < ema and holding and price > entry_price:
-                elif prev_price > prev_ema and price < ema and holding:
-                    sell_signals.append((df.loc[i, "Date"], price, shares_held))
-                    profit = shares_held * (price - entry_price)
-                    percentage_profit = (profit / (shares_held * entry_price)) * 100
-
-                    total_profit += profit
-                    total_percentage_profit += percentage_profit
-                    num_trades += 1  # Räkna en affär (köp + försäljning som en affär)
-                    holding = False
-                    print(
-                        f"📉 Sälj-signal: {df.loc[i, 'Date'].strftime('%Y-%m-%d')} - Sålt {shares_held} aktier till {price:.2f} SEK - Vinst: {profit:.2f} SEK")
-
-                    shares_held = 0  # Säljer alla aktier, återställ till 0
-
-            prev_price, prev_ema = price, ema
-
-        print(f"\n📊 Totalt antal affärer: {num_trades}")
-        print(f"💵 Totalt resultat: {total_profit:.2f} SEK")
-        print(f"📈 Total procentuell avkastning: {total_percentage_profit:.2f}%")
-
-        # Plotta grafen
-        plt.figure(figsize=(10, 5))
-        plt.plot(df["Date"], df["Price"], marker='o', linestyle='-', color='b', label="Pris")
-        plt.plot(df["Date"], df["EMA"], linestyle='-', color='r', label=f"EMA ({period} dagar)")
-
-        # Markera köp- och säljsignaler i grafen
-        for date, price, shares in buy_signals:
-            plt.scatter(date, price, marker='^', color='g', s=100, edgecolors="black", linewidth=1.5,
-                        label="Köp" if "Köp" not in plt.gca().get_legend_handles_labels()[1] else "")
-
-        for date, price, shares in sell_signals:
-            plt.scatter(date, price, marker='v', color='r', s=100, edgecolors="black", linewidth=1.5,
-                        label="Sälj" if "Sälj" not in plt.gca().get_legend_handles_labels()[1] else "")
-
-        # Anpassa utseendet
-        plt.xlabel("Datum")
-        plt.ylabel("Pris (SEK)")
-        plt.title(f"{stock_name} - EMA ({period} dagar) med köp-/säljsignaler")
-        plt.legend()
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        plt.show()
\ No newline at end of file
+        df, ledger = result
+        print_trades(df["Date"], ledger)
+        self.show_plot(stock_name, df, ledger, period=period)
+        return ledger
+
+    def plot(self, chart, stock_name, df, ledger, period=20):
+        chart.begin(f"{stock_name} - EMA ({period} dagar) med köp-/säljsignaler")
+        chart.line("price", df["Date"], df["Price"], label="Pris", color="b")
+        chart.line("indicator", df["Date"], df["EMA"], label=f"EMA ({period} dagar)", color="r")
+        chart.markers("buy", df["Date"].iloc[ledger.buy_idx], ledger.buy_prices, label="Köp", marker="^", color="g",
+                      s=100, edgecolors="black", linewidth=1.5)
+        chart.markers("sell", df["Date"].iloc[ledger.sell_idx], ledger.sell_prices, label="Sälj", marker="v",
+                      color="r", s=100, edgecolors="black", linewidth=1.5)
+        chart.finish()
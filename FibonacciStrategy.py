@@ -1,23 +1,28 @@
-import pandas as pd
-from matplotlib import pyplot as plt
-from Strategy import TradingStrategy
+from Backtest import print_trades, simulate_trades
+from Indicators import StreamingMax, StreamingMin, rolling_max, rolling_min
+from Strategy import TradingStrategy, history_frame
 
-class FibonacciStrategy(TradingStrategy):
-    def execute(self, stock_name, stock_data, start_value=10000):
-        if not stock_data or len(stock_data) < 2:
-            print("För lite data för att beräkna Fibonacci retracement.")
-            return
+# Nivåer som sparas som kolumner och ritas med rullande nivåer: svingens topp, säljnivån, köpnivån och botten
+ROLLING_LEVELS = ("0.0%", "38.2%", "61.8%", "100.0%")
 
-        df = pd.DataFrame(stock_data, columns=["Date", "Price", "Volume"])
-        df["Date"] = pd.to_datetime(df["Date"])
-        df = df.sort_values("Date")
 
-        # 🔹 Hitta senaste trendens högsta och lägsta pris
-        highest_price = df["Price"].max()
-        lowest_price = df["Price"].min()
+def retracement_signals(prices, levels, highest_price, lowest_price):
+    """
+    Köp när priset når 61.8% retracement (stöd), sälj vid 38.2% (motstånd). Ett fönster
+    utan prisrörelse har inga nivåer och ger inga signaler, inte heller dagar med NaN.
+    :return: (köpkandidater, säljkandidater)
+    """
+    swing = highest_price > lowest_price
+    return swing & (prices <= levels["61.8%"]), swing & (prices >= levels["38.2%"])
 
-        # 🔹 Beräkna Fibonacci retracement-nivåer
-        fib_levels = {
+
+class FibonacciStrategy(TradingStrategy):
+    def fibonacci_levels(self, highest_price, lowest_price):
+        """
+        Beräknar Fibonacci retracement-nivåer mellan högsta och lägsta pris.
+        Fungerar både för enskilda priser och för NumPy-arrayer med en nivå per dag.
+        """
+        return {
             "0.0%": highest_price,
             "23.6%": highest_price - (0.236 * (highest_price - lowest_price)),
             "38.2%": highest_price - (0.382 * (highest_price - lowest_price)),
@@ -27,61 +32,73 @@ class FibonacciStrategy(TradingStrategy):
             "100.0%": lowest_price
         }
 
-        buy_signals = []
-        sell_signals = []
-        holding = False
-        entry_price = 0
-        total_profit = 0
-        num_trades = 0
-        shares_held = 0
-
-        # 🔹 Loopar genom data för att hitta köp- och säljsignaler
-        for i in range(len(df)):
-            price = df.loc[i, "Price"]
-            date = df.loc[i, "Date"]
-
-            # Köp om priset når 61.8% eller 78.6% retracement (stöd)
-            if price <= fib_levels["61.8%"] and not holding:
-                shares_held = start_value // price
-                if shares_held > 0:
-                    buy_signals.append((date, price, shares_held))
-                    holding = True
-                    entry_price = price
-                    print(f"📈 Köp-signal: {date.strftime('%Y-%m-%d')} - Köp {shares_held} aktier till {price:.2f} SEK")
-
-            # Sälj om priset når 38.2% eller 23.6% retracement (motstånd)
-            elif price >= fib_levels["38.2%"] and holding:
-                sell_signals.append((date, price, shares_held))
-                profit = shares_held * (price - entry_price)
-                total_profit += profit
-                num_trades += 1
-                holding = False
-                print(
-                    f"📉 Sälj-signal: {date.strftime('%Y-%m-%d')} - Sålt {shares_held} aktier till {price:.2f} SEK - Vinst: {profit:.2f} SEK")
-                shares_held = 0
-
-        print(f"\n📊 Totalt antal affärer: {num_trades}")
-        print(f"💵 Totalt resultat: {total_profit:.2f} SEK")
-
-        # 🔹 Visualisering
-        plt.figure(figsize=(12, 6))
-        plt.plot(df["Date"], df["Price"], label="Pris", color="blue")
-
-        for level, value in fib_levels.items():
-            plt.axhline(y=value, linestyle="--", label=f"Fib {level}: {value:.2f} SEK", alpha=0.6)
-
-        for date, price, _ in buy_signals:
-            plt.scatter(date, price, color="green", marker="^", s=150, edgecolors="black", linewidth=1.5,
-                        label="Köp" if "Köp" not in plt.gca().get_legend_handles_labels()[1] else "")
-
-        for date, price, _ in sell_signals:
-            plt.scatter(date, price, color="red", marker="v", s=150, edgecolors="black", linewidth=1.5,
-                        label="Sälj" if "Sälj" not in plt.gca().get_legend_handles_labels()[1] else "")
-
-        plt.xlabel("Datum")
-        plt.ylabel("Pris (SEK)")
-        plt.title(f"Fibonacci retracement för {stock_name}")
-        plt.legend()
-        plt.grid(True, linestyle="--", alpha=0.6)
-        plt.xticks(rotation=45)
-        plt.show()
+    def backtest(self, stock_data, start_value=10000, lookback=60):
+        """
+        :param lookback: Antal dagar, inklusive dagen, som svingens högsta och lägsta pris
+                         hämtas från. None ger en uppsättning nivåer från hela historiken,
+                         som då bygger på priser som ännu inte var kända.
+        """
+        if not stock_data or len(stock_data) < max(2, lookback or 0):
+            return None
+
+        df = history_frame(stock_data)
+        prices = df["Price"].to_numpy(dtype=float)
+
+        if lookback is None:
+            # 🔹 Hela historikens högsta och lägsta pris
+            highest, lowest = prices.max(), prices.min()
+            fib_levels = self.fibonacci_levels(highest, lowest)
+            df.attrs["fib_levels"] = fib_levels
+        else:
+            # 🔹 Högsta och lägsta pris de senaste lookback dagarna, O(n) oavsett lookback
+            highest, lowest = rolling_max(prices, lookback), rolling_min(prices, lookback)
+            fib_levels = self.fibonacci_levels(highest, lowest)
+            for level in ROLLING_LEVELS:
+                df[f"Fib {level}"] = fib_levels[level]
+
+        buy_mask, sell_mask = retracement_signals(prices, fib_levels, highest, lowest)
+        return df, simulate_trades(prices, buy_mask, sell_mask, start_value)
+
+    def start_stream(self, lookback=60):
+        if lookback is None:
+            raise NotImplementedError("Fibonacci-nivåer från hela historiken kan inte strömmas, ange lookback")
+        self.min_bars = max(2, lookback)
+        self.highest = StreamingMax(lookback)
+        self.lowest = StreamingMin(lookback)
+
+    def bar_signals(self, price, volume):
+        highest, lowest = self.highest.update(price), self.lowest.update(price)
+        return retracement_signals(price, self.fibonacci_levels(highest, lowest), highest, lowest)
+
+    def execute(self, stock_name, stock_data, start_value=10000, lookback=60):
+        result = self.backtest(stock_data, start_value, lookback)
+        if result is None:
+            print("För lite data för att beräkna Fibonacci retracement.")
+            return
+
+        df, ledger = result
+        print_trades(df["Date"], ledger)
+        self.show_plot(stock_name, df, ledger, lookback=lookback)
+        return ledger
+
+    def plot(self, chart, stock_name, df, ledger, lookback=60):
+        if "fib_levels" in df.attrs:
+            chart.begin(f"Fibonacci retracement för {stock_name}")
+        else:
+            chart.begin(f"Fibonacci retracement ({lookback} dagar) för {stock_name}")
+        chart.line("price", df["Date"], df["Price"], label="Pris", color="blue")
+
+        if "fib_levels" in df.attrs:
+            # 🔹 En horisontell linje per Fibonacci-nivå
+            for n, (level, value) in enumerate(df.attrs["fib_levels"].items()):
+                chart.hline(f"fib {level}", value, label=f"Fib {level}: {value:.2f} SEK", linestyle="--",
+                            alpha=0.6, color=f"C{n + 1}")
+        else:
+            # 🔹 En linje per rullande nivå
+            for n, level in enumerate(ROLLING_LEVELS):
+                chart.line(f"fib line {level}", df["Date"], df[f"Fib {level}"], label=f"Fib {level}",
+                           linestyle="--", alpha=0.6, color=f"C{n + 1}")
+
+        chart.markers("buy", df["Date"].iloc[ledger.buy_idx], ledger.buy_prices, label="Köp", color="green", marker="^", s=150, edgecolors="black", linewidth=1.5)
+        chart.markers("sell", df["Date"].iloc[ledger.sell_idx], ledger.sell_prices, label="Sälj", color="red", marker="v", s=150, edgecolors="black", linewidth=1.5)
+        chart.finish()
@@ -0,0 +1,104 @@
+from datetime import date as Date
+
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from Database import EPOCH_ORDINAL, day_to_date
+
+
+def date_prefix_range(text):
+    """
+    Tolkar ett datumprefix som ett intervall av dagnummer.
+    :param text: 'ÅÅÅÅ', 'ÅÅÅÅ-MM' eller 'ÅÅÅÅ-MM-DD'.
+    :return: (första dag, dagen efter sista dag), eller None om texten inte är ett giltigt prefix.
+    """
+    parts = text.strip().split("-")
+    try:
+        numbers = [int(part) for part in parts]
+        year = numbers[0]
+        if len(numbers) == 1:
+            first, last = Date(year, 1, 1), Date(year + 1, 1, 1)
+        elif len(numbers) == 2:
+            first = Date(year, numbers[1], 1)
+            last = Date(year + 1, 1, 1) if numbers[1] == 12 else Date(year, numbers[1] + 1, 1)
+        elif len(numbers) == 3:
+            first = Date(year, numbers[1], numbers[2])
+            last = Date.fromordinal(first.toordinal() + 1)
+        else:
+            return None
+    except ValueError:
+        return None
+    return first.toordinal() - EPOCH_ORDINAL, last.toordinal() - EPOCH_ORDINAL
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """
+    Tabellmodell direkt över kolumnerna i en PriceHistory. Inga celler skapas i
+    förväg; vyn frågar bara efter de rader som syns och de formateras då.
+    Sortering och datumfilter räknas som en indexarray över kolumnerna.
+    """
+    HEADERS = ["Datum", "Pris (SEK)", "Volym"]
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+        self.day_range = None
+        self.rows = np.arange(len(history))  # Synliga rader som index i historiken, i visningsordning
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return day_to_date(self.history.days[row])
+            if column == 1:
+                return f"{self.history.prices[row]:.2f}"
+            return str(int(self.history.volumes[row]))
+        if role == Qt.TextAlignmentRole and column > 0:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self._update_rows()
+
+    def set_date_filter(self, text):
+        """
+        Visar bara rader vars datum börjar med text, t.ex. '2023' eller '2023-04'.
+        En tom text tar bort filtret och ett ogiltigt prefix ger en tom tabell.
+        """
+        self.day_range = None if not text.strip() else (date_prefix_range(text) or (0, 0))
+        self._update_rows()
+
+    def _update_rows(self):
+        # Historiken är sorterad på dag, så datumfiltret blir ett sammanhängande intervall
+        first, last = 0, len(self.history)
+        if self.day_range is not None:
+            first, last = np.searchsorted(self.history.days, self.day_range)
+        rows = np.arange(first, last)
+
+        if self.sort_column != 0:
+            values = self.history.prices if self.sort_column == 1 else self.history.volumes
+            rows = rows[np.argsort(values[first:last], kind="stable")]
+        if self.sort_order == Qt.DescendingOrder:
+            rows = rows[::-1]
+
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _nbytes(value):
+    """Minnesåtgång för en array eller en tuple av arrayer."""
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return np.asarray(value).nbytes
+
+
+def _read_only(value):
+    """Gör cachade arrayer skrivskyddade så att ingen anropare kan ändra dem för alla andra."""
+    if isinstance(value, tuple):
+        return tuple(_read_only(item) for item in value)
+    value = np.asarray(value)
+    value.flags.writeable = False
+    return value
+
+
+class IndicatorCache:
+    """
+    Processgemensam LRU-cache för beräknade indikatorserier, begränsad i antal byte.
+    Nyckeln är (aktie, indikator, parametrar, dataversion), så en ny version av en
+    akties data ger automatiskt nya poster; invalidate() frigör de gamla direkt.
+    Räknarna hits, misses och evictions visar hur väl storleken passar.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # Nyckel -> serie, äldst använd först
+        self.keys_by_ticker = {}      # Aktie -> nycklar i entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()  # Används från både GUI-tråden och bakgrundstrådar
+
+    def get(self, ticker, key, compute):
+        """
+        Hämtar en serie från cachen eller räknar den med compute() och sparar den.
+        :param ticker: Aktiens identitet, t.ex. (databas, symbol_id). Används av invalidate().
+        :param key: Resten av nyckeln, t.ex. (indikator, parametrar, dataversion).
+        :param compute: Funktion utan argument som returnerar en array eller en tuple av arrayer.
+        :return: Skrivskyddad array (eller tuple av arrayer).
+        """
+        full_key = (ticker, *key)
+        with self.lock:
+            value = self.entries.get(full_key)
+            if value is not None:
+                self.entries.move_to_end(full_key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = _read_only(compute())
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value  # Får aldrig plats, returneras utan att cachas
+
+        with self.lock:
+            if full_key not in self.entries:
+                self.entries[full_key] = value
+                self.keys_by_ticker.setdefault(ticker, set()).add(full_key)
+                self.size += size
+                self._evict()
+        return value
+
+    def invalidate(self, ticker):
+        """Tar bort alla serier för en aktie, t.ex. efter att nya kurser skrivits."""
+        with self.lock:
+            for full_key in self.keys_by_ticker.pop(ticker, ()):
+                self.size -= _nbytes(self.entries.pop(full_key))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_ticker.clear()
+            self.size = 0
+
+    def set_max_bytes(self, max_bytes):
+        """Ändrar minnesgränsen och tar bort de äldsta serierna om den nya gränsen överskrids."""
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self):
+        """Räknare och storlek som dict, för att dimensionera cachen."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "entries": len(self.entries),
+                    "bytes": self.size, "max_bytes": self.max_bytes}
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            full_key, value = self.entries.popitem(last=False)
+            self.keys_by_ticker[full_key[0]].discard(full_key)
+            self.size -= _nbytes(value)
+            self.evictions += 1
+
+
+# Cachen som delas av alla DatabaseManager-instanser i processen
+indicator_cache = IndicatorCache()
@@ -0,0 +1,162 @@
+import json
+import math
+
+import numpy as np
+
+from Indicators import (StreamingEMA, StreamingEWM, StreamingIndicator, StreamingOBV, StreamingROC, StreamingRSI,
+                        StreamingSMA)
+
+# Tillståndet sparas var CHECKPOINT_INTERVAL:e dag, så att en rättad historisk kurs
+# bara kräver omräkning från närmaste sparade punkt före ändringen.
+CHECKPOINT_INTERVAL = 250
+
+
+class StreamingOBVEWM(StreamingIndicator):
+    """Exponentiellt glidande medelvärde av OBV, som OBV-strategins signallinje."""
+    def __init__(self, span=20):
+        self.obv = StreamingOBV()
+        self.ewm = StreamingEWM(span)
+
+    def update(self, price, volume):
+        return self.ewm.update(self.obv.update(price, volume))
+
+
+# Indikatornamn -> (funktion som skapar en strömmande indikator från parametrarna, använder volym)
+INDICATORS = {
+    "SMA": (lambda params: StreamingSMA(params["window"]), False),
+    "EMA": (lambda params: StreamingEMA(params["period"]), False),
+    "ROC": (lambda params: StreamingROC(params["period"]), False),
+    "RSI": (lambda params: StreamingRSI(params["period"]), False),
+    "OBV": (lambda params: StreamingOBV(), True),
+    "OBV_EMA": (lambda params: StreamingOBVEWM(params["span"]), True),
+}
+
+
+def params_key(params):
+    """Kanonisk textnyckel för en parameteruppsättning."""
+    return json.dumps(params or {}, sort_keys=True)
+
+
+class IndicatorStore:
+    """
+    Materialiserade indikatorserier per aktie och parameteruppsättning i databasen.
+    En serie räknas fullt första gången den efterfrågas och uppdateras sedan
+    stegvis från sitt senast sparade tillstånd när nya dagar skrivs. Rättas en
+    äldre kurs räknas serien om från närmaste sparade tillstånd före ändringen.
+    Tillstånden märks med aktiens version i symbols; har aktien skrivits utan
+    refresh() (t.ex. via vyn stocks) räknas serien om från början.
+    """
+    def __init__(self, pool):
+        self.pool = pool  # ConnectionPool; skrivningar går via pool.write()
+        self.conn = pool.writer
+
+    def get_series(self, symbol_id, indicator, params, first_day=None):
+        """
+        Hämtar en indikatorserie, materialiserar den först om den inte finns.
+        :param first_day: Första dagnummer som ska returneras, None för hela serien.
+        :return: NumPy-array med ett värde per handelsdag (NaN under uppvärmningen).
+        """
+        key = params_key(params)
+        state = self._series_state(symbol_id, indicator, key)
+        if state != "current":
+            with self.pool.write():
+                if state == "stale":
+                    self._rewind(symbol_id, indicator, key, -2**62)
+                self._advance(symbol_id, indicator, key)
+
+        rows = self.conn.execute("""
+            SELECT value FROM indicator_series
+            WHERE symbol_id = ? AND indicator = ? AND params = ? AND day >= ?
+            ORDER BY day ASC
+        """, (symbol_id, indicator, key, -2**62 if first_day is None else first_day)).fetchall()
+        return np.array([math.nan if value is None else value for value, in rows], dtype=float)
+
+    def refresh(self, symbol_id, changed_day):
+        """
+        Uppdaterar alla materialiserade serier för en aktie efter en skrivning.
+        Skrivningen förväntas ha räknat upp aktiens version ett steg; serier som
+        räknades före en tidigare skrivning utan refresh() räknas om från början.
+        :param changed_day: Tidigaste dagnummer som lagts till eller ändrats.
+        """
+        with self.pool.write():
+            specs = self.conn.execute("""
+                SELECT st.indicator, st.params, MIN(st.version = s.version - 1)
+                FROM indicator_state st JOIN symbols s ON s.id = st.symbol_id
+                WHERE st.symbol_id = ? GROUP BY st.indicator, st.params
+            """, (symbol_id,)).fetchall()
+            for indicator, key, previous in specs:
+                self._rewind(symbol_id, indicator, key, changed_day if previous else -2**62)
+                self._advance(symbol_id, indicator, key)
+
+    def _series_state(self, symbol_id, indicator, key):
+        """
+        :return: "missing" om serien inte är materialiserad, "stale" om aktien har en annan
+                 version än när serien räknades och annars "current".
+        """
+        row = self.conn.execute("""
+            SELECT MIN(st.version = s.version) FROM indicator_state st JOIN symbols s ON s.id = st.symbol_id
+            WHERE st.symbol_id = ? AND st.indicator = ? AND st.params = ?
+        """, (symbol_id, indicator, key)).fetchone()
+        if row[0] is None:
+            return "missing"
+        return "current" if row[0] else "stale"
+
+    def _rewind(self, symbol_id, indicator, key, changed_day):
+        """Tar bort värden och tillstånd från och med changed_day."""
+        spec = (symbol_id, indicator, key, changed_day)
+        self.conn.execute("""
+            DELETE FROM indicator_state WHERE symbol_id = ? AND indicator = ? AND params = ? AND day >= ?
+        """, spec)
+        self.conn.execute("""
+            DELETE FROM indicator_series WHERE symbol_id = ? AND indicator = ? AND params = ? AND day > COALESCE(
+                (SELECT MAX(day) FROM indicator_state WHERE symbol_id = ? AND indicator = ? AND params = ?), -1e18)
+        """, spec[:3] + spec[:3])
+
+    def _advance(self, symbol_id, indicator, key):
+        """Matar in alla dagar efter det senast sparade tillståndet och sparar värden och tillstånd."""
+        factory, uses_volume = INDICATORS[indicator]
+        streaming = factory(json.loads(key))
+
+        checkpoint = self.conn.execute("""
+            SELECT day, bars, state FROM indicator_state WHERE symbol_id = ? AND indicator = ? AND params = ?
+            ORDER BY day DESC LIMIT 1
+        """, (symbol_id, indicator, key)).fetchone()
+        last_day, bars = -2**62, 0
+        if checkpoint:
+            last_day, bars, state = checkpoint
+            streaming.set_state(json.loads(state))
+
+        new_bars = self.conn.execute("""
+            SELECT day, price, volume FROM prices WHERE symbol_id = ? AND day > ? ORDER BY day ASC
+        """, (symbol_id, last_day)).fetchall()
+
+        values, checkpoints = [], []
+        for day, price, volume in new_bars:
+            value = streaming.update(price, volume) if uses_volume else streaming.update(price)
+            values.append((symbol_id, indicator, key, day, None if math.isnan(value) else value))
+            bars += 1
+            if bars % CHECKPOINT_INTERVAL == 0:
+                checkpoints.append((symbol_id, indicator, key, day, bars, json.dumps(streaming.get_state())))
+
+        # Det senaste tillståndet sparas alltid; mellanliggande bara på jämna intervall
+        if new_bars:
+            self.conn.execute("""
+                DELETE FROM indicator_state WHERE symbol_id = ? AND indicator = ? AND params = ? AND bars % ? != 0
+            """, (symbol_id, indicator, key, CHECKPOINT_INTERVAL))
+            if bars % CHECKPOINT_INTERVAL != 0:
+                checkpoints.append((symbol_id, indicator, key, new_bars[-1][0], bars,
+                                    json.dumps(streaming.get_state())))
+        elif not checkpoint:
+            # Markerar serien som materialiserad även för en aktie utan kurser
+            checkpoints.append((symbol_id, indicator, key, last_day, 0, json.dumps(streaming.get_state())))
+
+        self.conn.executemany("INSERT OR REPLACE INTO indicator_series VALUES (?, ?, ?, ?, ?)", values)
+        self.conn.executemany("""
+            INSERT OR REPLACE INTO indicator_state (symbol_id, indicator, params, day, bars, state)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, checkpoints)
+        # Serien motsvarar nu aktiens aktuella version
+        self.conn.execute("""
+            UPDATE indicator_state SET version = (SELECT version FROM symbols WHERE id = ?)
+            WHERE symbol_id = ? AND indicator = ? AND params = ?
+        """, (symbol_id, symbol_id, indicator, key))
@@ -0,0 +1,313 @@
+import math
+from collections import deque
+
+import numpy as np
+
+from Profiler import profiled
+
+# Tekniska indikatorer i två former:
+#  - batch-funktioner som räknar hela serien vektoriserat över NumPy-arrayer
+#  - strömmande klasser som uppdateras i O(1) per ny dag med update()
+# Båda formerna ger NaN under uppvärmningsperioden och samma värden i övrigt.
+
+
+def run_lengths(values):
+    """Antal lika värden i följd som slutar på varje position."""
+    n = len(values)
+    idx = np.arange(n)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    return idx - np.maximum.accumulate(np.where(starts, idx, 0)) + 1
+
+
+def cumulative_sum(values):
+    """Kumulativ summa med en inledande nolla, så att summan av values[i:j] är csum[j] - csum[i]."""
+    return np.concatenate(([0.0], np.cumsum(values)))
+
+
+@profiled("indikator: sma")
+def sma(values, window=20, csum=None, runs=None):
+    """
+    Glidande medelvärde (SMA) via kumulativ summa.
+    Fönster med konstant värde ger exakt det värdet, som pandas rolling().mean().
+    :param csum: Förberäknad cumulative_sum(values), när många fönster räknas på samma serie.
+    :param runs: Förberäknad run_lengths(values).
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+
+    if csum is None:
+        csum = cumulative_sum(values)
+    if runs is None:
+        runs = run_lengths(values)
+    result[window - 1:] = (csum[window:] - csum[:-window]) / window
+
+    constant = runs >= window
+    result[constant] = values[constant]
+    return result
+
+
+@profiled("indikator: ema")
+def ema(values, period=20):
+    """Exponentiellt glidande medelvärde (EMA) med SMA för de första 'period' dagarna som startvärde."""
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+
+    seeded = values[period - 1:].copy()
+    seeded[0] = values[:period].mean()
+    import pandas as pd  # Importeras först när det behövs, så att programmet startar snabbare
+    result[period - 1:] = pd.Series(seeded).ewm(alpha=2 / (period + 1), adjust=False).mean().to_numpy()
+    return result
+
+
+@profiled("indikator: ewm")
+def ewm(values, span=20):
+    """Exponentiellt glidande medelvärde med första värdet som startvärde (pandas ewm, adjust=False)."""
+    values = np.asarray(values, dtype=float)
+    import pandas as pd
+    return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+@profiled("indikator: roc")
+def roc(values, period=14):
+    """Rate of Change (ROC) i procent jämfört med priset 'period' dagar tidigare."""
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) <= period:
+        return result
+
+    result[period:] = ((values[period:] - values[:-period]) / values[:-period]) * 100
+    return result
+
+
+@profiled("indikator: rsi")
+def rsi(values, period=14):
+    """
+    Relative Strength Index (RSI) med glidande medelvärde av uppgångar och nedgångar.
+    Första dagens förändring räknas som 0, som i den ursprungliga pandas-versionen där
+    delta.where(delta > 0, 0) ersatte diff():s NaN med 0; RSI finns från dag period - 1.
+    """
+    values = np.asarray(values, dtype=float)
+    delta = np.zeros(len(values))
+    delta[1:] = np.diff(values)
+
+    gain = sma(np.where(delta > 0, delta, 0.0), period)
+    loss = sma(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + gain / loss))
+
+
+@profiled("indikator: obv")
+def obv(prices, volumes):
+    """On-Balance Volume (OBV): volymen adderas vid uppgång och dras av vid nedgång."""
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    result = np.zeros(len(prices))
+    if len(prices) > 1:
+        result[1:] = np.cumsum(np.sign(np.diff(prices)) * volumes[1:])
+    return result
+
+
+def _rolling_extreme(values, window, ufunc, fill):
+    """
+    Rullande max eller min enligt van Herk/Gil-Werman i O(n) oavsett fönstrets längd.
+    Serien delas i block om window dagar; varje fönster täcker slutet av ett block och
+    början av nästa, så svaret är ufunc av ett suffix- och ett prefixvärde.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return result
+
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, fill)
+    padded[:n] = values
+    padded = padded.reshape(blocks, window)
+    prefix = ufunc.accumulate(padded, axis=1).ravel()[:n]
+    suffix = ufunc.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()[:n]
+    result[window - 1:] = ufunc(suffix[:n - window + 1], prefix[window - 1:])
+    return result
+
+
+@profiled("indikator: rolling_max")
+def rolling_max(values, window=20):
+    """Högsta värdet de senaste window dagarna, inklusive dagen."""
+    return _rolling_extreme(values, window, np.maximum, -np.inf)
+
+
+@profiled("indikator: rolling_min")
+def rolling_min(values, window=20):
+    """Lägsta värdet de senaste window dagarna, inklusive dagen."""
+    return _rolling_extreme(values, window, np.minimum, np.inf)
+
+
+class StreamingIndicator:
+    """
+    Bas för strömmande indikatorer. Tillståndet kan sparas som en JSON-vänlig dict
+    med get_state() och återställas med set_state(), så att beräkningen kan
+    fortsätta där den slutade när nya dagar kommer.
+    """
+    def get_state(self):
+        state = {}
+        for key, value in self.__dict__.items():
+            if isinstance(value, deque):
+                value = list(value)
+            elif isinstance(value, StreamingIndicator):
+                value = value.get_state()
+            state[key] = value
+        return state
+
+    def set_state(self, state):
+        for key, value in state.items():
+            current = self.__dict__.get(key)
+            if isinstance(current, deque):
+                self.__dict__[key] = deque(value, maxlen=current.maxlen)
+            elif isinstance(current, StreamingIndicator):
+                current.set_state(value)
+            else:
+                self.__dict__[key] = value
+        return self
+
+
+class StreamingSMA(StreamingIndicator):
+    """
+    SMA som uppdateras i O(1) per dag. Räknar som sma(): med kumulativa summor och
+    exakt värdet för fönster med konstant pris, så att resultatet är bit för bit detsamma.
+    """
+    def __init__(self, window=20):
+        self.window = window
+        self.sums = deque([0.0], maxlen=window + 1)  # Kumulativa summor för de senaste window+1 dagarna
+        self.last = None
+        self.same_count = 0
+
+    def update(self, value):
+        value = float(value)
+        self.same_count = self.same_count + 1 if self.last == value else 1
+        self.last = value
+        self.sums.append(self.sums[-1] + value)
+
+        if len(self.sums) <= self.window:
+            return math.nan
+        if self.same_count >= self.window:
+            return value
+        return (self.sums[-1] - self.sums[0]) / self.window
+
+
+class StreamingEMA(StreamingIndicator):
+    """EMA med SMA som startvärde, uppdateras i O(1) per dag."""
+    def __init__(self, period=20):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = math.nan
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        if self.count < self.period:
+            self.total += value
+        elif self.count == self.period:
+            self.value = (self.total + value) / self.period
+        else:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+
+class StreamingEWM(StreamingIndicator):
+    """Exponentiellt glidande medelvärde med första värdet som startvärde, O(1) per dag."""
+    def __init__(self, span=20):
+        self.alpha = 2 / (span + 1)
+        self.value = math.nan
+
+    def update(self, value):
+        value = float(value)
+        if math.isnan(self.value):
+            self.value = value
+        else:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+
+class StreamingROC(StreamingIndicator):
+    """ROC som uppdateras i O(1) per dag."""
+    def __init__(self, period=14):
+        self.period = period
+        self.values = deque(maxlen=period + 1)
+
+    def update(self, value):
+        self.values.append(float(value))
+        if len(self.values) <= self.period:
+            return math.nan
+        old = self.values[0]
+        return ((self.values[-1] - old) / old) * 100
+
+
+class StreamingRSI(StreamingIndicator):
+    """RSI som uppdateras i O(1) per dag."""
+    def __init__(self, period=14):
+        self.prev_price = None
+        self.gain = StreamingSMA(period)
+        self.loss = StreamingSMA(period)
+
+    def update(self, value):
+        value = float(value)
+        delta = 0.0 if self.prev_price is None else value - self.prev_price
+        self.prev_price = value
+
+        avg_gain = self.gain.update(max(delta, 0.0))
+        avg_loss = self.loss.update(max(-delta, 0.0))
+        if math.isnan(avg_gain):
+            return math.nan
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else math.nan
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class StreamingOBV(StreamingIndicator):
+    """OBV som uppdateras i O(1) per dag."""
+    def __init__(self):
+        self.prev_price = None
+        self.value = 0.0
+
+    def update(self, price, volume):
+        price = float(price)
+        if self.prev_price is not None:
+            if price > self.prev_price:
+                self.value += volume
+            elif price < self.prev_price:
+                self.value -= volume
+        self.prev_price = price
+        return self.value
+
+
+class StreamingMax(StreamingIndicator):
+    """
+    Högsta värdet de senaste window dagarna med en monoton kö: varje värde läggs
+    till och tas bort högst en gång, så uppdateringen är amorterat O(1) per dag.
+    """
+    def __init__(self, window=20):
+        self.window = window
+        self.count = 0
+        self.queue = deque()  # (dagindex, värde) med fallande värden; först ligger fönstrets max
+
+    def update(self, value):
+        value = float(value)
+        while self.queue and self.queue[-1][1] <= value:
+            self.queue.pop()
+        self.queue.append((self.count, value))
+        if self.queue[0][0] <= self.count - self.window:
+            self.queue.popleft()
+        self.count += 1
+        return self.queue[0][1] if self.count >= self.window else math.nan
+
+
+class StreamingMin(StreamingMax):
+    """Lägsta värdet de senaste window dagarna, som StreamingMax på negerade värden."""
+    def update(self, value):
+        return -super().update(-float(value))
@@ -1,101 +1,59 @@
-import pandas as pd
-from matplotlib import pyplot as plt
-from Strategy import TradingStrategy
+from Backtest import StreamingCrossover, crossover_signals, print_trades, simulate_trades
+from Indicators import StreamingEWM, StreamingOBV, ewm, obv
+from Strategy import TradingStrategy, history_frame
 
 class OBVStrategy(TradingStrategy):
-    def execute(self, stock_name, history, obv_ema_period=20, start_capital=10000):
+    def backtest(self, history, start_capital=10000, obv_ema_period=20, indicator=None):
+        """
+        :param indicator: Färdigberäknade serier (OBV, OBV_EMA) med ett värde per dag i history,
+                          annars räknas de här.
+        """
         if not history or len(history) < obv_ema_period:
+            return None
+
+        df = history_frame(history)
+        if indicator is None:
+            df["OBV"] = obv(df["Price"], df["Volume"])
+            df["OBV_EMA"] = ewm(df["OBV"], obv_ema_period)
+        else:
+            df["OBV"], df["OBV_EMA"] = indicator
+
+        # Köp när OBV korsar sitt EMA uppåt, sälj när det korsar nedåt
+        buy_mask, sell_mask = crossover_signals(df["OBV"].to_numpy(), df["OBV_EMA"].to_numpy())
+        return df, simulate_trades(df["Price"].to_numpy(dtype=float), buy_mask, sell_mask, start_capital)
+
+    def start_stream(self, obv_ema_period=20):
+        self.min_bars = obv_ema_period
+        self.obv = StreamingOBV()
+        self.obv_ema = StreamingEWM(obv_ema_period)
+        self.crossover = StreamingCrossover()
+
+    def bar_signals(self, price, volume):
+        obv_value = self.obv.update(price, volume)
+        return self.crossover.update(obv_value, self.obv_ema.update(obv_value))
+
+    def execute(self, stock_name, history, obv_ema_period=20, start_capital=10000, indicator=None):
+        result = self.backtest(history, start_capital, obv_ema_period, indicator)
+        if result is None:
             print("Otillräckligt med data för OBV-beräkning.")
             return
 
-        df = pd.DataFrame(history, columns=["Date", "Price", "Volume"])
-        df["Date"] = pd.to_datetime(df["Date"])
-        df = df.sort_values("Date")
-
-        df["OBV_Change"] = df["Volume"] * df["Price"].diff().apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
-        df["OBV"] = df["OBV_Change"].cumsum().fillna(0)
-        df["OBV_EMA"] = df["OBV"].ewm(span=obv_ema_period, adjust=False).mean()
-
-        df["Signal"] = 0
-        df.loc[df["OBV"] > df["OBV_EMA"], "Signal"] = 1
-        df.loc[df["OBV"] < df["OBV_EMA"], "Signal"] = -1
-        df["Signal_Change"] = df["Signal"].diff()
-
-        buy_signals = df[df["Signal_Change"] == 2][["Date", "Price"]].to_numpy().tolist()
-        sell_signals = df[df["Signal_Change"] == -2][["Date", "Price"]].to_numpy().tolist()
-
-        num_trades = 0
-        total_profit = 0
-        trade_logs = []
-        holding = None
-
-        buy_index = 0
-        sell_index = 0
-
-        while buy_index < len(buy_signals) and sell_index < len(sell_signals):
-            buy_date, buy_price = buy_signals[buy_index]
-            sell_date, sell_price = sell_signals[sell_index]
-
-            # Om en sälj-signal kommer före första köp-signalen, ignorera den
-            if sell_date < buy_date:
-                sell_index += 1
-                continue
-
-            # Genomför köp om vi inte redan har en position
-            if holding is None:
-                num_shares = start_capital // buy_price
-                holding = (buy_date, buy_price, num_shares)
-                trade_logs.append(
-                    f"📈 Köp-signal: {buy_date.strftime('%Y-%m-%d')} - Köp {num_shares:.1f} aktier till {buy_price:.2f} SEK")
-                buy_index += 1  # Flytta till nästa köp-signal
-            else:
-                _, entry_price, num_shares = holding
-                profit = (sell_price - entry_price) * num_shares
-
-                # Sälj endast om vi gör vinst
-                #if profit > 0:
-                total_profit += profit
-                num_trades += 1
-                trade_logs.append(
-                    f"📉 Sälj-signal: {sell_date.strftime('%Y-%m-%d')} - Sålt {num_shares:.1f} aktier till {sell_price:.2f} SEK - Vinst: {profit:.2f} SEK")
-                holding = None  # Nollställ innehavet
-                sell_index += 1  # Flytta till nästa sälj-signal
-                #else:
-                    # Om säljpriset inte ger vinst, gå vidare till nästa sälj-signal
-                    #sell_index += 1
-
-            # Säkerställ att vi går vidare i loopen
-            if buy_index >= len(buy_signals) or sell_index >= len(sell_signals):
-                break
-
-        for log in trade_logs:
-            print(log)
-
-        # Plotta pris och köp-/säljsignaler
-        fig, ax1 = plt.subplots(figsize=(12, 6))
-        ax1.plot(df["Date"], df["Price"], label="Pris", color="blue", linewidth=2)
-        ax1.scatter(*zip(*buy_signals) if buy_signals else ([], []), marker="^", color="green", label="Köp-signal",
-                    s=100)
-        ax1.scatter(*zip(*sell_signals) if sell_signals else ([], []), marker="v", color="red", label="Sälj-signal",
-                    s=100)
-
-        ax1.set_xlabel("Datum")
-        ax1.set_ylabel("Pris (SEK)")
-        ax1.legend()
-        ax1.grid()
-
-        ax2 = ax1.twinx()
-        ax2.plot(df["Date"], df["OBV"], label="OBV", color="purple", alpha=0.6, linestyle="dashed")
-        ax2.plot(df["Date"], df["OBV_EMA"], label=f"OBV EMA {obv_ema_period}", color="orange", linestyle="solid")
-        ax2.set_ylabel("OBV")
-        ax2.legend(loc="upper left")
-
-        plt.title(f"OBV-strategi för {stock_name}")
-        plt.xticks(rotation=45)
-        plt.show()
-
-        total_percentage_profit = (total_profit / start_capital) * 100 if start_capital else 0
-
-        print(f"\n📊 Totalt antal affärer: {num_trades}")
-        print(f"💵 Totalt resultat: {total_profit:.2f} SEK")
-        print(f"📈 Total procentuell avkastning: {total_percentage_profit:.2f}%\n")
+        df, ledger = result
+        self.show_plot(stock_name, df, ledger, obv_ema_period=obv_ema_period)
+        print_trades(df["Date"], ledger)
+        return ledger
+
+    def plot(self, chart, stock_name, df, ledger, obv_ema_period=20):
+        # Pris och signaler på prisaxeln, OBV på den sekundära axeln
+        chart.begin(f"OBV-strategi för {stock_name}")
+        chart.set_labels(secondary_ylabel="OBV")
+        chart.line("price", df["Date"], df["Price"], label="Pris", color="blue", linewidth=2)
+        chart.markers("buy", df["Date"].iloc[ledger.buy_idx], ledger.buy_prices, label="Köp-signal", marker="^",
+                      color="green", s=100)
+        chart.markers("sell", df["Date"].iloc[ledger.sell_idx], ledger.sell_prices, label="Sälj-signal", marker="v",
+                      color="red", s=100)
+        chart.line("indicator", df["Date"], df["OBV"], label="OBV", secondary=True, color="purple", alpha=0.6,
+                   linestyle="dashed")
+        chart.line("signal", df["Date"], df["OBV_EMA"], label=f"OBV EMA {obv_ema_period}", secondary=True,
+                   color="orange", linestyle="solid")
+        chart.finish()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Parametersvep: testar alla kombinationer i ett rutnät av strategiparametrar per aktie
+och returnerar en rankad resultattabell.
+
+Exempel:
+    python3 Optimizer.py SMA --grid window_size=5:200 --stocks ERIC-B,VOLV-B
+    python3 Optimizer.py ROC --grid period=5:30 --grid roc_threshold=0:5:0.5 --top 50
+    python3 Optimizer.py FIBONACCI_RETRACEMENT --grid lookback=20:250:10
+"""
+import argparse
+import csv
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Backtest import crossover_signals, ledger_summary, simulate_trades
+from Database import DatabaseManager
+from FibonacciStrategy import FibonacciStrategy, retracement_signals
+from Indicators import cumulative_sum, ema, ewm, obv, roc, rolling_max, rolling_min, run_lengths, sma
+
+
+class TickerData:
+    """
+    Pris- och volymserier för en aktie plus mellanresultat som delas mellan alla
+    parameterkombinationer (kumulativ summa, OBV, beräknade indikatorer).
+    """
+    def __init__(self, prices, volumes):
+        self.prices = np.asarray(prices, dtype=float)
+        self.volumes = np.asarray(volumes, dtype=float)
+        self.csum = cumulative_sum(self.prices)
+        self.runs = run_lengths(self.prices)
+        self._indicators = {}
+
+    def indicator(self, key, compute):
+        """Räknar en indikator första gången den behövs och återanvänder den sedan."""
+        if key not in self._indicators:
+            self._indicators[key] = compute()
+        return self._indicators[key]
+
+    def sma(self, window):
+        return self.indicator(("SMA", window), lambda: sma(self.prices, window, self.csum, self.runs))
+
+    def ema(self, period):
+        return self.indicator(("EMA", period), lambda: ema(self.prices, period))
+
+    def roc(self, period):
+        return self.indicator(("ROC", period), lambda: roc(self.prices, period))
+
+    def obv(self):
+        return self.indicator(("OBV",), lambda: obv(self.prices, self.volumes))
+
+    def obv_ema(self, period):
+        return self.indicator(("OBV_EMA", period), lambda: ewm(self.obv(), period))
+
+    def rolling_max(self, window):
+        return self.indicator(("MAX", window), lambda: rolling_max(self.prices, window))
+
+    def rolling_min(self, window):
+        return self.indicator(("MIN", window), lambda: rolling_min(self.prices, window))
+
+
+def _sma_signals(data, window_size):
+    return crossover_signals(data.prices, data.sma(window_size))
+
+
+def _ema_signals(data, period):
+    return crossover_signals(data.prices, data.ema(period))
+
+
+def _roc_signals(data, period, roc_threshold):
+    roc_values = data.roc(period)
+    return roc_values < -roc_threshold, roc_values > roc_threshold
+
+
+def _obv_signals(data, obv_ema_period):
+    return crossover_signals(data.obv(), data.obv_ema(obv_ema_period))
+
+
+def _fibonacci_signals(data, lookback):
+    highest, lowest = data.rolling_max(lookback), data.rolling_min(lookback)
+    levels = FibonacciStrategy().fibonacci_levels(highest, lowest)
+    return retracement_signals(data.prices, levels, highest, lowest)
+
+
+# Strateginamn -> (parameternamn, funktion som ger köp- och säljkandidater)
+SWEEPS = {
+    "SMA": (("window_size",), _sma_signals),
+    "EMA": (("period",), _ema_signals),
+    "ROC": (("period", "roc_threshold"), _roc_signals),
+    "OBV": (("obv_ema_period",), _obv_signals),
+    "FIBONACCI_RETRACEMENT": (("lookback",), _fibonacci_signals),
+}
+
+
+def evaluate(strategy_name, data, combos, start_value=10000):
+    """
+    Kör alla parameterkombinationer på en aktie.
+    :param strategy_name: Nyckel i SWEEPS.
+    :param data: TickerData för aktien.
+    :param combos: Lista av tuples med parametervärden i samma ordning som SWEEPS.
+    :param start_value: Startkapital för testköp.
+    :return: Lista med en resultat-dict per kombination.
+    """
+    param_names, signals = SWEEPS[strategy_name]
+    results = []
+    for combo in combos:
+        params = dict(zip(param_names, combo))
+        buy_mask, sell_mask = signals(data, **params)
+        ledger = simulate_trades(data.prices, buy_mask, sell_mask, start_value)
+        params.update(ledger_summary(ledger, start_value))
+        results.append(params)
+    return results
+
+
+# Tillstånd per arbetsprocess, sätts upp en gång av _init_worker
+_worker = {}
+
+
+def _init_worker(db_name, strategy_name, start_value, months):
+    _worker["db"] = DatabaseManager(db_name)
+    _worker["strategy"] = strategy_name
+    _worker["start_value"] = start_value
+    _worker["months"] = months
+
+
+def _run_task(task):
+    """Laddar en aktie en gång och kör en del av rutnätet på den."""
+    name, combos = task
+    history = _worker["db"].get_stock_history(name, _worker["months"])
+    if not history:
+        return []
+
+    data = TickerData(history.prices, history.volumes)
+    results = evaluate(_worker["strategy"], data, combos, _worker["start_value"])
+    for row in results:
+        row["name"] = name
+    return results
+
+
+def parse_grid(text):
+    """
+    Tolkar en rutnätsparameter: "namn=start:stopp[:steg]" (stopp inkluderat) eller "namn=a,b,c".
+    :return: (namn, lista med värden)
+    """
+    key, _, spec = text.partition("=")
+    number = lambda s: float(s) if "." in s else int(s)
+    if ":" in spec:
+        parts = [number(p) for p in spec.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        return key, [start + i * step for i in range(count)]
+    return key, [number(p) for p in spec.split(",")]
+
+
+def sweep(strategy_name, grid, names, db_name="stocks.db", start_value=10000, months=None, workers=None,
+          rank_by="total_profit"):
+    """
+    Kör ett parametersvep över flera aktier på en processpool.
+    Rutnätet delas i bitar så att även ett fåtal aktier fördelas över alla kärnor;
+    varje bit laddar sin aktie och räknar gemensamma mellanresultat en gång.
+    :param strategy_name: Nyckel i SWEEPS.
+    :param grid: Dict parameternamn -> lista med värden.
+    :param names: Lista med aktienamn.
+    :param rank_by: Kolumn att sortera resultatet efter (fallande).
+    :return: Lista med resultat-dicts, bäst först.
+    """
+    param_names = SWEEPS[strategy_name][0]
+    missing = [p for p in param_names if p not in grid]
+    if missing:
+        raise ValueError(f"Rutnät saknas för parametrarna: {', '.join(missing)}")
+
+    combos = list(itertools.product(*(grid[p] for p in param_names)))
+    workers = workers or os.cpu_count() or 1
+    chunks = min(len(combos), max(1, math.ceil(workers * 2 / max(len(names), 1))))
+    chunk_size = math.ceil(len(combos) / chunks)
+    tasks = [(name, combos[i:i + chunk_size]) for name in names for i in range(0, len(combos), chunk_size)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_name, strategy_name, start_value, months)) as pool:
+        for rows in pool.map(_run_task, tasks):
+            results.extend(rows)
+
+    results.sort(key=lambda row: row[rank_by], reverse=True)
+    for rank, row in enumerate(results, start=1):
+        row["rank"] = rank
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parametersvep för en strategi över en eller flera aktier.")
+    parser.add_argument("strategy", choices=sorted(SWEEPS))
+    parser.add_argument("--grid", action="append", default=[], metavar="NAMN=START:STOPP[:STEG]",
+                        help="Parameterrutnät, t.ex. window_size=5:200 eller period=10,20,50")
+    parser.add_argument("--stocks", help="Kommaseparerade aktienamn (standard: alla aktier)")
+    parser.add_argument("--db", default="stocks.db", help="Sökväg till databasen")
+    parser.add_argument("--output", default="sweep_results.csv", help="CSV-fil för den rankade tabellen")
+    parser.add_argument("--months", type=int, help="Antal månader historik (standard: hela historiken)")
+    parser.add_argument("--start-capital", type=float, help="Startkapital (standard: inställningen start_capital)")
+    parser.add_argument("--rank-by", default="total_profit",
+                        choices=["total_profit", "total_percentage_profit", "return_pct", "num_trades"])
+    parser.add_argument("--top", type=int, help="Skriv bara ut de N bästa raderna")
+    parser.add_argument("--workers", type=int, help="Antal processer (standard: antal kärnor)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    start_value = args.start_capital or db.get_setting("start_capital") or 10000
+    names = args.stocks.split(",") if args.stocks else db.get_stock_names()
+    db.close()
+
+    grid = dict(parse_grid(g) for g in args.grid)
+    results = sweep(args.strategy, grid, names, args.db, start_value, args.months, args.workers, args.rank_by)
+    if args.top:
+        results = results[:args.top]
+
+    columns = ["rank", "name", *SWEEPS[args.strategy][0], "num_trades", "total_profit", "total_percentage_profit",
+               "return_pct", "open_position"]
+    with open(args.output, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(results)
+
+    print(f"✅ {len(results)} resultat sparade i {args.output}")
+    for row in results[:10]:
+        params = ", ".join(f"{p}={row[p]}" for p in SWEEPS[args.strategy][0])
+        print(f"{row['rank']:>4}. {row['name']} ({params}): {row['total_profit']:.2f} SEK, {row['num_trades']} affärer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Portföljbacktest: en strategi körs på många aktier samtidigt med gemensam kassa,
+ett högsta antal samtidiga innehav och daglig marknadsvärdering av portföljen.
+Priserna läses som en matris (aktier × dagar) och varje dag simuleras för alla
+aktier på en gång med NumPy.
+
+Exempel:
+    python3 Portfolio.py SMA --param window_size=50 --max-positions 20 --months 120
+    python3 Portfolio.py ROC --param period=10 --param roc_threshold=2 --output equity.csv
+"""
+import argparse
+import csv
+
+import numpy as np
+
+from BatchBacktest import _parse_param
+from Database import DatabaseManager, day_to_date
+from Optimizer import SWEEPS, TickerData
+from RiskMetrics import forward_fill
+
+
+def signal_matrices(strategy_name, prices, volumes, **params):
+    """
+    Köp- och säljkandidater för alla aktier. Indikatorerna räknas per aktie på
+    dess egna handelsdagar, precis som när strategin körs på en aktie i taget.
+    :param strategy_name: Nyckel i Optimizer.SWEEPS.
+    :param prices: Prismatris (aktier × dagar) med NaN för dagar utan kurs.
+    :param volumes: Volymmatris med samma form.
+    :return: Två bool-matriser (köp, sälj) med samma form som prices.
+    """
+    signals = SWEEPS[strategy_name][1]
+    buy = np.zeros(prices.shape, dtype=bool)
+    sell = np.zeros(prices.shape, dtype=bool)
+    for row in range(prices.shape[0]):
+        traded = np.flatnonzero(~np.isnan(prices[row]))
+        if traded.size == 0:
+            continue
+        buy_mask, sell_mask = signals(TickerData(prices[row, traded], volumes[row, traded]), **params)
+        buy[row, traded] = buy_mask
+        sell[row, traded] = sell_mask
+    return buy, sell
+
+
+class PortfolioResult:
+    """
+    Resultatet av en portföljsimulering: värde, kassa och antal innehav per dag
+    samt alla avslutade affärer. Innehav som är öppna sista dagen ingår i värdet
+    men inte i affärerna.
+    """
+    def __init__(self, names, days, equity, cash, positions, trades, start_capital):
+        self.names = names
+        self.days = days
+        self.equity = equity
+        self.cash = cash
+        self.positions = positions
+        self.trades = trades  # Dict kolumn -> array, en rad per avslutad affär
+        self.start_capital = start_capital
+
+    @property
+    def num_trades(self):
+        return len(self.trades["ticker"])
+
+    @property
+    def total_return_pct(self):
+        return float(self.equity[-1] / self.start_capital - 1) * 100 if len(self.equity) else 0.0
+
+    @property
+    def max_drawdown_pct(self):
+        if not len(self.equity):
+            return 0.0
+        return float((self.equity / np.maximum.accumulate(self.equity) - 1).min() * 100)
+
+    def summary(self):
+        """Sammanfattning som dict, i samma stil som Backtest.ledger_summary."""
+        return {
+            "num_trades": self.num_trades,
+            "final_equity": float(self.equity[-1]) if len(self.equity) else self.start_capital,
+            "return_pct": self.total_return_pct,
+            "max_drawdown_pct": self.max_drawdown_pct,
+            "total_profit": float(self.trades["profit"].sum()),
+            "open_positions": int(self.positions[-1]) if len(self.positions) else 0,
+        }
+
+
+def simulate_portfolio(prices, buy, sell, start_capital=100000, max_positions=10, position_size=None, fee=0.0,
+                       names=None, days=None):
+    """
+    Simulerar en portfölj dag för dag, vektoriserat över alla aktier.
+    Varje dag säljs först innehav med säljsignal, sedan köps aktier med köpsignal
+    så länge det finns lediga platser och kassa. Köpen görs i aktiernas ordning och
+    varje köp får position_size av portföljens värde, dock högst kassan som finns kvar.
+    Affärer görs bara på dagar då aktien har en kurs; dagar utan kurs värderas med
+    senast kända pris.
+    :param prices: Prismatris (aktier × dagar) med NaN för dagar utan kurs.
+    :param buy: Bool-matris med köpkandidater, samma form som prices.
+    :param sell: Bool-matris med säljkandidater.
+    :param start_capital: Kassa första dagen.
+    :param max_positions: Högsta antal aktier som ägs samtidigt.
+    :param position_size: Andel av portföljens värde per köp, standard 1 / max_positions.
+    :param fee: Courtage som andel av affärens värde, dras vid både köp och sälj.
+    :return: PortfolioResult.
+    """
+    prices = np.asarray(prices, dtype=float)
+    num_tickers, num_days = prices.shape
+    position_size = 1 / max_positions if position_size is None else position_size
+    traded = ~np.isnan(prices)
+    marks = np.nan_to_num(forward_fill(prices))  # Värderingspris, 0 före första kursen
+
+    shares = np.zeros(num_tickers)
+    entry_price = np.zeros(num_tickers)
+    entry_day = np.zeros(num_tickers, dtype=np.intp)
+    cash = float(start_capital)
+    equity = np.empty(num_days)
+    cash_series = np.empty(num_days)
+    positions = np.empty(num_days, dtype=np.intp)
+    closed = {"ticker": [], "buy_day": [], "sell_day": [], "shares": [], "buy_price": [], "sell_price": []}
+
+    for t in range(num_days):
+        price = prices[:, t]
+        holding = shares > 0
+
+        selling = np.flatnonzero(holding & sell[:, t] & traded[:, t])
+        if selling.size:
+            cash += float((shares[selling] * price[selling]).sum()) * (1 - fee)
+            for key, values in (("ticker", selling), ("buy_day", entry_day[selling]), ("sell_day", [t] * selling.size),
+                                ("shares", shares[selling]), ("buy_price", entry_price[selling]),
+                                ("sell_price", price[selling])):
+                closed[key].append(np.asarray(values))
+            shares[selling] = 0
+            holding[selling] = False
+
+        slots = max_positions - int(holding.sum())
+        buying = np.flatnonzero(~holding & buy[:, t] & traded[:, t])[:max(slots, 0)]
+        if buying.size:
+            value = cash + float((shares * marks[:, t]).sum())
+            target = value * position_size
+            # Köpen som ryms helt i kassan får target; det första som inte ryms får resten av kassan
+            cost_per_share = price[buying] * (1 + fee)
+            new_shares = np.floor(target / cost_per_share)
+            spent = np.cumsum(new_shares * cost_per_share)
+            fits = int(np.searchsorted(spent, cash, side="right"))
+            if fits < buying.size:
+                left = cash - (spent[fits - 1] if fits else 0.0)
+                new_shares[fits] = np.floor(left / cost_per_share[fits])
+                new_shares[fits + 1:] = 0
+            bought = buying[new_shares > 0]
+            if bought.size:
+                shares[bought] = new_shares[new_shares > 0]
+                entry_price[bought] = price[bought]
+                entry_day[bought] = t
+                cash -= float((shares[bought] * cost_per_share[new_shares > 0]).sum())
+
+        equity[t] = cash + float((shares * marks[:, t]).sum())
+        cash_series[t] = cash
+        positions[t] = int((shares > 0).sum())
+
+    trades = {key: np.concatenate(values) if values else np.empty(0) for key, values in closed.items()}
+    for key in ("ticker", "buy_day", "sell_day"):
+        trades[key] = trades[key].astype(np.intp)
+    trades["profit"] = (trades["shares"] * (trades["sell_price"] * (1 - fee) - trades["buy_price"] * (1 + fee)))
+    return PortfolioResult(names if names is not None else list(range(num_tickers)),
+                           days if days is not None else np.arange(num_days),
+                           equity, cash_series, positions, trades, start_capital)
+
+
+def run_portfolio(db, strategy_name, params=None, names=None, months=None, **options):
+    """
+    Läser prismatrisen från databasen, räknar signalerna och simulerar portföljen.
+    :param db: DatabaseManager.
+    :param options: Vidare till simulate_portfolio, t.ex. start_capital och max_positions.
+    :return: PortfolioResult.
+    """
+    names, days, prices, volumes = db.get_price_matrix(names, months, volumes=True)
+    buy, sell = signal_matrices(strategy_name, prices, volumes, **(params or {}))
+    return simulate_portfolio(prices, buy, sell, names=names, days=days, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kör en strategi som en portfölj över många aktier.")
+    parser.add_argument("strategy", choices=sorted(SWEEPS))
+    parser.add_argument("--db", default="stocks.db", help="Sökväg till databasen")
+    parser.add_argument("--stocks", help="Kommaseparerade aktienamn (standard: alla)")
+    parser.add_argument("--months", type=int, help="Antal månader historik (standard: hela historiken)")
+    parser.add_argument("--start-capital", type=float, default=100000, help="Portföljens startkapital")
+    parser.add_argument("--max-positions", type=int, default=10, help="Högsta antal samtidiga innehav")
+    parser.add_argument("--position-size", type=float, help="Andel av portföljen per köp (standard: 1/max)")
+    parser.add_argument("--fee", type=float, default=0.0, help="Courtage i procent av affärens värde")
+    parser.add_argument("--param", action="append", default=[], metavar="NAMN=VÄRDE",
+                        help="Strategiparameter, t.ex. window_size=50")
+    parser.add_argument("--output", help="CSV-fil för portföljens värde per dag (valfri)")
+    parser.add_argument("--trades", help="CSV-fil för alla avslutade affärer (valfri)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    params = {"period": db.get_setting("roc_period") or 14,
+              "roc_threshold": db.get_setting("roc_threshold") or 1} if args.strategy == "ROC" else {}
+    params.update(_parse_param(p) for p in args.param)
+    result = run_portfolio(db, args.strategy, params, args.stocks.split(",") if args.stocks else None, args.months,
+                           start_capital=args.start_capital, max_positions=args.max_positions,
+                           position_size=args.position_size, fee=0.01 * args.fee)
+    db.close()
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["date", "equity", "cash", "positions"])
+            for n, day in enumerate(result.days):
+                writer.writerow([day_to_date(day), f"{result.equity[n]:.2f}", f"{result.cash[n]:.2f}",
+                                 result.positions[n]])
+    if args.trades:
+        with open(args.trades, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["name", "buy_date", "buy_price", "sell_date", "sell_price", "shares", "profit"])
+            trades = result.trades
+            for n in range(result.num_trades):
+                writer.writerow([result.names[trades["ticker"][n]], day_to_date(result.days[trades["buy_day"][n]]),
+                                 trades["buy_price"][n], day_to_date(result.days[trades["sell_day"][n]]),
+                                 trades["sell_price"][n], trades["shares"][n], f"{trades['profit'][n]:.2f}"])
+
+    summary = result.summary()
+    print(f"📊 {args.strategy} på {len(result.names)} aktier: {summary['num_trades']} affärer, "
+          f"{summary['open_positions']} öppna innehav")
+    print(f"💵 Slutvärde {summary['final_equity']:.2f} SEK ({summary['return_pct']:.2f}%), "
+          f"största nedgång {summary['max_drawdown_pct']:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Inbyggd profilering av appens heta vägar. Avstängd som standard; slås på med
+miljövariabeln STOCK_ANALYZER_PROFILE eller från menyn Övrigt i huvudfönstret.
+
+Varje användaråtgärd (t.ex. "EMA") blir en ActionProfile med tid per span
+(databasanrop, strategisteg, utskrift, ritning), antal SQL-frågor och högsta
+minnesanvändning enligt tracemalloc. Spans från bakgrundsuppgifter räknas till
+åtgärden som startade dem. Avstängd kostar en span bara en attributkontroll.
+
+    STOCK_ANALYZER_PROFILE=1 python3 StockAnalyzer.py
+    STOCK_ANALYZER_PROFILE=rapport python3 StockAnalyzer.py   # skriver rapport.txt/.json vid avslut
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+from functools import wraps
+
+PROFILE_ENV = "STOCK_ANALYZER_PROFILE"
+
+_SPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+
+
+class ActionProfile:
+    """Mätningar för en användaråtgärd, från klick till sista graf."""
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.spans = {}        # Spannamn -> [antal, sekunder]
+        self.queries = {}      # SQL med literaler ersatta av ? -> antal
+        self.memory_start = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.peak_memory = 0   # Byte över minnet vid start, 0 om tracemalloc inte körs
+        self.pending = 1       # Åtgärden avslutas när with-blocket och alla bakgrundsuppgifter är klara
+        self.lock = threading.Lock()
+
+    def add_span(self, name, seconds):
+        with self.lock:
+            span = self.spans.setdefault(name, [0, 0.0])
+            span[0] += 1
+            span[1] += seconds
+
+    def add_query(self, sql):
+        # SQLite skickar frågan med ifyllda parametrar; literaler ersätts så att samma fråga räknas ihop
+        sql = _NUMBER.sub("?", _STRING.sub("?", _SPACE.sub(" ", sql).strip()))
+        with self.lock:
+            self.queries[sql] = self.queries.get(sql, 0) + 1
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "query_count": self.query_count,
+            "peak_memory_bytes": self.peak_memory,
+            "spans": {name: {"count": count, "seconds": seconds} for name, (count, seconds) in self.spans.items()},
+            "queries": self.queries,
+        }
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.current_or_unattached().add_span(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """
+    Samlar ActionProfile:s. Aktuell åtgärd hålls per tråd; hold() och activate()
+    för med den till bakgrundstrådar och tillbaka till GUI-tråden.
+    """
+    unattached_name = "(utanför åtgärder)"
+
+    def __init__(self):
+        self.enabled = False
+        self.actions = []                   # Avslutade åtgärder i tidsordning
+        self.unattached = ActionProfile(self.unattached_name)
+        self.managers = weakref.WeakSet()   # DatabaseManager-objekt vars frågor räknas
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.started_tracemalloc = False
+
+    def enable(self):
+        if self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        self.enabled = True
+        for manager in list(self.managers):
+            self._trace(manager, True)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for manager in list(self.managers):
+            self._trace(manager, False)
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    def register(self, manager):
+        """Räknar frågorna på alla anslutningar i manager.pool när profileringen är på."""
+        self.managers.add(manager)
+        if self.enabled:
+            self._trace(manager, True)
+
+    def _trace(self, manager, on):
+        manager.pool.set_trace_callback(self._count_query if on else None)
+
+    def _count_query(self, sql):
+        self.current_or_unattached().add_query(sql)
+
+    def current(self):
+        return getattr(self.local, "action", None)
+
+    def current_or_unattached(self):
+        return getattr(self.local, "action", None) or self.unattached
+
+    def span(self, name):
+        """Tidtagning av ett kodblock: with profiler.span("namn"): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    @contextmanager
+    def action(self, name):
+        """Mäter en användaråtgärd. Spans i blocket och i uppgifter som hålls med hold() räknas dit."""
+        if not self.enabled or self.current() is not None:
+            yield self.current()
+            return
+        action = ActionProfile(name)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.local.action = action
+        try:
+            yield action
+        finally:
+            self.local.action = None
+            self.release(action)
+
+    def hold(self):
+        """Håller aktuell åtgärd öppen åt en bakgrundsuppgift. :return: Åtgärden eller None."""
+        action = self.current()
+        if action is not None:
+            with action.lock:
+                action.pending += 1
+        return action
+
+    def release(self, action):
+        """Släpper en hållning; sista släppet avslutar åtgärden."""
+        if action is None:
+            return
+        with action.lock:
+            action.pending -= 1
+            finished = action.pending == 0
+        if not finished:
+            return
+        action.seconds = time.perf_counter() - action.start
+        if tracemalloc.is_tracing():
+            action.peak_memory = max(0, tracemalloc.get_traced_memory()[1] - action.memory_start)
+        with self.lock:
+            self.actions.append(action)
+        print(f"⏱ {action.name}: {action.seconds * 1000:.1f} ms, {action.query_count} SQL-frågor, "
+              f"{action.peak_memory / 1024 / 1024:.1f} MB minnestopp")
+
+    @contextmanager
+    def activate(self, action):
+        """Gör action till aktuell åtgärd i den här tråden under blocket."""
+        previous = self.current()
+        self.local.action = action
+        try:
+            yield action
+        finally:
+            self.local.action = previous
+
+    def clear(self):
+        with self.lock:
+            self.actions = []
+            self.unattached = ActionProfile(self.unattached_name)
+
+    def report(self):
+        """Alla avslutade åtgärder plus spans utanför åtgärder, som JSON-vänlig dict."""
+        with self.lock:
+            actions = [action.to_dict() for action in self.actions]
+        if self.unattached.spans or self.unattached.queries:
+            actions.append(self.unattached.to_dict())
+        return {"enabled": self.enabled, "actions": actions}
+
+    def report_text(self, top_queries=5):
+        lines = []
+        for action in self.report()["actions"]:
+            seconds = action["seconds"]
+            lines.append(f"{action['name']}: " + (f"{seconds * 1000:.1f} ms, " if seconds is not None else "")
+                         + f"{action['query_count']} SQL-frågor, "
+                           f"minnestopp {action['peak_memory_bytes'] / 1024 / 1024:.1f} MB")
+            spans = sorted(action["spans"].items(), key=lambda item: -item[1]["seconds"])
+            for name, span in spans:
+                lines.append(f"    {span['seconds'] * 1000:10.1f} ms  {span['count']:6d} x  {name}")
+            queries = sorted(action["queries"].items(), key=lambda item: -item[1])[:top_queries]
+            for sql, count in queries:
+                lines.append(f"    {count:6d} x  {sql[:100]}")
+        return "\n".join(lines)
+
+    def export(self, base_path):
+        """Skriver rapporten som <base_path>.txt och <base_path>.json. :return: Sökvägarna."""
+        base_path = os.path.splitext(base_path)[0]
+        with open(base_path + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.report_text() + "\n")
+        with open(base_path + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        return base_path + ".txt", base_path + ".json"
+
+
+def profiled(name):
+    """Dekorator som mäter varje anrop av funktionen som en span med namnet name."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with _Span(profiler, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Profileraren som delas av hela processen
+profiler = Profiler()
+
+_env = os.environ.get(PROFILE_ENV, "").strip()
+if _env and _env.lower() not in ("0", "false", "no"):
+    profiler.enable()
+    if _env.lower() not in ("1", "true", "yes"):
+        # Ett annat värde är ett filnamn för rapporten när programmet avslutas
+        atexit.register(lambda: profiler.export(_env))
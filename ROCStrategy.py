@@ -1,6 +1,6 @@
-import pandas as pd
-from matplotlib import pyplot as plt
-from Strategy import TradingStrategy
+from Backtest import print_trades, simulate_trades
+from Indicators import StreamingROC, roc
+from Strategy import TradingStrategy, history_frame
 
 class ROCStrategy(TradingStrategy):
     def calculate_roc(self, prices, period=14):
@@ -14,15 +14,34 @@ class ROCStrategy(TradingStrategy):
             print("Otillräckligt med data för ROC-beräkning.")
             return []
 
-        roc_values = []
-        for i in range(period, len(prices)):
-            roc = ((prices[i] - prices[i - period]) / prices[i - period]) * 100
-            roc_values.append(roc)
+        return roc(prices, period)
 
-        # Fyller början med None för att matcha längden på priserna
-        return [None] * period + roc_values
+    def backtest(self, history, start_value=10000, period=14, roc_threshold=1, indicator=None):
+        """
+        :param indicator: Färdigberäknad ROC-serie med ett värde per dag i history, annars räknas den här.
+        """
+        if not history or len(history) < period:
+            return None
+
+        df = history_frame(history)
+        df["ROC"] = self.calculate_roc(df["Price"], period) if indicator is None else indicator
+
+        # Köp när ROC är under -roc_threshold, sälj när ROC är över roc_threshold
+        roc_values = df["ROC"].to_numpy(dtype=float)
+        buy_mask = roc_values < -roc_threshold
+        sell_mask = roc_values > roc_threshold
+        return df, simulate_trades(df["Price"].to_numpy(dtype=float), buy_mask, sell_mask, start_value)
+
+    def start_stream(self, period=14, roc_threshold=1):
+        self.min_bars = period
+        self.roc = StreamingROC(period)
+        self.roc_threshold = roc_threshold
 
-    def execute(self, stock_name, history, start_value=10000, period=14, roc_threshold=1):
+    def bar_signals(self, price, volume):
+        roc_value = self.roc.update(price)
+        return roc_value < -self.roc_threshold, roc_value > self.roc_threshold
+
+    def execute(self, stock_name, history, start_value=10000, period=14, roc_threshold=1, indicator=None):
         """
         Plottar ROC och identifierar köp-/säljsignaler baserat på ROC och gör testköp samt beräknar vinst.
         :param stock_name: Namnet på aktien.
@@ -30,86 +49,25 @@ class ROCStrategy(TradingStrategy):
         :param period: ROC-period (standard 14 dagar).
         :param start_value: Startvärde för investering.
         :param roc_threshold: Tröskelvärde för ROC (standard 5).
+        :param indicator: Färdigberäknad ROC-serie, annars räknas den från history.
         """
-        if not history or len(history) < period:
+        result = self.backtest(history, start_value, period, roc_threshold, indicator)
+        if result is None:
             print("Otillräckligt med data för ROC-beräkning.")
             return
 
-        # Hantera tre kolumner: (datum, pris, volym), men vi använder bara datum och pris
-        df = pd.DataFrame(history, columns=["Date", "Price", "Volume"])
-        df["Date"] = pd.to_datetime(df["Date"])
-        df = df.sort_values("Date")
-
-        # Beräkna ROC
-        df["ROC"] = self.calculate_roc(df["Price"], period)
-
-        # Ta bort det sista värdet från dates och prices för att matcha längd på roc_values
-        dates = df["Date"][:len(df["ROC"])]
-        prices = df["Price"][:len(df["ROC"])]
-        roc_values = df["ROC"]
-
-        buy_signals = []
-        sell_signals = []
-
-        shares_held = 0  # Antal aktier vi äger
-        total_profit = 0
-        total_percentage_profit = 0
-        num_trades = 0
-        holding = False
-        entry_price = 0
-
-        # Identifiera köp- och säljsignaler baserat på ROC och tröskelvärde
-        for i in range(1, len(roc_values)):
-            if pd.isna(roc_values[i]):
-                continue  # Hoppa över periodens första värden (som är NaN)
-
-            price = prices.iloc[i]
-            roc = roc_values[i]
-
-            # 🔹 Köp-signal: När ROC är under -roc_threshold och vi inte redan har aktier
-            if roc < -roc_threshold and not holding:
-                shares_held = start_value // price  # Beräkna antal aktier
-                if shares_held > 0:
-                    buy_signals.append((dates.iloc[i], price, shares_held))
-                    holding = True
-                    entry_price = price
-                    print(
-                        f"📈 Köp-signal: {dates.iloc[i].strftime('%Y-%m-%d')} - Köp {shares_held} aktier till {price:.2f} SEK")
-
-            # 🔹 Sälj-signal: När ROC är över roc_threshold och vi håller aktier
-            elif roc > roc_threshold and holding:
-                # Sälj endast om priset är högre än inköpspriset (vinstdiskriminering)
-                #if price > entry_price:
-                    sell_signals.append((dates.iloc[i], price, shares_held))
-                    profit = shares_held * (price - entry_price)
-                    percentage_profit = (profit / (shares_held * entry_price)) * 100
-
-                    total_profit += profit
-                    total_percentage_profit += percentage_profit
-                    num_trades += 1  # Räkna en affär (köp + försäljning som en affär)
-                    holding = False
-                    print(
-                        f"📉 Sälj-signal: {dates.iloc[i].strftime('%Y-%m-%d')} - Sålt {shares_held} aktier till {price:.2f} SEK - Vinst: {profit:.2f} SEK")
-
-                    shares_held = 0  # Säljer alla aktier, återställ till 0
-
-        print(f"\n📊 Totalt antal affärer: {num_trades}")
-        print(f"💵 Totalt resultat: {total_profit:.2f} SEK")
-        print(f"📈 Total procentuell avkastning: {total_percentage_profit:.2f}%")
-
-        # Plotta ROC och köp-/säljsignaler
-        plt.figure(figsize=(10, 6))
-        plt.plot(dates, roc_values, label="ROC", color="blue")
-
-        # Markera köp och säljsignaler
-        buy_dates, buy_prices = zip(*[(d, p) for d, p, _ in buy_signals]) if buy_signals else ([], [])
-        sell_dates, sell_prices = zip(*[(d, p) for d, p, _ in sell_signals]) if sell_signals else ([], [])
-        plt.scatter(buy_dates, buy_prices, marker="^", color="green", label="Köp Signal")
-        plt.scatter(sell_dates, sell_prices, marker="v", color="red", label="Sälj Signal")
-
-        plt.title(f"ROC för {stock_name}")
-        plt.xlabel("Datum")
-        plt.ylabel("ROC (%)")
-        plt.legend()
-        plt.grid(True)
-        plt.show()
\ No newline at end of file
+        df, ledger = result
+        print_trades(df["Date"], ledger)
+        self.show_plot(stock_name, df, ledger, period=period, roc_threshold=roc_threshold)
+        return ledger
+
+    def plot(self, chart, stock_name, df, ledger, period=14, roc_threshold=1):
+        # ROC och köp-/säljsignalernas priser ritas på samma axel
+        chart.begin(f"ROC för {stock_name}")
+        chart.set_labels(ylabel="ROC (%)")
+        chart.line("indicator", df["Date"], df["ROC"], label="ROC", color="blue")
+        chart.markers("buy", df["Date"].iloc[ledger.buy_idx], ledger.buy_prices, label="Köp Signal", marker="^",
+                      color="green")
+        chart.markers("sell", df["Date"].iloc[ledger.sell_idx], ledger.sell_prices, label="Sälj Signal", marker="v",
+                      color="red")
+        chart.finish()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Riskmått för alla aktier på en gång: priserna läses som en matris (aktier × dagar)
+och varje mått räknas vektoriserat över matrisen. Dagar då en aktie saknar kurs är NaN.
+
+Exempel:
+    python3 RiskMetrics.py --months 12 --risk-free-rate 2 --output risk.csv
+"""
+import argparse
+import csv
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+# Måtten i den ordning de lagras och skrivs ut
+METRICS = ("sharpe", "sortino", "volatility", "max_drawdown", "variance", "beta")
+
+
+def forward_fill(prices):
+    """Fyller NaN med senast kända pris på samma rad. NaN före första priset behålls."""
+    valid = ~np.isnan(prices)
+    index = np.where(valid, np.arange(prices.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = prices[np.arange(prices.shape[0])[:, None], index]
+    filled[np.cumsum(valid, axis=1) == 0] = np.nan
+    return filled
+
+
+def returns_matrix(prices):
+    """
+    Dagliga avkastningar per aktie. En dag utan kurs ger NaN, och avkastningen dagen
+    efter räknas från senast kända pris, så att luckor inte ger falska nollor.
+    :return: Matris med samma form som prices; första kolumnen är NaN.
+    """
+    filled = forward_fill(prices)
+    returns = np.full(prices.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[:, 1:] = filled[:, 1:] / filled[:, :-1] - 1
+    returns[np.isnan(prices)] = np.nan
+    return returns
+
+
+def compute_risk_metrics(prices, risk_free_rate=0.02):
+    """
+    Räknar alla riskmått för varje rad i en prismatris.
+    Sharpe räknas som tidigare i appen: (medelavkastning per dag - risk_free_rate) /
+    standardavvikelse per dag. Sortino använder samma täljare och avvikelsen nedåt.
+    Beta mäts mot ett likaviktat marknadsindex av alla aktier i matrisen.
+    :param prices: Matris (aktier × dagar) med NaN för saknade dagar.
+    :param risk_free_rate: Riskfri avkastning som andel, t.ex. 0.02.
+    :return: Dict måttnamn -> array med ett värde per aktie (NaN om det inte går att räkna).
+    """
+    prices = np.asarray(prices, dtype=float)
+    returns = returns_matrix(prices)
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nansum(returns, axis=1) / count
+        deviation = np.where(valid, returns - mean[:, None], 0.0)
+        std = np.sqrt((deviation ** 2).sum(axis=1) / (count - 1))
+        downside = np.where(valid, np.minimum(returns - risk_free_rate, 0.0), 0.0)
+        downside_std = np.sqrt((downside ** 2).sum(axis=1) / count)
+
+        # Marknaden: medel av alla aktiers avkastning per dag, jämförs bara de dagar aktien handlats
+        traded = valid.any(axis=0)
+        market = np.full(returns.shape[1], np.nan)
+        market[traded] = np.nanmean(returns[:, traded], axis=0)
+        paired = valid & ~np.isnan(market)
+        pairs = paired.sum(axis=1)
+        stock_mean = np.where(paired, returns, 0.0).sum(axis=1) / pairs
+        market_mean = np.where(paired, market, 0.0).sum(axis=1) / pairs
+        stock_dev = np.where(paired, returns - stock_mean[:, None], 0.0)
+        market_dev = np.where(paired, market - market_mean[:, None], 0.0)
+        beta = (stock_dev * market_dev).sum(axis=1) / (market_dev ** 2).sum(axis=1)
+
+        filled = forward_fill(prices)
+        peak = np.fmax.accumulate(filled, axis=1)
+        drawdown = np.nanmin(np.where(np.isnan(filled), 0.0, filled / peak - 1), axis=1)
+
+        price_count = (~np.isnan(prices)).sum(axis=1)
+        price_mean = np.nansum(prices, axis=1) / price_count
+        variance = np.nansum((prices - price_mean[:, None]) ** 2, axis=1) / (price_count - 1)
+
+        return {
+            "sharpe": (mean - risk_free_rate) / std,
+            "sortino": (mean - risk_free_rate) / downside_std,
+            "volatility": std * np.sqrt(TRADING_DAYS),
+            "max_drawdown": np.where(price_count > 0, drawdown, np.nan),
+            "variance": np.where(price_count > 1, variance, np.nan),
+            "beta": beta,
+        }
+
+
+class RiskMetricsStore:
+    """
+    Beräknade riskmått i databasen per aktie, antal månader och riskfri avkastning.
+    Varje rad sparas med periodens första dag och summan av alla aktiers versioner,
+    så att måtten räknas om när perioden flyttas eller någon aktie ändras
+    (beta beror på hela marknaden).
+    """
+    def __init__(self, pool):
+        self.pool = pool  # ConnectionPool; skrivningar går via pool.write()
+        self.conn = pool.writer
+
+    def load(self, symbol_id, months, risk_free_rate, first_day, universe_version):
+        """Returnerar sparade mått som dict, eller None om de saknas eller är inaktuella."""
+        row = self.conn.execute(f"""
+            SELECT {", ".join(METRICS)} FROM risk_metrics
+            WHERE symbol_id = ? AND months = ? AND risk_free_rate = ? AND first_day = ? AND universe_version = ?
+        """, (symbol_id, months, risk_free_rate, first_day, universe_version)).fetchone()
+        if row is None:
+            return None
+        return {name: np.nan if value is None else value for name, value in zip(METRICS, row)}
+
+    def save(self, symbol_ids, metrics, months, risk_free_rate, first_day, universe_version):
+        """Ersätter alla sparade mått för (months, risk_free_rate) med nya värden för symbol_ids."""
+        rows = [(symbol_id, months, risk_free_rate, first_day, universe_version,
+                 *(None if np.isnan(metrics[name][i]) else float(metrics[name][i]) for name in METRICS))
+                for i, symbol_id in enumerate(symbol_ids)]
+        with self.pool.write():
+            self.conn.execute("DELETE FROM risk_metrics WHERE months = ? AND risk_free_rate = ?",
+                              (months, risk_free_rate))
+            self.conn.executemany(f"""
+                INSERT INTO risk_metrics (symbol_id, months, risk_free_rate, first_day, universe_version,
+                                          {", ".join(METRICS)})
+                VALUES ({", ".join("?" * (5 + len(METRICS)))})
+            """, rows)
+
+
+def main():
+    from Database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Riskmått för alla aktier i databasen.")
+    parser.add_argument("--db", default="stocks.db", help="Sökväg till databasen")
+    parser.add_argument("--months", type=int, default=6, help="Antal månader historik")
+    parser.add_argument("--risk-free-rate", type=float, default=2, help="Riskfri avkastning i procent")
+    parser.add_argument("--output", default="risk_metrics.csv", help="CSV-fil för resultatet")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    names, metrics = db.get_all_risk_metrics(args.months, 0.01 * args.risk_free_rate)
+    db.close()
+
+    with open(args.output, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["name", *METRICS])
+        for i, name in enumerate(names):
+            writer.writerow([name, *(f"{metrics[metric][i]:.6g}" for metric in METRICS)])
+    print(f"✅ Riskmått för {len(names)} aktier sparade i {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+def parse_setting(text):
+    """Tolkar ett lagrat inställningsvärde som int, float eller sträng, i den ordningen."""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+class SettingsCache:
+    """
+    Alla inställningar i minnet med typade värden (int/float/str).
+    Tabellen läses en gång; ändringar samlas och skrivs till databasen med flush().
+    """
+    def __init__(self, pool):
+        self.pool = pool  # ConnectionPool; skrivningar går via pool.write()
+        self.conn = pool.writer
+        rows = self.conn.execute("SELECT setting_type, setting_value FROM settings").fetchall()
+        self.values = {setting_type: parse_setting(value) for setting_type, value in rows}
+        self.dirty = set()
+
+    def get(self, setting_type, default=None):
+        return self.values.get(setting_type, default)
+
+    def set(self, setting_type, setting_value):
+        """Ändrar ett värde i minnet. Det skrivs till databasen vid nästa flush()."""
+        if self.values.get(setting_type) == setting_value and setting_type not in self.dirty:
+            return
+        self.values[setting_type] = setting_value
+        self.dirty.add(setting_type)
+
+    def flush(self):
+        """Skriver alla ändrade inställningar i en transaktion."""
+        if not self.dirty:
+            return
+        with self.pool.write():
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO settings (setting_type, setting_value)
+                VALUES (?, ?)
+            """, [(setting_type, str(self.values[setting_type])) for setting_type in self.dirty])
+        self.dirty.clear()
@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+
+# En rad i en ögonblicksbild: dagnummer sedan 1970-01-01, pris och volym
+SNAPSHOT_DTYPE = np.dtype([("day", "<i8"), ("price", "<f8"), ("volume", "<i8")])
+
+
+class PriceHistory:
+    """
+    Kolumnvis kurshistorik för en aktie: dagnummer (int64), priser (float64) och volymer (int64).
+    Beter sig som en lista av tuples (datum, pris, volym) för äldre kod, men
+    strategierna läser kolumnerna direkt utan att skapa ett Python-objekt per rad.
+    """
+    def __init__(self, days, prices, volumes):
+        self.days = days
+        self.prices = prices
+        self.volumes = volumes
+
+    @property
+    def dates(self):
+        """Datum som numpy datetime64[D]."""
+        return self.days.astype("datetime64[D]")
+
+    def since(self, first_day):
+        """Historiken från och med dagnummer first_day."""
+        return self[int(np.searchsorted(self.days, first_day)):]
+
+    def __len__(self):
+        return len(self.days)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PriceHistory(self.days[index], self.prices[index], self.volumes[index])
+        return str(self.dates[index]), float(self.prices[index]), int(self.volumes[index])
+
+    def __iter__(self):
+        return zip(np.datetime_as_string(self.dates).tolist(), self.prices.tolist(), self.volumes.tolist())
+
+
+class SnapshotStore:
+    """
+    Ögonblicksbilder av kurshistoriken på disk, en packad .npy-fil per aktie,
+    som läses med minnesmappning. Filen heter efter aktiens version i symbolkatalogen
+    (symbols.version), så en ögonblicksbild används bara om den är aktuell. Varje ny
+    version skrivs till en ny fil så att läsare som redan har en äldre version mappad
+    inte påverkas.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _symbol_dir(self, symbol_id):
+        return os.path.join(self.directory, str(symbol_id))
+
+    def _generations(self, symbol_id):
+        """Versionerna som har en ögonblicksbild på disk, i stigande ordning."""
+        try:
+            names = os.listdir(self._symbol_dir(symbol_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-4]) for name in names if name.endswith(".npy") and name[:-4].isdigit())
+
+    def load(self, symbol_id, version, row_count):
+        """
+        Minnesmappar ögonblicksbilden för aktiens version.
+        :param version: symbols.version för aktien.
+        :param row_count: symbols.row_count; en fil med ett annat antal rader används inte.
+        :return: PriceHistory, eller None om det inte finns någon aktuell ögonblicksbild.
+        """
+        path = os.path.join(self._symbol_dir(symbol_id), f"{version}.npy")
+        try:
+            data = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None  # Saknas, borttagen under tiden eller tom fil som inte kan mappas
+        if len(data) != row_count:
+            return None
+        return PriceHistory(data["day"], data["price"], data["volume"])
+
+    def save(self, symbol_id, version, data):
+        """
+        Skriver ögonblicksbilden för aktiens version från en array med SNAPSHOT_DTYPE
+        sorterad på dag och tar bort äldre versioner.
+        """
+        os.makedirs(self._symbol_dir(symbol_id), exist_ok=True)
+        tmp_path = os.path.join(self._symbol_dir(symbol_id), f"{version}.tmp-{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_path, os.path.join(self._symbol_dir(symbol_id), f"{version}.npy"))
+        self._remove_generations(symbol_id, [old for old in self._generations(symbol_id) if old < version])
+
+    def invalidate(self, symbol_id):
+        """Tar bort alla ögonblicksbilder för en aktie."""
+        self._remove_generations(symbol_id, self._generations(symbol_id))
+
+    def _remove_generations(self, symbol_id, generations):
+        for generation in generations:
+            try:
+                os.remove(os.path.join(self._symbol_dir(symbol_id), f"{generation}.npy"))
+            except OSError:
+                pass  # Filen kan vara mappad av en annan process (Windows) och tas bort senare
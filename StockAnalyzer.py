@@ -1,44 +1,41 @@
 #!/usr/bin/env python3
 
+import sqlite3
 import sys
-import csv
 import numpy as np
-from datetime import datetime
 
-import pandas as pd
+from PyQt5.QtCore import Qt, QThreadPool, QTimer
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import (
-    QApplication, QInputDialog, QAction, QMenu, QMainWindow, QTableWidget,
-    QTableWidgetItem, QVBoxLayout, QWidget, QFileDialog, QLabel, QGridLayout, QSpinBox, QDoubleSpinBox
+    QApplication, QInputDialog, QAction, QDockWidget, QMainWindow, QTableView, QHeaderView, QLineEdit,
+    QVBoxLayout, QWidget, QFileDialog, QLabel, QGridLayout, QSpinBox, QDoubleSpinBox,
+    QProgressBar, QPushButton
 )
-import matplotlib
 
-from EMAStrategy import EMAStrategy
-from FibonacciStrategy import FibonacciStrategy
-from OBVStrategy import OBVStrategy
-from ROCStrategy import ROCStrategy
-from SMAStrategy import SMAStrategy
-
-matplotlib.use("Qt5Agg")  # Om du använder en Qt-baserad miljö
-import matplotlib.pyplot as plt
-from Database import DatabaseManager
+from Backtest import print_trades
+from Database import DatabaseManager, date_to_day
+from HistoryTableModel import HistoryTableModel
+from IndicatorCache import indicator_cache
+from Profiler import profiler
+from StockPicker import StockPicker
+from StrategyRegistry import strategy_registry
+from Workers import (Worker, backtest_task, columnar_export_task, columnar_import_task, directory_import_task,
+                     import_csv_task, risk_metrics_task)
 
 class StockAnalyzer(QMainWindow):
     start_x = 100
     start_y = 100
     end_x = 1200
     end_y = 900
+    settings_flush_delay_ms = 1000
+    default_indicator_cache_mb = 256
 
     def __init__(self):
         super().__init__()
         self.settings_action = None
         self.misc_menu = None
-        self.obv_action = None
-        self.roc_action = None
-        self.ema_action = None
         self.import_csv_action = None
         self.graph_action = None
-        self.moving_average_action = None
         self.technical_analysis_menu = None
         self.table_action = None
         self.add_stock_data_action = None
@@ -46,9 +43,27 @@ class StockAnalyzer(QMainWindow):
         self.tools_menu = None
         self.db = DatabaseManager()
         self.selected_stock = None
+
+        # Inställningar skrivs till databasen först när de inte ändrats på en stund
+        self.settings_flush_timer = QTimer(self)
+        self.settings_flush_timer.setSingleShot(True)
+        self.settings_flush_timer.setInterval(self.settings_flush_delay_ms)
+        self.settings_flush_timer.timeout.connect(self.db.flush_settings)
+        indicator_cache.set_max_bytes(
+            (self.db.get_setting("indicator_cache_mb") or self.default_indicator_cache_mb) * 1024 * 1024)
+
+        # Importer och analyser körs i bakgrunden så att fönstret inte låser sig
+        self.thread_pool = QThreadPool.globalInstance()
+        self.workers = set()
+
+        # Ett diagram som återanvänds för alla grafer; skapas när det behövs första gången
+        self._chart_widget = None
+        self.strategy_actions = {}
         self.setWindowTitle("Aktie-app")
         self.setGeometry(self.start_x, self.start_y, self.end_x, self.end_y)
+        self.create_stock_picker()
         self.create_menu_bar()
+        self.create_status_bar()
 
     def create_menu_bar(self):
         menu_bar = self.menuBar()
@@ -60,13 +75,15 @@ class StockAnalyzer(QMainWindow):
                 }
             """)
 
-        # Aktie-menyn
+        # Aktie-menyn; aktierna väljs i den sökbara listan
         stock_menu = menu_bar.addMenu("Aktier")
         stock_menu.setObjectName("Aktier")
-        self.populate_stock_menu(stock_menu)
+        stock_list_action = self.stock_picker_dock.toggleViewAction()
+        stock_list_action.setText("Visa aktielista")
+        stock_menu.addAction(stock_list_action)
 
         add_stock_action = QAction("+ Lägg till en aktie", self)
-        add_stock_action.triggered.connect(self.add_stock)
+        self.connect_action(add_stock_action, "Lägg till aktie", self.add_stock)
         stock_menu.addAction(add_stock_action)
 
         # Verktygsmeny
@@ -83,42 +100,39 @@ class StockAnalyzer(QMainWindow):
         self.graph_action.setEnabled(False)
         self.import_csv_action.setEnabled(False)
 
-        self.show_stock_info_action.triggered.connect(self.show_stock_info)
-        self.add_stock_data_action.triggered.connect(self.add_stock_data)
-        self.table_action.triggered.connect(self.show_table)
-        self.graph_action.triggered.connect(self.show_graph)
-        self.import_csv_action.triggered.connect(self.import_stock_data)
+        self.connect_action(self.show_stock_info_action, "Visa information", self.show_stock_info)
+        self.connect_action(self.add_stock_data_action, "Lägg till data", self.add_stock_data)
+        self.connect_action(self.table_action, "Tabell", self.show_table)
+        self.connect_action(self.graph_action, "Graf", self.show_graph)
+        self.connect_action(self.import_csv_action, "Importera CSV", self.import_stock_data)
 
         self.tools_menu.addAction(self.show_stock_info_action)
         self.tools_menu.addAction(self.add_stock_data_action)
         self.tools_menu.addAction(self.table_action)
         self.tools_menu.addAction(self.graph_action)
         self.tools_menu.addAction(self.import_csv_action)
+        import_directory_action = QAction("Importera katalog", self)
+        self.connect_action(import_directory_action, "Importera katalog", self.import_directory_data)
+        self.tools_menu.addAction(import_directory_action)
+
+        # Kolumnvisa filer med många aktier, oberoende av vald aktie
+        self.tools_menu.addSeparator()
+        import_columnar_action = QAction("Importera Parquet/Arrow", self)
+        export_columnar_action = QAction("Exportera Parquet/Arrow", self)
+        self.connect_action(import_columnar_action, "Importera Parquet/Arrow", self.import_columnar_data)
+        self.connect_action(export_columnar_action, "Exportera Parquet/Arrow", self.export_columnar_data)
+        self.tools_menu.addAction(import_columnar_action)
+        self.tools_menu.addAction(export_columnar_action)
 
         # Teknisk analys-menyn
         self.technical_analysis_menu = menu_bar.addMenu("Teknisk analys")
-        self.moving_average_action = QAction("SMA", self)
-        self.ema_action = QAction("EMA", self)
-        self.roc_action = QAction("ROC", self)
-        self.obv_action = QAction("OBV", self)
-        self.fibonacci_retracement_action = QAction("Fibonacci Retracement", self)
-        self.moving_average_action.setEnabled(False)
-        self.ema_action.setEnabled(False)
-        self.roc_action.setEnabled(False)
-        self.obv_action.setEnabled(False)
-        self.fibonacci_retracement_action.setEnabled(False)
-
-        self.moving_average_action.triggered.connect(lambda: self.apply_technical_analysis("SMA"))
-        self.ema_action.triggered.connect(lambda: self.apply_technical_analysis("EMA"))
-        self.roc_action.triggered.connect(lambda: self.apply_technical_analysis("ROC"))
-        self.obv_action.triggered.connect(lambda: self.apply_technical_analysis("OBV"))
-        self.fibonacci_retracement_action.triggered.connect(lambda: self.apply_technical_analysis("FIBONACCI_RETRACEMENT"))
-
-        self.technical_analysis_menu.addAction(self.moving_average_action)
-        self.technical_analysis_menu.addAction(self.ema_action)
-        self.technical_analysis_menu.addAction(self.roc_action)
-        self.technical_analysis_menu.addAction(self.obv_action)
-        self.technical_analysis_menu.addAction(self.fibonacci_retracement_action)
+        # En åtgärd per strategi i registret; strategins modul importeras först när den körs
+        for info in strategy_registry:
+            action = QAction(info.label, self)
+            action.setEnabled(False)
+            self.connect_action(action, info.label, lambda key=info.key: self.apply_technical_analysis(key))
+            self.technical_analysis_menu.addAction(action)
+            self.strategy_actions[info.key] = action
 
         # Menyn Övrigt
         self.misc_menu = menu_bar.addMenu("Övrigt")
@@ -126,18 +140,117 @@ class StockAnalyzer(QMainWindow):
         self.misc_menu.addAction(self.settings_action)
         self.settings_action.triggered.connect(self.settings)
 
-    def populate_stock_menu(self, stock_menu):
-        stocks = self.db.get_all_stocks() or []
-        unique_stock_names = set(stock[1] for stock in stocks)  # Hämta unika aktienamn
-
-        # Sortera aktienamnen i bokstavsordning
-        sorted_stock_names = sorted(unique_stock_names)
+        cache_stats_action = QAction("Cachestatistik", self)
+        self.misc_menu.addAction(cache_stats_action)
+        cache_stats_action.triggered.connect(self.print_cache_stats)
+
+        # Profilering av åtgärderna; kan också slås på med miljövariabeln STOCK_ANALYZER_PROFILE
+        profiling_action = QAction("Profilering", self)
+        profiling_action.setCheckable(True)
+        profiling_action.setChecked(profiler.enabled)
+        profiling_action.toggled.connect(self.set_profiling)
+        self.misc_menu.addAction(profiling_action)
+        export_profile_action = QAction("Exportera profilrapport...", self)
+        export_profile_action.triggered.connect(self.export_profile_report)
+        self.misc_menu.addAction(export_profile_action)
+
+    def connect_action(self, action, name, slot):
+        """Kopplar en menyåtgärd så att den mäts som en åtgärd när profileringen är på."""
+        def run():
+            with profiler.action(name):
+                slot()
+        action.triggered.connect(run)
+
+    def set_profiling(self, enabled):
+        if enabled:
+            profiler.enable()
+            print("⏱ Profilering på")
+        else:
+            profiler.disable()
+            print("⏱ Profilering av")
 
-        # Lägg till aktier i menyn i ordning
-        for stock_name in sorted_stock_names:
-            stock_action = QAction(stock_name, self)
-            stock_action.triggered.connect(lambda checked, name=stock_name: self.select_stock(name))
-            stock_menu.addAction(stock_action)
+    def export_profile_report(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Spara profilrapport", "profilrapport",
+                                                   "Rapport (*.txt *.json)")
+        if not file_path:
+            return
+        text_path, json_path = profiler.export(file_path)
+        print(f"✅ Profilrapporten sparad i {text_path} och {json_path}")
+
+    @property
+    def chart_widget(self):
+        """Diagrammet; matplotlib importeras först när det visas första gången."""
+        if self._chart_widget is None:
+            from ChartWidget import ChartWidget
+
+            self._chart_widget = ChartWidget()
+        return self._chart_widget
+
+    def setCentralWidget(self, widget):
+        # Diagrammet återanvänds och får inte tas bort när en annan vy visas
+        if self._chart_widget is not None and self.centralWidget() is self._chart_widget \
+                and widget is not self._chart_widget:
+            self.takeCentralWidget()
+        super().setCentralWidget(widget)
+
+    def create_status_bar(self):
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(300)
+        self.cancel_button = QPushButton("Avbryt")
+        self.cancel_button.clicked.connect(self.cancel_background_tasks)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_button)
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+
+    def run_in_background(self, description, task, *args, on_finished=None):
+        """
+        Kör task(worker, *args) i trådpoolen och visar framstegen i statusraden.
+        :param description: Text som visas i statusraden medan uppgiften körs.
+        :param on_finished: Anropas i GUI-tråden med uppgiftens resultat.
+        """
+        worker = Worker(task, *args)
+        worker.signals.progress.connect(self.progress_bar.setValue)
+        if on_finished:
+            def finished(result):
+                with profiler.activate(worker.profile_action):
+                    on_finished(result)
+            worker.signals.finished.connect(finished)
+        worker.signals.error.connect(lambda message: print(f"❌ {description} misslyckades: {message}"))
+        worker.signals.cancelled.connect(lambda: print(f"⚠ {description} avbröts."))
+        worker.signals.done.connect(lambda: self.background_task_done(worker))
+
+        self.workers.add(worker)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_button.show()
+        self.statusBar().showMessage(description)
+        self.thread_pool.start(worker)
+
+    def background_task_done(self, worker):
+        self.workers.discard(worker)
+        profiler.release(worker.profile_action)
+        if not self.workers:
+            self.progress_bar.hide()
+            self.cancel_button.hide()
+            self.statusBar().clearMessage()
+
+    def cancel_background_tasks(self):
+        for worker in self.workers:
+            worker.cancel()
+
+    def create_stock_picker(self):
+        self.stock_picker = StockPicker()
+        self.stock_picker.stock_selected.connect(self.select_stock)
+        self.stock_picker_dock = QDockWidget("Aktier", self)
+        self.stock_picker_dock.setWidget(self.stock_picker)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.stock_picker_dock)
+        self.refresh_stock_list()
+
+    def refresh_stock_list(self):
+        # Aktielistan läses från symbolkatalogen i en fråga, utan att gå igenom kurserna
+        self.stock_picker.set_catalog(self.db.get_symbol_catalog())
 
     def select_stock(self, stock_name):
         self.selected_stock = stock_name
@@ -145,12 +258,9 @@ class StockAnalyzer(QMainWindow):
         self.table_action.setEnabled(True)
         self.graph_action.setEnabled(True)
         self.import_csv_action.setEnabled(True)
-        self.moving_average_action.setEnabled(True)
-        self.ema_action.setEnabled(True)
-        self.roc_action.setEnabled(True)
         self.add_stock_data_action.setEnabled(True)
-        self.obv_action.setEnabled(True)
-        self.fibonacci_retracement_action.setEnabled(True)
+        for action in self.strategy_actions.values():
+            action.setEnabled(True)
 
     def settings(self):
         label_title_font = QFont("Georgia", 16)
@@ -186,10 +296,11 @@ class StockAnalyzer(QMainWindow):
         label6 = QLabel("ROC-threshold (%): ")
         label6.setFont(label_title_font)
 
-        roc_threshold_spinbox = QSpinBox()
+        roc_threshold_spinbox = QDoubleSpinBox()
         roc_threshold_spinbox.setFont(label_normal_font)
         roc_threshold_spinbox.setRange(-100, 100)  # ROC-threshold kan vara mellan -100 och 100
-        roc_threshold_spinbox.setSingleStep(1)
+        roc_threshold_spinbox.setDecimals(1)
+        roc_threshold_spinbox.setSingleStep(0.5)
         roc_threshold_spinbox.setValue(self.db.get_setting("roc_threshold") or 0)  # Standard 0
 
         # QSpinBox för antal månader av historik
@@ -205,10 +316,11 @@ class StockAnalyzer(QMainWindow):
         months_sharpe_spinbox.setValue(self.db.get_setting("sharpe_ratio_months") or 6)
 
         # QSpinBox för riskfri avkastning
-        risk_free_rate_spinbox = QSpinBox()
+        risk_free_rate_spinbox = QDoubleSpinBox()
         risk_free_rate_spinbox.setFont(label_normal_font)
         risk_free_rate_spinbox.setRange(0, 100)
-        risk_free_rate_spinbox.setSingleStep(1)
+        risk_free_rate_spinbox.setDecimals(2)
+        risk_free_rate_spinbox.setSingleStep(0.25)
         risk_free_rate_spinbox.setValue(self.db.get_setting("risk_free_rate") or 2)
 
         # QSpinBox för startkapital vid testköp
@@ -238,52 +350,65 @@ class StockAnalyzer(QMainWindow):
         layout.addWidget(label6, 5, 0)
         layout.addWidget(roc_threshold_spinbox, 5, 1)
 
-        # Funktioner för att spara ändringar i databasen
-        months_history_spinbox.valueChanged.connect(lambda value: self.db.set_setting("history", value))
-        months_sharpe_spinbox.valueChanged.connect(lambda value: self.db.set_setting("sharpe_ratio_months", value))
-        risk_free_rate_spinbox.valueChanged.connect(lambda value: self.db.set_setting("risk_free_rate", value))
-        start_capital_spinbox.valueChanged.connect(lambda value: self.db.set_setting("start_capital", value))
-        roc_period_spinbox.valueChanged.connect(lambda value: self.db.set_setting("roc_period", value))
-        roc_threshold_spinbox.valueChanged.connect(lambda value: self.db.set_setting("roc_threshold", value))
+        # Minnesgräns för cachen med beräknade indikatorer
+        label7 = QLabel("Indikatorcache (MB): ")
+        label7.setFont(label_title_font)
+        indicator_cache_spinbox = QSpinBox()
+        indicator_cache_spinbox.setFont(label_normal_font)
+        indicator_cache_spinbox.setRange(16, 16384)
+        indicator_cache_spinbox.setSingleStep(64)
+        indicator_cache_spinbox.setValue(self.db.get_setting("indicator_cache_mb") or self.default_indicator_cache_mb)
+        layout.addWidget(label7, 6, 0)
+        layout.addWidget(indicator_cache_spinbox, 6, 1)
+
+        # Ändringar sparas i minnet direkt och skrivs till databasen när värdet slutat ändras
+        months_history_spinbox.valueChanged.connect(lambda value: self.change_setting("history", value))
+        months_sharpe_spinbox.valueChanged.connect(lambda value: self.change_setting("sharpe_ratio_months", value))
+        risk_free_rate_spinbox.valueChanged.connect(lambda value: self.change_setting("risk_free_rate", value))
+        start_capital_spinbox.valueChanged.connect(lambda value: self.change_setting("start_capital", value))
+        roc_period_spinbox.valueChanged.connect(lambda value: self.change_setting("roc_period", value))
+        roc_threshold_spinbox.valueChanged.connect(lambda value: self.change_setting("roc_threshold", value))
+        indicator_cache_spinbox.valueChanged.connect(lambda value: self.change_setting("indicator_cache_mb", value))
 
         self.setCentralWidget(central_widget)
 
+    def print_cache_stats(self):
+        stats = indicator_cache.stats()
+        print(f"🗄 Indikatorcache: {stats['entries']} serier, {stats['bytes'] / 1024 / 1024:.1f} av "
+              f"{stats['max_bytes'] / 1024 / 1024:.0f} MB, {stats['hits']} träffar, {stats['misses']} missar "
+              f"({100 * stats['hit_rate']:.1f} %), {stats['evictions']} utkastade")
+
+    def change_setting(self, setting_type, value):
+        self.db.set_setting(setting_type, value)
+        if setting_type == "indicator_cache_mb":
+            indicator_cache.set_max_bytes(value * 1024 * 1024)
+        self.settings_flush_timer.start()  # Startar om väntetiden vid varje ändring
+
+    def closeEvent(self, event):
+        self.cancel_background_tasks()
+        self.thread_pool.waitForDone()
+        self.db.flush_settings()
+        super().closeEvent(event)
+
     def show_stock_info(self):
-        variance = 0.0
-        sharpe_ratio = 0
         if not self.selected_stock:
             return
 
-        # Hämta historik enligt inställningarna
-        history = self.db.get_stock_history(self.selected_stock, self.db.get_setting("history"))
+        stock_name = self.selected_stock
+        self.run_in_background(f"Hämtar riskmått för {stock_name}", risk_metrics_task, self.db.db_name, stock_name,
+                               self.db.get_setting("history") or 6, self.db.get_setting("sharpe_ratio_months") or 6,
+                               0.01 * self.db.get_setting("risk_free_rate", 2),
+                               on_finished=lambda result: self.display_stock_info(stock_name, *result))
 
-        if not history:
-            stock_info_text = f"Aktie: {self.selected_stock}\n\nIngen data för de senaste X månaderna."
-        else:
-            # Kontrollera strukturen på 'history' och extrahera priser och volymer korrekt
-            try:
-                prices = [price for _, price, _ in history]  # Om history är tuples (datum, pris, volym)
-                volumes = [volume for _, _, volume in history]  # Om history innehåller volym
-            except ValueError:
-                # Om history inte har 3 kolumner
-                prices = [price for _, price in history]  # Första kolumnen är datum, andra är pris
-                volumes = [0] * len(prices)  # Sätt volym till 0 om ingen volym finns i historiken
-
-            # Beräkna variansen
-            variance = np.var(prices, ddof=1) if len(prices) > 1 else 0
-
-            # Beräkna den totala volymen för de senaste 6 månaderna
-            total_volume = sum(volumes)
-
-            # Beräkna sharpe ratio
-            sharpe_ratio = self.calculate_sharpe_ratio_from_price(prices, 0.01 * self.db.get_setting('risk_free_rate'),
-                                                                  self.db.get_setting('sharpe_ratio_months'))
-
-            # Formatera texten för att visa både varians och total volym
-            stock_info_text = f"Aktie: {self.selected_stock}\n\n"
-            stock_info_text += f"Varians (senaste X månaderna): {variance:.2f}\n"
-            stock_info_text += f"Total Volym (senaste X månaderna): {total_volume}\n"
-            stock_info_text += f"Sharpe Ratio (baserat på pris): {sharpe_ratio:.2f}"
+    def display_stock_info(self, stock_name, history_metrics, sharpe_metrics):
+        """
+        Visar riskmåtten för en aktie. Varians, volatilitet, max drawdown och beta gäller
+        historikperioden, Sharpe och Sortino perioden för Sharpe ratio i inställningarna.
+        """
+        def value(metrics, name, percent=False):
+            if metrics is None or np.isnan(metrics[name]):
+                return "–"
+            return f"{100 * metrics[name]:.2f} %" if percent else f"{metrics[name]:.2f}"
 
         label_title_font = QFont("Georgia", 16)
         label_title_font.setBold(True)
@@ -291,33 +416,44 @@ class StockAnalyzer(QMainWindow):
         central_widget = QWidget(self)
         layout = QGridLayout(central_widget)
 
-        # Lägg till etiketter och värden i layouten
-        label1 = QLabel("Namn: ")
-        label1.setFont(label_title_font)
-        label2 = QLabel(self.selected_stock)
-        label2.setFont(label_normal_font)
-        label3 = QLabel("Varians: ")
-        label3.setFont(label_title_font)
-        label4 = QLabel(str(format(variance, ".2f")))
-        label4.setFont(label_normal_font)
-        label5 = QLabel("Sharpe ratio:  ")
-        label5.setFont(label_title_font)
-        label6 = QLabel(str(format(sharpe_ratio, ".2f")))
-        label6.setFont(label_normal_font)
-
-        # Lägg till etiketter och värden i grid-layouten
-        layout.addWidget(label1, 0, 0)
-        layout.addWidget(label2, 0, 1)
-        layout.addWidget(label3, 1, 0)
-        layout.addWidget(label4, 1, 1)
-        layout.addWidget(label5, 2, 0)
-        layout.addWidget(label6, 2, 1)
+        rows = [
+            ("Namn: ", stock_name),
+            ("Varians: ", value(history_metrics, "variance")),
+            ("Sharpe ratio:  ", value(sharpe_metrics, "sharpe")),
+            ("Sortino ratio:  ", value(sharpe_metrics, "sortino")),
+            ("Volatilitet (per år): ", value(history_metrics, "volatility", percent=True)),
+            ("Max drawdown: ", value(history_metrics, "max_drawdown", percent=True)),
+            ("Beta: ", value(history_metrics, "beta")),
+        ]
+        for row, (title, text) in enumerate(rows):
+            title_label = QLabel(title)
+            title_label.setFont(label_title_font)
+            value_label = QLabel(text)
+            value_label.setFont(label_normal_font)
+            layout.addWidget(title_label, row, 0)
+            layout.addWidget(value_label, row, 1)
 
         self.setCentralWidget(central_widget)
 
+    def ask_date(self, title):
+        """
+        Frågar efter ett datum. Ett ogiltigt datum skrivs ut som fel i stället för att
+        ett undantag lämnar slotten, vilket skulle avsluta programmet.
+        :return: Datumet som 'YYYY-MM-DD', eller None om det avbröts eller var ogiltigt.
+        """
+        date, ok = QInputDialog.getText(self, title, 'Ange datum (YYYY-MM-DD):')
+        if not (ok and date):
+            return None
+        try:
+            date_to_day(date)
+        except ValueError:
+            print(f"❌ Ogiltigt datum: {date}. Ange datumet som YYYY-MM-DD, t.ex. 2024-01-31.")
+            return None
+        return date.strip()
+
     def add_stock_data(self):
-        date, ok = QInputDialog.getText(self, self.selected_stock, 'Ange datum (YYYY-MM-DD):')
-        if ok and date:
+        date = self.ask_date(self.selected_stock)
+        if date:
             price, ok = QInputDialog.getDouble(self, self.selected_stock, 'Ange aktiens pris:')
             if ok:
                 volume, ok = QInputDialog.getInt(self, self.selected_stock, 'Ange handelsvolym:')
@@ -330,32 +466,28 @@ class StockAnalyzer(QMainWindow):
                                                    volume)  # Uppdatera om datumet finns
                     else:
                         print(f"Aktien {self.selected_stock} finns, men datumet {date} saknas, lägg till nytt datum.")
-                        self.db.add_stock(self.selected_stock, date, price, volume)  # Lägg till om datumet saknas
+                        self.insert_stock_row(self.selected_stock, date, price, volume)  # Lägg till om datumet saknas
 
-        self.refresh_menu()
+        self.refresh_stock_list()
 
     def add_stock(self):
         name, ok = QInputDialog.getText(self, 'Ny aktie', 'Ange aktiens namn:')
         if ok and name:
-            date, ok = QInputDialog.getText(self, 'Ny aktie', 'Ange datum (YYYY-MM-DD):')
-            if ok and date:
+            date = self.ask_date('Ny aktie')
+            if date:
                 price, ok = QInputDialog.getDouble(self, 'Ny aktie', 'Ange aktiens pris:')
                 if ok:
                     volume, ok = QInputDialog.getInt(self, 'Ny aktie', 'Ange handelsvolym:')
                     if ok:
-                        self.db.add_stock(name, date, price, volume)
-                        self.refresh_menu()
-
-    def refresh_menu(self):
-        stock_menu = self.menuBar().findChild(QMenu, "Aktier")
-        if stock_menu:
-            stock_menu.clear()
-            self.populate_stock_menu(stock_menu)
-            add_stock_action = QAction("+ Lägg till aktie", self)
-            add_stock_action.triggered.connect(self.add_stock)
-            stock_menu.addAction(add_stock_action)
-        else:
-            print("Kunde inte hitta menyn 'Aktier'!")
+                        self.insert_stock_row(name, date, price, volume)
+                        self.refresh_stock_list()
+
+    def insert_stock_row(self, name, date, price, volume):
+        """Lägger till en kurs; finns dagen redan skrivs ett fel ut i stället för att programmet avslutas."""
+        try:
+            self.db.add_stock(name, date, price, volume)
+        except sqlite3.IntegrityError:
+            print(f"❌ {name} har redan en kurs för {date}. Välj aktien och lägg till data för att uppdatera den.")
 
     def show_table(self):
         if self.selected_stock:
@@ -364,18 +496,22 @@ class StockAnalyzer(QMainWindow):
                 print(f"Ingen historik hittades för {self.selected_stock}.")
                 return
 
-            table = QTableWidget()
-            table.setRowCount(len(history))
-            table.setColumnCount(3)  # Uppdaterad för att inkludera volym
-            table.setHorizontalHeaderLabels(["Datum", "Pris (SEK)", "Volym"])
+            # Modellen läser direkt ur historikens kolumner och formaterar bara synliga celler
+            model = HistoryTableModel(history)
+            table = QTableView()
+            table.setModel(model)
+            table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+            table.setSortingEnabled(True)
+            table.sortByColumn(0, Qt.AscendingOrder)
 
-            for row_idx, (date, price, volume) in enumerate(history):
-                table.setItem(row_idx, 0, QTableWidgetItem(str(date)))
-                table.setItem(row_idx, 1, QTableWidgetItem(f"{price:.2f}"))
-                table.setItem(row_idx, 2, QTableWidgetItem(str(volume)))  # Lägg till volym
+            date_filter = QLineEdit()
+            date_filter.setPlaceholderText("Filtrera på datum (ÅÅÅÅ, ÅÅÅÅ-MM eller ÅÅÅÅ-MM-DD)")
+            date_filter.textChanged.connect(model.set_date_filter)
 
             central_widget = QWidget(self)
             layout = QVBoxLayout(central_widget)
+            layout.addWidget(date_filter)
             layout.addWidget(table)
             self.setCentralWidget(central_widget)
 
@@ -390,33 +526,15 @@ class StockAnalyzer(QMainWindow):
             print(f"Ingen historik hittades för {self.selected_stock}.")
             return
 
-        # Dela upp data i datum, pris och volym
-        dates = [datetime.strptime(date, "%Y-%m-%d").date() for date, _, _ in history]
-        prices = [price for _, price, _ in history]
-        volumes = [volume for _, _, volume in history]
-
-        # Skapa en figur med två subplots
-        fig, ax1 = plt.subplots(figsize=(10, 6))
-
-        # Plotta pris på den första axeln
-        ax1.set_xlabel("Datum")
-        ax1.set_ylabel("Pris (SEK)", color="blue")
-        ax1.plot(dates, prices, marker='o', linestyle='-', color="blue", label=f"{self.selected_stock} Pris")
-        ax1.tick_params(axis="y", labelcolor="blue")
-
-        # Skapa en andra axel för volymen
-        ax2 = ax1.twinx()
-        ax2.set_ylabel("Volym", color="green")
-        ax2.bar(dates, volumes, width=0.8, color="green", alpha=0.3, label="Volym")
-        ax2.tick_params(axis="y", labelcolor="green")
-
-        # Anpassa utseendet
-        plt.title(f"Pris och Volym för {self.selected_stock}")
-        plt.xticks(rotation=45)
-
-        # Visa grafen
-        fig.tight_layout()  # Justera layout för att undvika överlappning
-        plt.show()
+        # Pris och volym ritas i det inbäddade diagrammet, utglesat till diagrammets bredd
+        chart = self.chart_widget.chart
+        with profiler.span("graf"):
+            chart.begin(f"Pris och Volym för {self.selected_stock}")
+            chart.set_labels(secondary_ylabel="Volym")
+            chart.line("price", history.dates, history.prices, label=f"{self.selected_stock} Pris", color="blue")
+            chart.bars("volume", history.dates, history.volumes, label="Volym", color="green", alpha=0.3)
+            chart.finish()
+            self.setCentralWidget(self.chart_widget)
 
     def import_stock_data(self):
         """Importerar aktievärden och volym från en CSV-fil och uppdaterar databasen."""
@@ -430,125 +548,101 @@ class StockAnalyzer(QMainWindow):
         if not file_path:
             return
 
-        try:
-            with open(file_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile, delimiter=';')  # Använder semikolon som separator
-
-                # Läs in rubrikraden och avgör om den behöver hoppas över
-                header = next(reader)
-                if header[0].lower() == "date" and header[1].lower() == "price" and header[2].lower() == "volume":
-                    print("Rubrikrad identifierad och hoppas över.")
-
-                for row in reader:
-                    if len(row) != 3:
-                        print(f"Felaktig rad: {row}")
-                        continue
-
-                    date, price_str, volume_str = row
-                    price_str = price_str.replace(',', '.')  # Byt ut ',' mot '.' i priset
-                    volume_str = volume_str.replace(',', '.')  # Hantera decimaler i volymen också
-
-                    try:
-                        price = float(price_str)
-                        volume = float(volume_str)
-                    except ValueError:
-                        print(f"Ogiltigt pris- eller volymformat: {row}")
-                        continue
-
-                    # Kontrollera om aktien finns
-                    if not self.db.stock_exists(self.selected_stock):
-                        print(f"Fel vid import:")
-                        return
-
-                    # Kontrollera om datumet finns för den valda aktien
-                    if self.db.stock_exists_for_date(self.selected_stock, date):
-                        print(
-                            f"Aktien {self.selected_stock} finns och datumet {date} finns, uppdaterar pris och volym.")
-                        self.db.update_stock_price(self.selected_stock, date, price, volume)  # Uppdatera
-                    else:
-                        print(f"Aktien {self.selected_stock} finns, men datumet {date} saknas, lägg till nytt datum.")
-                        self.db.add_stock(self.selected_stock, date, price, volume)  # Lägg till ny data
-
-            print(f"Importen av {self.selected_stock} från {file_path} slutförd.")
-
-        except Exception as e:
-            print(f"Fel vid import: {e}")
-
-    def calculate_sharpe_ratio_from_price(self, prices, risk_free_rate=0.02, months=6):
-        """
-        Beräknar Sharpe Ratio baserat på aktiens prisdata för de senaste 'months' månaderna.
-
-        :param prices: Lista med pris (eller tuples med datum och pris).
-        :param risk_free_rate: Den riskfria räntan (t.ex. avkastning på statsobligationer). Standard är 0.
-        :param months: Antal månader bakåt som används för att beräkna Sharpe Ratio.
-
-        :return: Sharpe Ratio
-        """
-        # Om prices är en lista av tuples (datum, pris), extrahera priserna och datumen
-        if isinstance(prices[0], tuple):
-            dates = [datetime.strptime(date, "%Y-%m-%d") for date, _ in prices]
-            prices = [price for _, price in prices]
-        else:
-            dates = [None] * len(prices)  # Om inga datum ges, använd en lista med None
-
-        # Omvandla prislistan till en Pandas DataFrame
-        df = pd.DataFrame({"Date": dates, "Price": prices})
-
-        # Om datum inte finns, anta att priserna är i ordning utan specifika datum
-        if df["Date"].isnull().all():
-            # Om inget datum finns, använd bara de senaste priserna
-            df = df.tail(months * 30)  # Ungefärligt 30 dagar per månad
+        # Kontrollera om aktien finns
+        if not self.db.stock_exists(self.selected_stock):
+            print(f"Fel vid import: aktien {self.selected_stock} finns inte i databasen.")
+            return
 
-        else:
-            # Filtrera ut de senaste 'months' månaderna från datan
-            end_date = df["Date"].max()
-            start_date = end_date - pd.DateOffset(months=months)
-            df = df[df["Date"] >= start_date]
+        stock_name = self.selected_stock
 
-        # Om data inte finns för den angivna tidsramen, returnera None
-        if df.empty:
-            return None
+        def import_finished(summary):
+            print(f"Importen av {stock_name} från {file_path} slutförd: "
+                  f"{summary['inserted']} nya, {summary['updated']} uppdaterade, "
+                  f"{summary['rejected']} felaktiga rader.")
+            self.refresh_stock_list()
 
-        # Beräkna daglig avkastning: (pris idag - pris igår) / pris igår
-        df["Return"] = df["Price"].pct_change()
+        self.run_in_background(f"Importerar {stock_name}", import_csv_task, self.db.db_name, stock_name, file_path,
+                               on_finished=import_finished)
 
-        # Ta bort den första raden eftersom avkastningen är NaN där
-        df = df.dropna(subset=["Return"])
+    def import_directory_data(self):
+        """Importerar en katalog med en CSV-fil per aktie; aktier som saknas skapas."""
+        directory = QFileDialog.getExistingDirectory(self, "Välj katalog med CSV-filer")
+        if not directory:
+            return
 
-        # Beräkna genomsnittlig daglig avkastning
-        avg_return = df["Return"].mean()
+        def import_finished(summary):
+            for report in summary["reports"]:
+                if report["error"]:
+                    print(f"❌ {report['file']}: {report['error']}")
+            print(f"✅ {summary['files'] - summary['failed']} av {summary['files']} filer från {directory} "
+                  f"importerade: {summary['inserted']} nya, {summary['updated']} uppdaterade och "
+                  f"{summary['rejected']} felaktiga rader ({summary['seconds']:.1f} s).")
+            self.refresh_stock_list()
+
+        self.run_in_background(f"Importerar {directory}", directory_import_task, self.db.db_name, directory,
+                               on_finished=import_finished)
+
+    def import_columnar_data(self):
+        """Importerar kurser för en eller flera aktier från en Parquet- eller Arrow-fil."""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Välj Parquet- eller Arrow-fil", "",
+                                                   "Kolumnfiler (*.parquet *.pq *.arrow *.feather *.ipc)")
+        if not file_path:
+            return
 
-        # Beräkna standardavvikelse (volatilitet) för den dagliga avkastningen
-        return_volatility = df["Return"].std()
+        def import_finished(summary):
+            print(f"Importen från {file_path} slutförd: {summary['inserted']} nya, {summary['updated']} "
+                  f"uppdaterade och {summary['rejected']} felaktiga rader för {summary['stocks']} aktier.")
+            self.refresh_stock_list()
 
-        # Beräkna Sharpe Ratio
-        sharpe_ratio = (avg_return - risk_free_rate) / return_volatility
+        self.run_in_background(f"Importerar {file_path}", columnar_import_task, self.db.db_name, file_path,
+                               on_finished=import_finished)
 
-        return sharpe_ratio
+    def export_columnar_data(self):
+        """Exporterar alla aktiers historik till en Parquet- eller Arrow-fil."""
+        file_path, _ = QFileDialog.getSaveFileName(self, "Exportera kurser", "kurser.parquet",
+                                                   "Parquet (*.parquet);;Arrow (*.arrow)")
+        if not file_path:
+            return
+        if not file_path.lower().endswith((".parquet", ".arrow")):
+            file_path += ".parquet"
+        self.run_in_background(f"Exporterar till {file_path}", columnar_export_task, self.db.db_name, file_path,
+                               on_finished=lambda rows: print(f"✅ Exporterade {rows} rader till {file_path}"))
 
     def apply_technical_analysis(self, technical_analysis_option):
         if not self.selected_stock:
             print("Ingen aktie vald!")
             return
-        history = self.db.get_stock_history(self.selected_stock, self.db.get_setting('history'))
-        if not history:
-            print(f"Ingen historik hittades för {self.selected_stock}.")
+
+        # Parametrar från registret; indikatorerna läses från de materialiserade serierna i databasen
+        if technical_analysis_option not in strategy_registry:
             return
-        if technical_analysis_option == "SMA":
-            strategy = SMAStrategy()
-            strategy.execute(self.selected_stock, history, self.db.get_setting('start_capital') or 10000)
-        elif technical_analysis_option == "EMA":
-            strategy = EMAStrategy()
-            strategy.execute(self.selected_stock, history, self.db.get_setting('start_capital') or 10000)
-        elif technical_analysis_option == "ROC":
-            strategy = ROCStrategy()
-            strategy.execute(self.selected_stock, history, self.db.get_setting('start_capital') or 10000, self.db.get_setting('roc_period') or 14, self.db.get_setting('roc_threshold') or 1)
-        elif technical_analysis_option == "OBV":
-            strategy = OBVStrategy()
-            strategy.execute(self.selected_stock, history)
-        elif technical_analysis_option == "FIBONACCI_RETRACEMENT":
-            strategy = FibonacciStrategy()
-            strategy.execute(self.selected_stock, history)
+        info = strategy_registry.get(technical_analysis_option)
+        strategy = info.create()
+        params = info.default_params(self.db.get_setting)
+
+        stock_name = self.selected_stock
+
+        def backtest_finished(result):
+            # Utskrifter och grafer görs i GUI-tråden
+            if result is None:
+                print(f"Otillräckligt med data för {technical_analysis_option}-beräkning för {stock_name}.")
+                return
+            if result.cached:
+                # Samma data och parametrar som förra körningen; affärerna skrivs inte ut igen
+                summary = result.summary
+                print(f"♻️ {technical_analysis_option} för {stock_name} från sparat resultat: "
+                      f"{summary['num_trades']} affärer, {summary['total_profit']:.2f} SEK, "
+                      f"{summary['total_percentage_profit']:.2f}%")
+            else:
+                print_trades(result.df["Date"], result.ledger)
+            with profiler.span("graf"):
+                strategy.plot(self.chart_widget.chart, stock_name, result.df, result.ledger, **params)
+                self.setCentralWidget(self.chart_widget)
+
+        self.run_in_background(f"Kör {technical_analysis_option} för {stock_name}", backtest_task, self.db.db_name,
+                               stock_name, technical_analysis_option, strategy, self.db.get_setting('history'),
+                               self.db.get_setting('start_capital') or 10000, params,
+                               on_finished=backtest_finished)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,102 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt, pyqtSignal
+from PyQt5.QtWidgets import QLineEdit, QListView, QVBoxLayout, QWidget
+
+from Database import day_to_date
+
+
+class SymbolListModel(QAbstractListModel):
+    """
+    Listmodell över symbolkatalogen. Träffarna för sökfiltret räknas som en lista
+    med index i katalogen, och vyn får raderna i omgångar via fetchMore() när
+    användaren scrollar, så att även tiotusentals aktier visas direkt.
+    """
+    batch_size = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.catalog = []       # (namn, första dag, sista dag, antal rader)
+        self.names_lower = []
+        self.filter_text = ""
+        self.matches = []       # Index i catalog som matchar filtret
+        self.loaded = 0         # Antal träffar som vyn har fått hittills
+
+    def set_catalog(self, catalog):
+        """Byter katalog och behåller det aktuella filtret."""
+        self.catalog = list(catalog)
+        self.names_lower = [entry[0].lower() for entry in self.catalog]
+        self._set_matches([i for i, name in enumerate(self.names_lower) if self.filter_text in name])
+
+    def set_filter(self, text):
+        """Visar aktier vars namn innehåller text, utan hänsyn till versaler."""
+        text = text.strip().lower()
+        # Har texten bara förlängts räcker det att söka bland de tidigare träffarna
+        candidates = self.matches if self.filter_text in text else range(len(self.catalog))
+        self.filter_text = text
+        self._set_matches([i for i in candidates if text in self.names_lower[i]])
+
+    def _set_matches(self, matches):
+        self.beginResetModel()
+        self.matches = matches
+        self.loaded = min(self.batch_size, len(matches))
+        self.endResetModel()
+
+    def name_at(self, row):
+        return self.catalog[self.matches[row]][0]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.matches)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.batch_size, len(self.matches) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name, first_day, last_day, row_count = self.catalog[self.matches[index.row()]]
+        if role == Qt.DisplayRole:
+            return name
+        if role == Qt.ToolTipRole:
+            return f"{name}: {day_to_date(first_day)} – {day_to_date(last_day)}, {row_count} rader"
+        return None
+
+
+class StockPicker(QWidget):
+    """Sökbar aktielista. Skickar stock_selected med aktiens namn när en aktie väljs."""
+    stock_selected = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Sök aktie...")
+        self.search.setClearButtonEnabled(True)
+
+        self.model = SymbolListModel(self)
+        self.view = QListView()
+        self.view.setUniformItemSizes(True)  # Radhöjden behöver inte mätas per rad
+        self.view.setModel(self.model)
+
+        self.search.textChanged.connect(self.model.set_filter)
+        self.search.returnPressed.connect(self.select_first_match)
+        self.view.activated.connect(lambda index: self.stock_selected.emit(self.model.name_at(index.row())))
+        self.view.clicked.connect(lambda index: self.stock_selected.emit(self.model.name_at(index.row())))
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.search)
+        layout.addWidget(self.view)
+
+    def set_catalog(self, catalog):
+        self.model.set_catalog(catalog)
+
+    def select_first_match(self):
+        if self.model.rowCount() > 0:
+            self.view.setCurrentIndex(self.model.index(0))
+            self.stock_selected.emit(self.model.name_at(0))
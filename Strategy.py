@@ -1,10 +1,96 @@
 from abc import ABC, abstractmethod
 
-import pandas as pd
-from matplotlib import pyplot as plt
+import numpy as np
+
+from Backtest import TradeRecorder
+from Profiler import profiled
+from Snapshot import PriceHistory
+
+
+@profiled("strategi: history_frame")
+def history_frame(history):
+    """
+    Skapar en DataFrame med kolumnerna Date, Price och Volume, sorterad på datum.
+    :param history: PriceHistory eller lista av tuples (datum, pris, volym).
+    """
+    import pandas as pd  # Importeras först vid första backtestet, inte när programmet startar
+
+    if isinstance(history, PriceHistory):
+        # Redan sorterad på datum, kolumnerna används direkt
+        return pd.DataFrame({"Date": pd.to_datetime(history.dates), "Price": np.asarray(history.prices),
+                             "Volume": np.asarray(history.volumes)})
+
+    df = pd.DataFrame(history, columns=["Date", "Price", "Volume"])
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df.sort_values("Date").reset_index(drop=True)
 
 
 class TradingStrategy(ABC):
+    @abstractmethod
+    def backtest(self, stock_data, start_value=10000):
+        """
+        Beräknar indikatorer och simulerar affärer utan utskrifter eller grafer.
+        :return: (DataFrame med pris och indikatorer, TradeLedger) eller None om datan inte räcker.
+        """
+        pass
+
     @abstractmethod
     def execute(self, stock_name, stock_data, start_value=10000):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def plot(self, chart, stock_name, df, ledger):
+        """
+        Ritar resultatet från backtest() i ett Chart. Ska anropas från GUI-tråden,
+        medan backtest() kan köras i en bakgrundstråd.
+        """
+        pass
+
+    # Strömmande backtest: start() en gång, on_bar() för varje dag i datumordning och
+    # finish() på slutet. Strategin håller bara indikatorernas tillstånd och positionen,
+    # så minnet är konstant oavsett hur lång historiken är. Resultatet är detsamma som
+    # från backtest() på samma dagar.
+
+    min_bars = 1  # Antal dagar som krävs för ett resultat, sätts av start_stream()
+
+    def start(self, start_value=10000, **params):
+        """Nollställer indikatorer och position inför ett strömmande backtest."""
+        self.recorder = TradeRecorder(start_value)
+        self.start_stream(**params)
+        return self
+
+    def on_bar(self, date, price, volume):
+        """
+        Tar emot nästa dag och handlar på den.
+        :return: "buy", "sell" eller None.
+        """
+        price = float(price)
+        buy, sell = self.bar_signals(price, float(volume))
+        return self.recorder.record(date, price, buy, sell)
+
+    def finish(self):
+        """
+        Avslutar ett strömmande backtest.
+        :return: (TradeLedger, dict dagindex -> datum för affärerna) eller None om datan inte räcker.
+        """
+        if self.recorder.bars < self.min_bars:
+            return None
+        return self.recorder.ledger(), self.recorder.dates
+
+    def start_stream(self, **params):
+        """Skapar strategins strömmande indikatorer med samma parametrar som backtest()."""
+        raise NotImplementedError(f"{type(self).__name__} stöder inte strömmande backtest")
+
+    def bar_signals(self, price, volume):
+        """:return: (köpsignal, säljsignal) för dagen."""
+        raise NotImplementedError(f"{type(self).__name__} stöder inte strömmande backtest")
+
+    def show_plot(self, stock_name, df, ledger, **params):
+        """Ritar resultatet i ett eget matplotlib-fönster, för körning utanför huvudfönstret."""
+        from matplotlib import pyplot as plt
+
+        from Chart import Chart
+
+        chart = Chart(plt.figure(figsize=(12, 6)))
+        self.plot(chart, stock_name, df, ledger, **params)
+        plt.show()
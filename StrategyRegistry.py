@@ -0,0 +1,92 @@
+"""
+Register över strategierna. Varje strategi beskrivs med namn, menytext, modul och
+standardparametrar; modulen, och därmed pandas och matplotlib, importeras först
+när strategin används. Menyn Teknisk analys och kommandoradsverktygen byggs från
+registret, så en ny strategi behöver bara läggas till här eller med register().
+"""
+from importlib import import_module
+
+
+class StrategyInfo:
+    """Metadata om en strategi, utan att strategins modul importeras."""
+    def __init__(self, key, label, module, class_name=None, params=None, settings=None):
+        """
+        :param key: Namnet strategin slås upp med, t.ex. "SMA".
+        :param label: Text i menyn.
+        :param module: Modulen som innehåller strategin, t.ex. "SMAStrategy".
+        :param class_name: Klassens namn i modulen, standard är samma som modulen.
+        :param params: Standardparametrar när strategin körs från huvudfönstret.
+        :param settings: Parametrar som läses från inställningarna: dict parameter -> (inställning, standardvärde).
+        """
+        self.key = key
+        self.label = label
+        self.module = module
+        self.class_name = class_name or module
+        self.params = params or {}
+        self.settings = settings or {}
+        self._class = None
+
+    def load(self):
+        """Importerar strategins modul första gången. :return: Strategiklassen."""
+        if self._class is None:
+            self._class = getattr(import_module(self.module), self.class_name)
+        return self._class
+
+    def create(self):
+        """:return: En ny instans av strategin."""
+        return self.load()()
+
+    def default_params(self, get_setting=None):
+        """
+        Parametrarna för en körning från huvudfönstret.
+        :param get_setting: Funktion som hämtar en inställning, t.ex. DatabaseManager.get_setting.
+        """
+        params = dict(self.params)
+        for name, (setting_type, default) in self.settings.items():
+            value = get_setting(setting_type) if get_setting else None
+            params[name] = value or default
+        return params
+
+
+class StrategyRegistry:
+    """Strategierna i den ordning de registrerades."""
+    def __init__(self):
+        self.strategies = {}
+
+    def register(self, info):
+        """Lägger till eller ersätter en strategi. :return: info."""
+        self.strategies[info.key] = info
+        return info
+
+    def get(self, key):
+        """:return: StrategyInfo. Kastar KeyError om strategin saknas."""
+        try:
+            return self.strategies[key]
+        except KeyError:
+            raise KeyError(f"Okänd strategi {key}, finns: {', '.join(self.strategies)}") from None
+
+    def keys(self):
+        return list(self.strategies)
+
+    def __iter__(self):
+        return iter(self.strategies.values())
+
+    def __contains__(self, key):
+        return key in self.strategies
+
+    def load_all(self):
+        """Importerar alla strategier. :return: Dict namn -> strategiklass, för kommandoradsverktygen."""
+        return {info.key: info.load() for info in self}
+
+
+# Registret som delas av hela programmet
+strategy_registry = StrategyRegistry()
+register = strategy_registry.register
+
+register(StrategyInfo("SMA", "SMA", "SMAStrategy", params={"window_size": 20}))
+register(StrategyInfo("EMA", "EMA", "EMAStrategy", params={"period": 20}))
+register(StrategyInfo("ROC", "ROC", "ROCStrategy",
+                      settings={"period": ("roc_period", 14), "roc_threshold": ("roc_threshold", 1)}))
+register(StrategyInfo("OBV", "OBV", "OBVStrategy", params={"obv_ema_period": 20}))
+register(StrategyInfo("FIBONACCI_RETRACEMENT", "Fibonacci Retracement", "FibonacciStrategy",
+                      params={"lookback": 60}))
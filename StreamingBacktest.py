@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Strömmande backtest: dagarna läses i omgångar från databasen eller en CSV-fil och
+skickas en i taget genom en eller flera strategier med on_bar(). Minnet är konstant
+oavsett historikens längd, och samma kedja kan senare matas med kurser i realtid.
+
+Exempel:
+    python3 StreamingBacktest.py SMA --stock ERIC --param window_size=50
+    python3 StreamingBacktest.py ROC --csv kurser.csv --param period=10
+"""
+import argparse
+import csv
+
+from Backtest import ledger_summary, print_trades
+from BatchBacktest import STRATEGIES, _parse_param
+from Database import DatabaseManager, day_to_date, parse_price_row
+
+
+def db_bars(db_name, stock_name, months=None, chunk_size=10000):
+    """Generator med (datum, pris, volym) för en aktie i databasen, chunk_size rader per läsning."""
+    db = DatabaseManager(db_name)
+    try:
+        yield from db.iter_stock_history(stock_name, months, chunk_size)
+    finally:
+        db.close()
+
+
+def csv_bars(file_path):
+    """
+    Generator med (datum, pris, volym) från en CSV-fil i samma format som importen
+    (datum;pris;volym). Filen läses rad för rad och måste vara sorterad på datum;
+    rader som inte går att tolka hoppas över.
+    """
+    with open(file_path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.reader(csvfile, delimiter=';'):
+            try:
+                day, price, volume = parse_price_row(row)
+            except ValueError:
+                continue
+            yield day_to_date(day), price, volume
+
+
+def replay(bars, strategies):
+    """
+    Skickar varje dag genom alla strategier. Strategierna ska vara startade med start().
+    :param bars: Iterator med (datum, pris, volym) i datumordning.
+    :param strategies: Dict namn -> strategi.
+    :return: Generator med (namn, "buy"/"sell", datum, pris) för varje affär.
+    """
+    for date, price, volume in bars:
+        for name, strategy in strategies.items():
+            action = strategy.on_bar(date, price, volume)
+            if action:
+                yield name, action, date, price
+
+
+def run_streaming(bars, strategies, start_value=10000, on_trade=None):
+    """
+    Kör ett strömmande backtest för flera strategier i samma genomläsning av datan.
+    :param strategies: Dict namn -> (strategi, dict med parametrar).
+    :param on_trade: Anropas med (namn, "buy"/"sell", datum, pris) för varje affär.
+    :return: Dict namn -> resultatet från strategy.finish().
+    """
+    started = {name: strategy.start(start_value, **params) for name, (strategy, params) in strategies.items()}
+    for event in replay(bars, started):
+        if on_trade:
+            on_trade(*event)
+    return {name: strategy.finish() for name, strategy in started.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strömmande backtest av en strategi med konstant minne.")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--stock", help="Aktie i databasen")
+    source.add_argument("--csv", help="CSV-fil med datum;pris;volym sorterad på datum")
+    parser.add_argument("--db", default="stocks.db", help="Sökväg till databasen")
+    parser.add_argument("--months", type=int, help="Antal månader historik (standard: hela historiken)")
+    parser.add_argument("--start-capital", type=float, default=10000, help="Startkapital för testköp")
+    parser.add_argument("--param", action="append", default=[], metavar="NAMN=VÄRDE",
+                        help="Strategiparameter, t.ex. window_size=50")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Antal rader per läsning från databasen")
+    args = parser.parse_args()
+
+    params = dict(_parse_param(p) for p in args.param)
+    bars = csv_bars(args.csv) if args.csv else db_bars(args.db, args.stock, args.months, args.chunk_size)
+    try:
+        result = run_streaming(bars, {args.strategy: (STRATEGIES[args.strategy](), params)},
+                               args.start_capital)[args.strategy]
+    except NotImplementedError as e:
+        parser.error(str(e))
+
+    if result is None:
+        print("För lite data för strategin.")
+        return
+    ledger, dates = result
+    print_trades(dates, ledger)
+    summary = ledger_summary(ledger, args.start_capital)
+    print(f"✅ Avkastning {summary['return_pct']:.2f}% på startkapitalet")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from Indicators import obv, rsi, sma
+
 
 class SwingTradingStrategy:
     def __init__(self, history, short_sma=20, long_sma=50, rsi_period=14, start_capital=10000, stop_loss_pct=20, take_profit_pct=20):
@@ -15,27 +17,30 @@ class SwingTradingStrategy:
         self.take_profit_pct = take_profit_pct  # Take-profit som en procentandel
         self.trades = []
 
-    def calculate_indicators(self):
+    def calculate_indicators(self, db=None, stock_name=None, months=None):
+        """
+        Beräknar indikatorerna. Med db och stock_name läses de i stället från databasens
+        materialiserade serier via indikatorcachen, så att flera körningar på samma aktie
+        inte räknar om dem; historiken måste då vara get_stock_history(stock_name, months).
+        """
+        if db is not None and stock_name is not None:
+            self.df["SMA_short"] = db.get_indicator(stock_name, "SMA", {"window": self.short_sma}, months)
+            self.df["SMA_long"] = db.get_indicator(stock_name, "SMA", {"window": self.long_sma}, months)
+            self.df["RSI"] = db.get_indicator(stock_name, "RSI", {"period": self.rsi_period}, months)
+            self.df["OBV"] = db.get_indicator(stock_name, "OBV", None, months)
+            return
+
+        prices = self.df["Price"].to_numpy(dtype=float)
+
         # SMA
-        self.df["SMA_short"] = self.df["Price"].rolling(self.short_sma).mean()
-        self.df["SMA_long"] = self.df["Price"].rolling(self.long_sma).mean()
+        self.df["SMA_short"] = sma(prices, self.short_sma)
+        self.df["SMA_long"] = sma(prices, self.long_sma)
 
         # RSI
-        delta = self.df["Price"].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(self.rsi_period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(self.rsi_period).mean()
-        rs = gain / loss
-        self.df["RSI"] = 100 - (100 / (1 + rs))
+        self.df["RSI"] = rsi(prices, self.rsi_period)
 
         # OBV (On-Balance Volume)
-        self.df["OBV"] = 0
-        for i in range(1, len(self.df)):
-            if self.df["Price"].iloc[i] > self.df["Price"].iloc[i-1]:
-                self.df["OBV"].iloc[i] = self.df["OBV"].iloc[i-1] + self.df["Volume"].iloc[i]
-            elif self.df["Price"].iloc[i] < self.df["Price"].iloc[i-1]:
-                self.df["OBV"].iloc[i] = self.df["OBV"].iloc[i-1] - self.df["Volume"].iloc[i]
-            else:
-                self.df["OBV"].iloc[i] = self.df["OBV"].iloc[i-1]
+        self.df["OBV"] = obv(prices, self.df["Volume"])
 
     def apply_strategy(self):
         holding = None
@@ -110,8 +115,8 @@ class SwingTradingStrategy:
         plt.xticks(rotation=45)
         plt.show()
 
-    def run(self):
-        self.calculate_indicators()
+    def run(self, db=None, stock_name=None, months=None):
+        self.calculate_indicators(db, stock_name, months)
         self.apply_strategy()
         self.plot_results()
         for trade in self.trades:
@@ -0,0 +1,161 @@
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+
+from Database import DatabaseManager, OperationCancelled
+from Profiler import profiler
+
+
+class WorkerSignals(QObject):
+    """
+    Signaler från en bakgrundsuppgift. Objektet skapas i GUI-tråden, så anslutna
+    slots körs där även när signalen skickas från en tråd i poolen.
+    """
+    progress = pyqtSignal(int)        # Procent klart, 0-100
+    finished = pyqtSignal(object)     # Uppgiftens resultat
+    error = pyqtSignal(str)           # Felmeddelande
+    cancelled = pyqtSignal()
+    done = pyqtSignal()               # Skickas alltid sist, oavsett utfall
+
+
+class Worker(QRunnable):
+    """
+    Kör en uppgift i QThreadPool. Uppgiften anropas som task(worker, *args) och kan
+    rapportera framsteg med worker.report_progress() och fråga worker.is_cancelled().
+    Resultatet skickas tillbaka till GUI-tråden med signals.finished.
+    """
+    def __init__(self, task, *args):
+        super().__init__()
+        self.task = task
+        self.args = args
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+        # Åtgärden som startade uppgiften hålls öppen tills GUI:t har hanterat resultatet
+        self.profile_action = profiler.hold()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, done, total=100):
+        self.signals.progress.emit(int(100 * done / total) if total else 100)
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            with profiler.activate(self.profile_action):
+                result = self.task(self, *self.args)
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        else:
+            if self.is_cancelled():
+                self.signals.cancelled.emit()  # Resultatet kastas, användaren har redan gått vidare
+            else:
+                self.signals.finished.emit(result)
+        finally:
+            self.signals.done.emit()
+
+
+# Uppgifterna öppnar en egen databasanslutning, eftersom en SQLite-anslutning
+# bara får användas i tråden som skapade den.
+
+def import_csv_task(worker, db_name, stock_name, file_path):
+    """Importerar en CSV-fil. :return: Sammanfattningen från DatabaseManager.import_csv."""
+    db = DatabaseManager(db_name)
+    try:
+        return db.import_csv(stock_name, file_path, progress=worker.report_progress, cancelled=worker.is_cancelled)
+    finally:
+        db.close()
+
+
+def columnar_import_task(worker, db_name, file_path):
+    """Importerar en Parquet- eller Arrow-fil. :return: Sammanfattningen från ColumnarIO.import_columnar."""
+    from ColumnarIO import import_columnar
+
+    db = DatabaseManager(db_name)
+    try:
+        return import_columnar(db, file_path, progress=worker.report_progress, cancelled=worker.is_cancelled)
+    finally:
+        db.close()
+
+
+def columnar_export_task(worker, db_name, file_path):
+    """Exporterar alla aktier till en Parquet- eller Arrow-fil. :return: Antal exporterade rader."""
+    from ColumnarIO import detect_format, export_columnar
+
+    db = DatabaseManager(db_name)
+    try:
+        return export_columnar(db, file_path, detect_format(file_path), progress=worker.report_progress,
+                               cancelled=worker.is_cancelled)
+    finally:
+        db.close()
+
+
+def directory_import_task(worker, db_name, directory):
+    """Importerar en katalog med en CSV-fil per aktie. :return: Sammanfattningen från DirectoryImport.import_directory."""
+    import multiprocessing
+
+    from DirectoryImport import import_directory
+
+    # spawn, eftersom fork av en process med Qt och flera trådar inte är säkert
+    return import_directory(db_name, directory, progress=worker.report_progress, cancelled=worker.is_cancelled,
+                            mp_context=multiprocessing.get_context("spawn"))
+
+
+def risk_metrics_task(worker, db_name, stock_name, history_months, sharpe_months, risk_free_rate):
+    """
+    Hämtar riskmåtten för historikperioden och perioden för Sharpe ratio.
+    :return: (mått för historikperioden, mått för Sharpe-perioden), dicts eller None.
+    """
+    db = DatabaseManager(db_name)
+    try:
+        history_metrics = db.get_risk_metrics(stock_name, history_months, risk_free_rate)
+        worker.report_progress(50)
+        return history_metrics, db.get_risk_metrics(stock_name, sharpe_months, risk_free_rate)
+    finally:
+        db.close()
+
+
+def stored_indicator(db, stock_name, strategy_name, params, months):
+    """Hämtar strategins materialiserade indikatorserier, None om strategin räknar själv."""
+    if strategy_name == "SMA":
+        return db.get_indicator(stock_name, "SMA", {"window": params["window_size"]}, months)
+    if strategy_name == "EMA":
+        return db.get_indicator(stock_name, "EMA", {"period": params["period"]}, months)
+    if strategy_name == "ROC":
+        return db.get_indicator(stock_name, "ROC", {"period": params["period"]}, months)
+    if strategy_name == "OBV":
+        return (db.get_indicator(stock_name, "OBV", None, months),
+                db.get_indicator(stock_name, "OBV_EMA", {"span": params["obv_ema_period"]}, months))
+    return None
+
+
+def backtest_task(worker, db_name, stock_name, strategy_name, strategy, months, start_value, params):
+    """
+    Läser historik och indikatorer och kör strategins backtest, eller hämtar ett
+    sparat resultat för samma data och parametrar.
+    :return: BacktestResult med DataFrame för grafen, eller None om datan inte räcker.
+    """
+    def compute(history):
+        worker.report_progress(25)
+        indicator = stored_indicator(db, stock_name, strategy_name, params, months)
+        if worker.is_cancelled():
+            raise OperationCancelled()
+        worker.report_progress(50)
+
+        if indicator is None:
+            return strategy.backtest(history, start_value, **params)
+        return strategy.backtest(history, start_value, **params, indicator=indicator)
+
+    db = DatabaseManager(db_name)
+    try:
+        return db.run_backtest(stock_name, strategy_name, compute, params, start_value, months, keep_columns=True,
+                               indicator_source="stored")
+    finally:
+        db.close()
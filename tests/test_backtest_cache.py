@@ -0,0 +1,105 @@
+"""
+Sparade backtestresultat ska vara identiska med en ny beräkning, oavsett om
+batchkörningen eller huvudfönstret fyllde cachen först.
+"""
+import datetime
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("PyQt5")
+
+import BatchBacktest  # noqa: E402
+import Workers  # noqa: E402
+from Database import DatabaseManager  # noqa: E402
+from SMAStrategy import SMAStrategy  # noqa: E402
+
+NAME = "TEST"
+MONTHS = 6
+PARAMS = {"window_size": 50}
+LEDGER_ARRAYS = ("buy_idx", "sell_idx", "buy_prices", "sell_prices", "shares")
+
+
+class FakeWorker:
+    def report_progress(self, done, total=100):
+        pass
+
+    def is_cancelled(self):
+        return False
+
+
+@pytest.fixture
+def db_name(tmp_path):
+    name = str(tmp_path / "stocks.db")
+    db = DatabaseManager(name)
+    rows = 800
+    today = (datetime.date.today() - datetime.date(1970, 1, 1)).days
+    days = np.arange(today - rows + 1, today + 1, dtype=np.int64)
+    # Svängningar tätare än SMA-fönstret, så att det finns korsningar under uppvärmningen
+    noise = np.random.default_rng(7).normal(0, 0.5, rows)
+    prices = np.round(100 + 10 * np.sin(np.arange(rows) * 2 * np.pi / 40) + noise, 2)
+    symbol_id = db.lookup_symbol_ids([NAME])[NAME]
+    db.import_arrays([(np.full(rows, symbol_id, dtype=np.int64), days, prices, np.full(rows, 1000))])
+    db.close()
+    return name
+
+
+def batch_result(db_name):
+    BatchBacktest._init_worker(db_name, "SMA", 10000, MONTHS, PARAMS)
+    try:
+        summary, trades = BatchBacktest._run_ticker(NAME)
+    finally:
+        BatchBacktest._worker["db"].close()
+    assert not summary.get("error")
+    return summary, trades
+
+
+def gui_result(db_name):
+    return Workers.backtest_task(FakeWorker(), db_name, NAME, "SMA", SMAStrategy(), MONTHS, 10000, PARAMS)
+
+
+def fresh_ledgers(db_name):
+    """Ny beräkning för båda vägarna: indikatorn räknad på fönstret och den materialiserade serien."""
+    db = DatabaseManager(db_name)
+    try:
+        history = db.get_stock_history(NAME, MONTHS)
+        _, batch_ledger = SMAStrategy().backtest(history, 10000, **PARAMS)
+        indicator = Workers.stored_indicator(db, NAME, "SMA", PARAMS, MONTHS)
+        _, gui_ledger = SMAStrategy().backtest(history, 10000, **PARAMS, indicator=indicator)
+    finally:
+        db.close()
+    return batch_ledger, gui_ledger
+
+
+def assert_same_ledger(actual, expected):
+    for name in LEDGER_ARRAYS:
+        assert np.array_equal(getattr(actual, name), getattr(expected, name)), name
+
+
+def test_batch_and_gui_do_not_share_results_with_different_warmup(db_name):
+    batch_ledger, gui_ledger = fresh_ledgers(db_name)
+    # Förutsättning: uppvärmningen ger olika affärer för samma parametrar
+    assert not np.array_equal(batch_ledger.buy_idx, gui_ledger.buy_idx)
+
+    first, first_trades = batch_result(db_name)
+    assert not first["cached"]
+    assert first["num_trades"] == batch_ledger.num_trades
+    assert first["total_profit"] == pytest.approx(batch_ledger.total_profit)
+
+    gui = gui_result(db_name)
+    assert not gui.cached
+    assert_same_ledger(gui.ledger, gui_ledger)
+
+    second, second_trades = batch_result(db_name)
+    assert second["cached"]
+    assert second["num_trades"] == batch_ledger.num_trades
+    assert second["total_profit"] == pytest.approx(batch_ledger.total_profit)
+    assert second_trades == first_trades
+
+    again = gui_result(db_name)
+    assert again.cached
+    assert_same_ledger(again.ledger, gui_ledger)
@@ -0,0 +1,38 @@
+"""Import av Parquet och Arrow: rader utan ändliga värden ska avvisas, inte stoppa importen."""
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from ColumnarIO import import_columnar  # noqa: E402
+from Database import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "stocks.db"))
+    yield db
+    db.close()
+
+
+def test_non_finite_rows_are_rejected(db, tmp_path):
+    path = str(tmp_path / "kurser.parquet")
+    pq.write_table(pa.table({
+        "name": ["A", "A", "A", "A", "B", "B"],
+        "date": ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05", "2024-01-02", "2024-01-03"],
+        "price": [10.0, math.nan, 12.0, None, math.inf, 20.0],
+        "volume": [100.0, 100.0, math.inf, 100.0, 5.0, -math.inf],
+    }), path)
+
+    summary = import_columnar(db, path)
+
+    assert summary["rejected"] == 5
+    assert summary["inserted"] == 1
+    assert db.get_stock_names() == ["A"]
+    assert list(db.get_stock_history("A", None)) == [("2024-01-02", 10.0, 100)]
@@ -0,0 +1,63 @@
+"""DatabaseManager: transaktioner för nya symboler och indikatorserier efter skrivningar förbi DatabaseManager."""
+import datetime
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Database import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "stocks.db"))
+    yield db
+    db.close()
+
+
+def symbol_names(db):
+    return [row[0] for row in db.conn.execute("SELECT name FROM symbols ORDER BY name")]
+
+
+def test_import_without_valid_rows_creates_no_symbol(db, tmp_path):
+    path = tmp_path / "kurser.csv"
+    path.write_text("datum;pris;volym\nfel;x;y\n", encoding="utf-8")
+    summary = db.import_csv("A", str(path))
+    assert summary == {"inserted": 0, "updated": 0, "rejected": 1}
+    assert symbol_names(db) == []
+
+
+def test_failed_add_stock_rolls_back_new_symbol(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        db.add_stock("A", "2024-01-02", None, 100)
+    assert symbol_names(db) == []
+    db.add_stock("A", "2024-01-02", 10.0, 100)
+    assert symbol_names(db) == ["A"]
+    assert list(db.get_stock_history("A", months=None)) == [("2024-01-02", 10.0, 100)]
+
+
+def test_indicator_follows_writes_through_stocks_view(db):
+    start = datetime.date(2024, 1, 1)
+    for i in range(30):
+        db.add_stock("X", str(start + datetime.timedelta(days=i)), 10.0 + i, 100)
+    assert len(db.get_indicator("X", "SMA", {"window": 5}, None)) == 30
+
+    with db.pool.write():
+        db.conn.execute("INSERT INTO stocks (name, the_date, price, volume) VALUES ('X', '2024-03-01', 50, 1)")
+        db.conn.execute("UPDATE stocks SET price = 99 WHERE name = 'X' AND the_date = '2024-01-05'")
+    series = db.get_indicator("X", "SMA", {"window": 5}, None)
+    assert len(series) == len(db.get_stock_history("X", months=None)) == 31
+    assert series[4] == pytest.approx(np.mean([10, 11, 12, 13, 99]))
+    assert series[-1] == pytest.approx(np.mean([36, 37, 38, 39, 50]))
+
+    # En vanlig skrivning efter en skrivning via vyn ska inte bara räkna om från sin egen dag
+    with db.pool.write():
+        db.conn.execute("UPDATE stocks SET price = 1 WHERE name = 'X' AND the_date = '2024-01-05'")
+    db.add_stock("X", "2024-03-02", 60.0, 1)
+    series = db.get_indicator("X", "SMA", {"window": 5}, None)
+    assert len(series) == 32
+    assert series[4] == pytest.approx(np.mean([10, 11, 12, 13, 1]))
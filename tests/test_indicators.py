@@ -0,0 +1,34 @@
+"""RSI ska ha samma uppvärmning och värden som den ursprungliga pandas-versionen."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Indicators import StreamingRSI, rsi  # noqa: E402
+
+pd = pytest.importorskip("pandas")
+
+
+def baseline_rsi(values, period):
+    """RSI som SwingTradingStrategy räknade den före Indicators.rsi."""
+    delta = pd.Series(values).diff()
+    gain = (delta.where(delta > 0, 0)).rolling(period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(period).mean()
+    return (100 - (100 / (1 + gain / loss))).to_numpy()
+
+
+@pytest.mark.parametrize("period", [2, 14, 30])
+def test_rsi_matches_baseline_including_warmup(period):
+    values = np.round(100 + np.random.default_rng(period).normal(0, 1, 300).cumsum(), 2)
+    expected = baseline_rsi(values, period)
+
+    batch = rsi(values, period)
+    streaming = StreamingRSI(period)
+    streamed = np.array([streaming.update(value) for value in values])
+
+    assert np.flatnonzero(~np.isnan(expected))[0] == period - 1
+    np.testing.assert_allclose(batch, expected, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(streamed, expected, rtol=1e-9, equal_nan=True)